@@ -0,0 +1,219 @@
+# ai_core_combined.py
+#
+# Single-call pipeline: one function-calling request decides the intent
+# AND extracts the action parameters, instead of the five-model intent
+# vote in core_brain followed by a separate ai_core_* call.
+#
+# Tool schemas reuse PARAMETERS_SCHEMA from ai_core_create/update/delete,
+# and results go through the same finalize_* helpers, so the due-date
+# normalization and google_id safety checks are identical.
+
+import copy
+import json
+import llm_client
+import llm_telemetry
+import model_router
+import prompt_builder
+import task_retrieval
+import task_aliases
+from ai_core_create import (
+    PARAMETERS_SCHEMA as CREATE_SCHEMA,
+    finalize_create_result
+)
+from ai_core_update import (
+    PARAMETERS_SCHEMA as UPDATE_SCHEMA,
+    finalize_update_result,
+    _empty_update,
+    _load_user_tasks,
+    _encode_tasks
+)
+from ai_core_delete import (
+    PARAMETERS_SCHEMA as DELETE_SCHEMA,
+    finalize_delete_result,
+    _empty_delete
+)
+
+# -----------------------
+# Config
+# -----------------------
+# the model comes from model_router's "combined" route (COMBINED_MODEL
+# sets its default)
+
+SYSTEM_PROMPT_TEMPLATE = """
+You are the intent and action engine of a task management assistant.
+Decide what the user wants and call exactly ONE function:
+
+- create_task: the user wants a new task or reminder
+- update_task: the user wants to change an existing task
+- delete_task: the user wants to remove an existing task
+- list_tasks: the user wants to see or ask about their tasks
+- chat_reply: anything else (small talk, questions about you, unclear requests)
+
+Rules:
+- Dates/times must be ISO8601 respecting the user's timezone.
+- For update_task and delete_task, task MUST be the alias (t1, t2, ...) of one of the provided tasks.
+- For update_task, only change the fields the user actually wants to modify; use null otherwise.
+- If a field cannot be inferred, use null.
+- ai_comment must be a short helpful advice about the task itself.
+
+Current time: {current_time}
+User timezone: {user_timezone}
+Recent conversation (max 6 messages):
+{recent_messages}
+User tasks (best matches first, due times in the user's timezone):
+{user_tasks}
+"""
+
+# -----------------------
+# Tools
+# -----------------------
+_AI_COMMENT = {"type": "string", "description": "short advice to the user about the task"}
+_RESPONSE_TEXT = {"type": "string", "description": "user-facing short reply"}
+
+
+def _tool(name, description, parameters_schema=None, extra=None):
+    schema = copy.deepcopy(parameters_schema) if parameters_schema else {
+        "type": "object", "properties": {}, "required": []
+    }
+    for key, prop in (extra or {}).items():
+        schema["properties"][key] = prop
+        schema["required"].append(key)
+    return {
+        "type": "function",
+        "function": {"name": name, "description": description, "parameters": schema}
+    }
+
+
+TOOLS = [
+    _tool("create_task", "Create a new task.", CREATE_SCHEMA,
+          {"ai_comment": _AI_COMMENT, "response_text": _RESPONSE_TEXT}),
+    _tool("update_task", "Update ONE existing task.", UPDATE_SCHEMA,
+          {"ai_comment": _AI_COMMENT}),
+    _tool("delete_task", "Delete ONE existing task.", DELETE_SCHEMA,
+          {"ai_comment": _AI_COMMENT}),
+    _tool("list_tasks", "Show or answer questions about the user's tasks."),
+    _tool("chat_reply", "Reply conversationally.", None,
+          {"response_text": _RESPONSE_TEXT}),
+]
+
+_TOOL_ACTIONS = {
+    "create_task": "create",
+    "update_task": "update",
+    "delete_task": "delete",
+    "list_tasks": "list",
+    "chat_reply": "chat",
+}
+
+_TOP_LEVEL_KEYS = ("ai_comment", "response_text")
+
+
+# -----------------------
+# Main API
+# -----------------------
+def process_combined_packet(packet):
+    """
+    Returns an action dict shaped like the ai_core_* processors'
+    ({"action", "parameters", "ai_comment", "response_text"}), or None when
+    the model did not call a function (caller falls back to the ensemble).
+    For "list" only {"action": "list"} is returned; the caller runs list_fun.
+    """
+    user_id = packet.get("user_id")
+    user_message = (packet.get("user_message") or "").strip()
+    user_timezone = packet.get("user_timezone", "UTC")
+    current_time = packet.get("current_time")
+
+    if not user_id or not user_message:
+        return None
+
+    ranked = task_retrieval.rank_tasks(
+        user_message, _load_user_tasks(user_id), user_timezone, current_time
+    )
+    user_tasks = prompt_builder.fit_tasks(
+        task_retrieval.top_candidates(ranked), "combined",
+        lambda t: task_aliases.render_task(t, user_timezone)
+    )
+    encoded = _encode_tasks(user_tasks, user_timezone)
+    system_prompt = SYSTEM_PROMPT_TEMPLATE.format(
+        current_time=current_time,
+        user_timezone=user_timezone,
+        recent_messages=prompt_builder.format_recent_messages(
+            user_id, packet.get("chat_context", []), "combined"
+        ),
+        user_tasks=encoded["text"]
+    )
+
+    route = model_router.route("combined")
+    try:
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="combined",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            tools=TOOLS,
+            tool_choice="required",
+            temperature=0.2
+        )
+        tool_calls = resp.choices[0].message.tool_calls or []
+        if not tool_calls:
+            llm_telemetry.record_parse_failure(route["model"], "combined")
+            model_router.record_outcome("combined", route["model"], False)
+            return None
+
+        call = tool_calls[0].function
+        action = _TOOL_ACTIONS.get(call.name)
+        try:
+            args = json.loads(call.arguments or "{}")
+        except ValueError:
+            llm_telemetry.record_parse_failure(route["model"], "combined")
+            raise
+    except Exception as e:
+        print(f"⚠️ Single-call pipeline failed, falling back to ensemble: {e}")
+        model_router.record_outcome("combined", route["model"], False)
+        return None
+
+    if not action:
+        model_router.record_outcome("combined", route["model"], False)
+        return None
+
+    if action == "list":
+        model_router.record_outcome("combined", route["model"], True)
+        return {"action": "list"}
+
+    if not isinstance(args, dict):
+        # e.g. "null" or a bare list: nothing usable to act on
+        llm_telemetry.record_parse_failure(route["model"], "combined")
+        model_router.record_outcome("combined", route["model"], False)
+        if action == "update":
+            return _empty_update("Invalid update response from AI.")
+        if action == "delete":
+            return _empty_delete("Invalid delete response from AI.")
+        return None
+
+    result = {"action": action, "parameters": {}}
+    for key, value in args.items():
+        if key in _TOP_LEVEL_KEYS:
+            result[key] = value
+        else:
+            result["parameters"][key] = value
+
+    if action == "create":
+        model_router.record_outcome("combined", route["model"], bool(args.get("title")))
+        return finalize_create_result(result, user_message, user_id, user_timezone, current_time)
+    if action == "update":
+        task_aliases.decode_task_param(result, encoded)
+        final = finalize_update_result(result, user_tasks, user_timezone, current_time)
+        model_router.record_outcome("combined", route["model"], bool(final["parameters"].get("google_id")))
+        return final
+    if action == "delete":
+        task_aliases.decode_task_param(result, encoded)
+        final = finalize_delete_result(result, user_tasks)
+        model_router.record_outcome("combined", route["model"], bool(final["parameters"].get("google_id")))
+        return final
+
+    model_router.record_outcome("combined", route["model"], bool(args))
+    result.setdefault("ai_comment", "")
+    result.setdefault("response_text", "Okay.")
+    return result
@@ -1,20 +1,11 @@
 # ai_core_create.py
-import os
 import json
 from datetime import datetime
-from dotenv import load_dotenv
-import openai
+import llm_client
+import llm_telemetry
+import model_router
 from time_fixer import fix_time_from_text
 
-# -----------------------
-# Load OpenAI API Key
-# -----------------------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not set in .env!")
-openai.api_key = OPENAI_API_KEY
-
 # -----------------------
 # GPT System Prompt Template for Task Creation
 # -----------------------
@@ -44,6 +35,17 @@ Current time: {current_time} (ISO string)
 User timezone: {user_timezone}
 """
 
+# JSON schema of "parameters" above (used for function-calling mode)
+PARAMETERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": ["string", "null"], "description": "short task name"},
+        "details": {"type": ["string", "null"], "description": "task description/summary"},
+        "due": {"type": ["string", "null"], "description": "ISO8601 datetime string"}
+    },
+    "required": ["title", "details", "due"]
+}
+
 # -----------------------
 # Main AI Callable
 # -----------------------
@@ -82,9 +84,12 @@ def process_create_packet(packet):
     # -----------------------
     # Call OpenAI GPT
     # -----------------------
+    route = model_router.route("create")
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-4",
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="create",
             messages=messages,
             temperature=0.2
         )
@@ -97,7 +102,10 @@ def process_create_packet(packet):
 
         try:
             result = json.loads(json_text)
+            model_router.record_outcome("create", route["model"], True)
         except Exception:
+            llm_telemetry.record_parse_failure(route["model"], "create")
+            model_router.record_outcome("create", route["model"], False)
             # Fallback: minimal creation
             due_time = fix_time_from_text(user_message, user_timezone, current_time)
             result = {
@@ -112,6 +120,7 @@ def process_create_packet(packet):
             }
 
     except Exception as e:
+        model_router.record_outcome("create", route["model"], False)
         due_time = fix_time_from_text(user_message, user_timezone, current_time)
         result = {
             "action": "create",
@@ -124,6 +133,16 @@ def process_create_packet(packet):
             "response_text": f"Created task with best effort due to API error: {str(e)}"
         }
 
+    return finalize_create_result(result, user_message, user_id, user_timezone, current_time)
+
+
+# -----------------------
+# Result normalization
+# -----------------------
+def finalize_create_result(result, user_message, user_id, user_timezone, current_time):
+    """
+    Fill missing keys and normalize 'due' (shared with single-call mode).
+    """
     # -----------------------
     # Ensure keys exist
     # -----------------------
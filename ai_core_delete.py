@@ -1,65 +1,29 @@
 # ai_core_delete.py
 
-import os
 import json
-from dotenv import load_dotenv
-import openai
-
+import llm_client
+import llm_telemetry
+import model_router
+import prompt_builder
+import task_retrieval
+import task_aliases
 from task_utils import load_all_tasks, normalize_user_id
 
-# -----------------------
-# Load OpenAI API Key
-# -----------------------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not set in .env!")
-
-openai.api_key = OPENAI_API_KEY
-
 # -----------------------
 # Helpers
 # -----------------------
 
-def _load_user_tasks_up_to_70(user_id):
+def _load_user_tasks(user_id):
     uid = normalize_user_id(user_id)
-    all_rows = load_all_tasks()
-    user_tasks = [r for r in all_rows if r.get("user_id") == uid]
-    return user_tasks[:70]  # cap at 70
-
-def _reduce_context(chat_context, limit=6):
-    if not chat_context:
-        return []
-    return chat_context[-limit:]
-
-def _format_recent_messages(rows):
-    if not rows:
-        return "No recent messages."
-    lines = []
-    for m in rows:
-        role = m.get("role", "user")
-        content = m.get("content") or m.get("message") or ""
-        lines.append(f"{role}: {content}")
-    return "\n".join(lines)
-
-def _format_tasks(tasks):
-    if not tasks:
-        return "No tasks."
-    lines = []
-    for t in tasks:
-        lines.append(
-            json.dumps(
-                {
-                    "google_id": t.get("google_id"),
-                    "title": t.get("title"),
-                    "details": t.get("details"),
-                    "due": t.get("due"),
-                    "status": t.get("status")
-                },
-                ensure_ascii=False
-            )
-        )
-    return "\n".join(lines)
+    return [r for r in load_all_tasks() if r.get("user_id") == uid]
+
+def _encode_tasks(tasks, user_timezone):
+    """
+    Alias listing for the prompt (see task_aliases) and its alias map.
+    """
+    encoded = task_aliases.encode(tasks, user_timezone)
+    encoded["text"] = encoded["text"] or "No tasks."
+    return encoded
 
 # -----------------------
 # Prompt
@@ -73,7 +37,7 @@ You MUST return STRICT JSON in the following format:
 {{
   "action": "delete",
   "parameters": {{
-    "google_id": string
+    "task": alias of the task to delete (e.g. "t1")
   }},
   "ai_comment": short advice to the user about this deletion
 }}
@@ -82,7 +46,7 @@ Rules:
 - You are deleting an existing task, not creating or updating.
 - You will be given a list of the user's existing tasks.
 - Select exactly ONE task to delete.
-- The google_id MUST match one of the provided tasks.
+- The task MUST be the alias (t1, t2, ...) of one of the provided tasks.
 - Only output JSON. No markdown, no explanations.
 - You are acting as the user's reminder assistant.
 
@@ -98,10 +62,19 @@ User timezone:
 Recent conversation (max 6 messages):
 {recent_messages}
 
-User tasks (max 70 tasks):
+User tasks (best matches first, due times in the user's timezone):
 {user_tasks}
 """
 
+# JSON schema of "parameters" above (used for function-calling mode)
+PARAMETERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "task": {"type": "string", "description": "alias (t1, t2, ...) of ONE of the provided tasks"}
+    },
+    "required": ["task"]
+}
+
 # -----------------------
 # Main API
 # -----------------------
@@ -134,11 +107,29 @@ def process_delete_packet(packet):
     # Prepare context & tasks
     # -----------------------
 
-    reduced_context = _reduce_context(packet.get("chat_context", []), 6)
-    user_tasks = _load_user_tasks_up_to_70(user_id)
+    ranked = task_retrieval.rank_tasks(
+        user_message, _load_user_tasks(user_id), user_timezone, current_time
+    )
+
+    # unambiguous target (title AND due time match): no model call needed
+    winner = task_retrieval.clear_winner(ranked, require_time=True)
+    task_retrieval.record(winner is not None)
+    if winner:
+        return finalize_delete_result({
+            "action": "delete",
+            "parameters": {"google_id": winner.get("google_id")},
+            "ai_comment": f"Removed \"{winner.get('title')}\" from your tasks."
+        }, [winner])
+
+    user_tasks = prompt_builder.fit_tasks(
+        task_retrieval.top_candidates(ranked), "delete",
+        lambda t: task_aliases.render_task(t, user_timezone)
+    )
 
-    recent_messages_text = _format_recent_messages(reduced_context)
-    user_tasks_text = _format_tasks(user_tasks)
+    recent_messages_text = prompt_builder.format_recent_messages(
+        user_id, packet.get("chat_context", []), "delete"
+    )
+    encoded = _encode_tasks(user_tasks, user_timezone)
 
     # -----------------------
     # Build prompt
@@ -149,7 +140,7 @@ def process_delete_packet(packet):
         current_time=current_time,
         user_timezone=user_timezone,
         recent_messages=recent_messages_text,
-        user_tasks=user_tasks_text
+        user_tasks=encoded["text"]
     )
 
     messages = [{"role": "system", "content": system_prompt}]
@@ -158,9 +149,12 @@ def process_delete_packet(packet):
     # OpenAI call
     # -----------------------
 
+    route = model_router.route("delete")
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-4",
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="delete",
             messages=messages,
             temperature=0.2
         )
@@ -171,6 +165,8 @@ def process_delete_packet(packet):
         end = raw.rfind("}") + 1
 
         if start == -1 or end <= start:
+            llm_telemetry.record_parse_failure(route["model"], "delete")
+            model_router.record_outcome("delete", route["model"], False)
             return _empty_delete("Invalid delete response from AI.")
 
         json_text = raw[start:end]
@@ -178,11 +174,30 @@ def process_delete_packet(packet):
         try:
             result = json.loads(json_text)
         except Exception:
+            llm_telemetry.record_parse_failure(route["model"], "delete")
+            model_router.record_outcome("delete", route["model"], False)
             return _empty_delete("Could not parse delete instruction.")
 
     except Exception as e:
+        model_router.record_outcome("delete", route["model"], False)
         return _empty_delete(f"Delete model error: {str(e)}")
 
+    task_aliases.decode_task_param(result, encoded)
+    final = finalize_delete_result(result, user_tasks)
+    model_router.record_outcome("delete", route["model"], bool(final["parameters"].get("google_id")))
+    return final
+
+
+# -----------------------
+# Result normalization
+# -----------------------
+
+def finalize_delete_result(result, user_tasks):
+    """
+    Fill missing keys and enforce the google_id safety check
+    (shared with single-call mode).
+    """
+
     # -----------------------
     # Normalize result
     # -----------------------
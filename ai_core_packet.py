@@ -1,20 +1,14 @@
 # ai_core_packet.py
-import os
 import json
 from datetime import datetime
-from dotenv import load_dotenv
-import openai
+import llm_client
+import llm_telemetry
+import model_router
+import prompt_builder
+import semantic_cache
+import speculation
 from time_fixer import fix_time_from_text
 
-# -----------------------
-# Load OpenAI API Key
-# -----------------------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not set in .env!")
-openai.api_key = OPENAI_API_KEY
-
 # -----------------------
 # GPT System Prompt Template
 # -----------------------
@@ -69,16 +63,21 @@ def process_packet(packet):
     user_id = packet.get("user_id")
     user_timezone = packet.get("user_timezone", "UTC")
     chat_context = packet.get("chat_context", [])
+    tasks = packet.get("tasks") or []
+
+    # -----------------------
+    # Reuse a recent reply to near-identical small talk
+    # -----------------------
+    if intent == "chat":
+        cached = semantic_cache.lookup(user_id, user_message, tasks, chat_context)
+        if cached is not None:
+            return cached
 
     # -----------------------
     # Normalize context for OpenAI
+    # (rolling summary + newest turns within the chat token budget)
     # -----------------------
-    formatted_context = []
-    for msg in chat_context:
-        role = msg.get("role", "user")
-        # support both 'message' and 'content' keys
-        content = msg.get("content") or msg.get("message") or ""
-        formatted_context.append({"role": role, "content": str(content)})
+    formatted_context = prompt_builder.build_chat_messages(user_id, chat_context, "chat")
 
     # Add current message as last item
     formatted_context.append({"role": "user", "content": str(user_message)})
@@ -89,9 +88,13 @@ def process_packet(packet):
     # -----------------------
     # Call OpenAI GPT
     # -----------------------
+    reusable = False
+    route = model_router.route("chat")
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-4",
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="chat",
             messages=messages,
             temperature=0.2
         )
@@ -105,7 +108,11 @@ def process_packet(packet):
 
         try:
             result = json.loads(json_text)
+            reusable = True
+            model_router.record_outcome("chat", route["model"], True)
         except Exception:
+            llm_telemetry.record_parse_failure(route["model"], "chat")
+            model_router.record_outcome("chat", route["model"], False)
             result = {
                 "action": "chat",
                 "parameters": {"title": None, "details": None, "due": None, "list_scope": None},
@@ -114,6 +121,7 @@ def process_packet(packet):
             }
 
     except Exception as e:
+        model_router.record_outcome("chat", route["model"], False)
         result = {
             "action": "chat",
             "parameters": {"title": None, "details": None, "due": None, "list_scope": None},
@@ -141,4 +149,7 @@ def process_packet(packet):
         except Exception:
             pass
 
+    if reusable and intent == "chat" and result["action"] == "chat":
+        speculation.defer(semantic_cache.store, user_id, user_message, tasks, result, chat_context)
+
     return result
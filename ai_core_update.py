@@ -1,60 +1,29 @@
 # ai_core_update.py
 
-import os
 import json
-from dotenv import load_dotenv
-import openai
+import llm_client
+import llm_telemetry
+import model_router
+import prompt_builder
+import task_retrieval
+import task_aliases
 from time_fixer import fix_time_from_text
 from task_utils import load_all_tasks, normalize_user_id
 
-# -----------------------
-# Load OpenAI API Key
-# -----------------------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not set in .env!")
-
-openai.api_key = OPENAI_API_KEY
-
 # -----------------------
 # Helpers
 # -----------------------
-def _load_user_tasks_up_to_70(user_id):
+def _load_user_tasks(user_id):
     uid = normalize_user_id(user_id)
-    all_rows = load_all_tasks()
-    user_tasks = [r for r in all_rows if r.get("user_id") == uid]
-    # cap at 70 tasks
-    return user_tasks[:70]
-
-def _reduce_context(chat_context, limit=6):
-    if not chat_context:
-        return []
-    return chat_context[-limit:]
-
-def _format_recent_messages(rows):
-    if not rows:
-        return "No recent messages."
-    lines = []
-    for m in rows:
-        role = m.get("role", "user")
-        content = m.get("content") or m.get("message") or ""
-        lines.append(f"{role}: {content}")
-    return "\n".join(lines)
-
-def _format_tasks(tasks):
-    if not tasks:
-        return "No tasks."
-    lines = []
-    for t in tasks:
-        lines.append(json.dumps({
-            "google_id": t.get("google_id"),
-            "title": t.get("title"),
-            "details": t.get("details"),
-            "due": t.get("due"),
-            "status": t.get("status")
-        }, ensure_ascii=False))
-    return "\n".join(lines)
+    return [r for r in load_all_tasks() if r.get("user_id") == uid]
+
+def _encode_tasks(tasks, user_timezone):
+    """
+    Alias listing for the prompt (see task_aliases) and its alias map.
+    """
+    encoded = task_aliases.encode(tasks, user_timezone)
+    encoded["text"] = encoded["text"] or "No tasks."
+    return encoded
 
 # -----------------------
 # Prompt Template
@@ -64,7 +33,7 @@ You are a specialized AI for updating an existing task. You MUST return STRICT J
 {{
   "action": "update",
   "parameters": {{
-    "google_id": string,
+    "task": alias of the task to update (e.g. "t1"),
     "title": string or null,
     "details": string or null,
     "due": ISO8601 datetime string or null
@@ -76,7 +45,7 @@ Rules:
 - You are updating an existing task, not creating a new one.
 - You will be given a list of the user's existing tasks.
 - Select exactly ONE task to update.
-- The google_id MUST match one of the provided tasks.
+- The task MUST be the alias (t1, t2, ...) of one of the provided tasks.
 - Only change the fields the user actually wants to modify.
 - If a field should not change, return null for that field.
 - The ai_comment must be a short helpful advice about the task itself (not about formatting, parsing or the system).
@@ -86,9 +55,22 @@ User request: {user_message}
 Current time: {current_time}
 User timezone: {user_timezone}
 Recent conversation (max 6 messages): {recent_messages}
-User tasks (max 70 tasks): {user_tasks}
+User tasks (best matches first, due times in the user's timezone):
+{user_tasks}
 """
 
+# JSON schema of "parameters" above (used for function-calling mode)
+PARAMETERS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "task": {"type": "string", "description": "alias (t1, t2, ...) of ONE of the provided tasks"},
+        "title": {"type": ["string", "null"]},
+        "details": {"type": ["string", "null"]},
+        "due": {"type": ["string", "null"], "description": "ISO8601 datetime string"}
+    },
+    "required": ["task", "title", "details", "due"]
+}
+
 # -----------------------
 # Main API
 # -----------------------
@@ -115,10 +97,22 @@ def process_update_packet(packet):
     # -----------------------
     # Rebuild context and tasks
     # -----------------------
-    reduced_context = _reduce_context(packet.get("chat_context", []), 6)
-    user_tasks = _load_user_tasks_up_to_70(user_id)
-    recent_messages_text = _format_recent_messages(reduced_context)
-    user_tasks_text = _format_tasks(user_tasks)
+    ranked = task_retrieval.rank_tasks(
+        user_message, _load_user_tasks(user_id), user_timezone, current_time
+    )
+
+    # unambiguous target: the model only has to extract the changes
+    winner = task_retrieval.clear_winner(ranked)
+    task_retrieval.record(winner is not None)
+    candidates = [winner] if winner else task_retrieval.top_candidates(ranked)
+
+    user_tasks = prompt_builder.fit_tasks(
+        candidates, "update", lambda t: task_aliases.render_task(t, user_timezone)
+    )
+    recent_messages_text = prompt_builder.format_recent_messages(
+        user_id, packet.get("chat_context", []), "update"
+    )
+    encoded = _encode_tasks(user_tasks, user_timezone)
 
     # -----------------------
     # Build prompt
@@ -128,7 +122,7 @@ def process_update_packet(packet):
         current_time=current_time,
         user_timezone=user_timezone,
         recent_messages=recent_messages_text,
-        user_tasks=user_tasks_text
+        user_tasks=encoded["text"]
     )
 
     messages = [{"role": "system", "content": system_prompt}]
@@ -136,9 +130,12 @@ def process_update_packet(packet):
     # -----------------------
     # OpenAI API call
     # -----------------------
+    route = model_router.route("update")
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-4",
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="update",
             messages=messages,
             temperature=0.2
         )
@@ -146,17 +143,36 @@ def process_update_packet(packet):
         start = raw.find("{")
         end = raw.rfind("}") + 1
         if start == -1 or end <= start:
+            llm_telemetry.record_parse_failure(route["model"], "update")
+            model_router.record_outcome("update", route["model"], False)
             return _empty_update("Invalid update response from AI.")
 
         json_text = raw[start:end]
         try:
             result = json.loads(json_text)
         except Exception:
+            llm_telemetry.record_parse_failure(route["model"], "update")
+            model_router.record_outcome("update", route["model"], False)
             return _empty_update("Could not parse update instruction.")
 
     except Exception as e:
+        model_router.record_outcome("update", route["model"], False)
         return _empty_update(f"Update model error: {str(e)}")
 
+    task_aliases.decode_task_param(result, encoded)
+    final = finalize_update_result(result, user_tasks, user_timezone, current_time)
+    model_router.record_outcome("update", route["model"], bool(final["parameters"].get("google_id")))
+    return final
+
+
+# -----------------------
+# Result normalization
+# -----------------------
+def finalize_update_result(result, user_tasks, user_timezone, current_time):
+    """
+    Fill missing keys, normalize 'due' and enforce the google_id safety
+    check (shared with single-call mode).
+    """
     # -----------------------
     # Normalize result
     # -----------------------
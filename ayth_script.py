@@ -1,4 +1,5 @@
 # ayth_script.py
+import os
 import requests
 import json
 from urllib.parse import urlencode, urlparse, parse_qs
@@ -6,6 +7,17 @@ from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, REDIRECT_URI, SCOPES,
 import pytz
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from fault_injection import FaultyRequests
+import singleflight
+
+# Endpoints (overridable so benchmarks can point them at a local stub)
+TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+TASKS_URL = os.getenv("GOOGLE_TASKS_URL", "https://tasks.googleapis.com/tasks/v1/lists/@default/tasks")
+
+# requests, with injectable faults for benchmark runs (no-op by default)
+http = FaultyRequests(requests)
+_token_flight = singleflight.Group("google_token")
+
 # ----------------------
 # User registration + timezone
 # ----------------------
@@ -71,7 +83,7 @@ def register_user_via_url(user_key, full_url):
         "redirect_uri": REDIRECT_URI,
         "grant_type": "authorization_code"
     }
-    resp = requests.post("https://oauth2.googleapis.com/token", data=data)
+    resp = http.post(TOKEN_URL, data=data)
     tokens = resp.json()
 
     refresh_token = tokens.get("refresh_token")
@@ -96,6 +108,10 @@ def register_user_via_url(user_key, full_url):
     return tokens
 
 def _get_access_token(user_key):
+    # concurrent refreshes for one user share a single token request
+    return _token_flight.do(user_key, _refresh_access_token, user_key)
+
+def _refresh_access_token(user_key):
     with open(DATABASE_FILE) as f:
         db = json.load(f)
     refresh_token = db[user_key]["refresh_token"]
@@ -105,7 +121,7 @@ def _get_access_token(user_key):
         "refresh_token": refresh_token,
         "grant_type": "refresh_token"
     }
-    resp = requests.post("https://oauth2.googleapis.com/token", data=data)
+    resp = http.post(TOKEN_URL, data=data)
     return resp.json()["access_token"]
 
 # ----------------------
@@ -117,8 +133,8 @@ def create_task(title, due, user_key, details=None):
     task_data = {"title": title, "due": due}
     if details:
         task_data["notes"] = details
-    resp = requests.post(
-        "https://tasks.googleapis.com/tasks/v1/lists/@default/tasks",
+    resp = http.post(
+        TASKS_URL,
         headers=headers,
         json=task_data
     )
@@ -127,8 +143,8 @@ def create_task(title, due, user_key, details=None):
 def list_tasks(user_key):
     access_token = _get_access_token(user_key)
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(
-        "https://tasks.googleapis.com/tasks/v1/lists/@default/tasks",
+    resp = http.get(
+        TASKS_URL,
         headers=headers
     )
     return resp.json().get("items", [])
@@ -140,8 +156,8 @@ def update_task(task_id, user_key, title=None, details=None, due=None):
     if title: payload["title"] = title
     if details: payload["notes"] = details
     if due: payload["due"] = due
-    resp = requests.patch(
-        f"https://tasks.googleapis.com/tasks/v1/lists/@default/tasks/{task_id}",
+    resp = http.patch(
+        f"{TASKS_URL}/{task_id}",
         headers=headers,
         json=payload
     )
@@ -150,8 +166,8 @@ def update_task(task_id, user_key, title=None, details=None, due=None):
 def delete_task(task_id, user_key):
     access_token = _get_access_token(user_key)
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.delete(
-        f"https://tasks.googleapis.com/tasks/v1/lists/@default/tasks/{task_id}",
+    resp = http.delete(
+        f"{TASKS_URL}/{task_id}",
         headers=headers
     )
     return resp.status_code == 204
@@ -167,8 +183,8 @@ def complete_task(task_id, user_key):
     now_iso = datetime.utcnow().isoformat() + "Z"
     task_body = {"status": "completed", "completed": now_iso}
 
-    resp = requests.patch(
-        f"https://tasks.googleapis.com/tasks/v1/lists/@default/tasks/{task_id}",
+    resp = http.patch(
+        f"{TASKS_URL}/{task_id}",
         headers=headers,
         json=task_body
     )
@@ -0,0 +1,291 @@
+# bench_faults.py
+#
+# End-to-end throughput benchmark under injected faults.
+#
+# Runs the bot's request path offline against llm_stub_server: messages
+# arrive open-loop (Poisson, --rate per second) into a queue served by
+# --workers threads, like Telegram updates handed to worker threads. Each
+# job is either a user message (intent_engine.ai_thought, which also kicks
+# off the Google upload) or a Google -> CSV sync (sync_user_tasks_to_csv).
+#
+# For every fault profile (see fault_injection.PROFILES) it reports
+# end-to-end latency p50/p95/p99 (queue wait included), errors, queue
+# depth (max, and growth per second over the run) and the injected faults.
+#
+# Usage:
+#   python bench_faults.py
+#   python bench_faults.py --profiles none,openrouter_429,llm_hang --rate 4 --duration 30
+#   python bench_faults.py --stub-latency lognormal:800,0.5 --json faults.json
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# -----------------------
+# Workload config
+# -----------------------
+USERS = ["bench_user_1", "bench_user_2", "bench_user_3"]
+
+MESSAGES = [
+    "remind me to call mom tomorrow at 5pm",
+    "add a task to buy groceries on friday",
+    "schedule dentist appointment next monday 10am",
+    "move the gym session to saturday morning",
+    "change the report deadline to thursday",
+    "delete the groceries task",
+    "cancel the dentist appointment",
+    "what do I have today",
+    "show my tasks for this week",
+    "which tasks are about the report",
+    "hey, how are you?",
+    "thanks, that helps a lot",
+]
+
+FIXTURE_TASKS = [
+    ("Gym session", "leg day", 1),
+    ("Quarterly report", "finish the draft", 2),
+    ("Dentist", "", 3),
+    ("Buy groceries", "milk, eggs", 4),
+]
+
+
+# -----------------------
+# Environment
+# -----------------------
+def _write_fixtures(workdir):
+    from datetime import datetime, timedelta, timezone
+
+    os.makedirs(os.path.join(workdir, "safe_keep"), exist_ok=True)
+    with open(os.path.join(workdir, "safe_keep", "client.json"), "w", encoding="utf-8") as f:
+        json.dump({"web": {"client_id": "bench", "client_secret": "bench",
+                           "redirect_uris": ["http://localhost/bench"]}}, f)
+
+    with open(os.path.join(workdir, "database.json"), "w", encoding="utf-8") as f:
+        json.dump({u: {"refresh_token": "bench", "timezone": "UTC"} for u in USERS}, f)
+
+    import csv
+    from task_utils import CSV_FIELDS
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    with open(os.path.join(workdir, "tasks.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for u in USERS:
+            for i, (title, details, days) in enumerate(FIXTURE_TASKS):
+                writer.writerow({
+                    "user_id": u, "title": title, "details": details,
+                    "due": (now + timedelta(days=days)).isoformat(),
+                    "status": "pending", "google_status": "done",
+                    "google_id": f"{u}-g{i}", "ai_comment": ""
+                })
+
+
+def _reset_state(workdir, fixture_dir):
+    for name in ("tasks.csv", "chat_context.csv", "chat_summaries.json"):
+        path = os.path.join(workdir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.copy(os.path.join(fixture_dir, "tasks.csv"), os.path.join(workdir, "tasks.csv"))
+
+    import core_brain
+    import llm_telemetry
+    llm_telemetry.reset()
+    core_brain._latencies.clear()
+    core_brain._agreement.clear()
+    core_brain._breakers.clear()
+
+
+# -----------------------
+# Load generation
+# -----------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_profile(profile, rate, duration, workers, sync_share, drain, seed):
+    import fault_injection
+    import intent_engine
+    from sync_google_tasks_to_csv import sync_user_tasks_to_csv
+
+    fault_injection.set_profile(profile)
+    rng = random.Random(seed)
+    jobs = queue.Queue()
+    results = []  # (kind, seconds, ok)
+    results_lock = threading.Lock()
+    depth = []    # (t, queue depth)
+    stop = threading.Event()
+
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            kind, user, message, enqueued = job
+            ok = True
+            try:
+                if kind == "sync":
+                    sync_user_tasks_to_csv(user)
+                else:
+                    intent_engine.ai_thought(user, message)
+            except Exception:
+                ok = False
+            with results_lock:
+                results.append((kind, time.perf_counter() - enqueued, ok))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+
+    def sampler(start):
+        while not stop.is_set():
+            depth.append((time.perf_counter() - start, jobs.qsize()))
+            time.sleep(0.25)
+
+    start = time.perf_counter()
+    threading.Thread(target=sampler, args=(start,), daemon=True).start()
+
+    sent = 0
+    next_at = start
+    while next_at - start < duration:
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+        kind = "sync" if rng.random() < sync_share else "message"
+        jobs.put((kind, rng.choice(USERS), rng.choice(MESSAGES), time.perf_counter()))
+        sent += 1
+        next_at += rng.expovariate(rate)
+
+    depth_at_end = jobs.qsize()
+
+    deadline = time.perf_counter() + drain
+    while time.perf_counter() < deadline:
+        with results_lock:
+            if len(results) >= sent:
+                break
+        time.sleep(0.1)
+    stop.set()
+
+    for _ in threads:
+        jobs.put(None)
+
+    with results_lock:
+        done = list(results)
+
+    lat = sorted(s for _, s, _ in done)
+    by_kind = {}
+    for kind in ("message", "sync"):
+        k_lat = sorted(s for k, s, _ in done if k == kind)
+        by_kind[kind] = {
+            "done": len(k_lat),
+            "errors": sum(1 for k, _, ok in done if k == kind and not ok),
+            "p50_ms": _percentile(k_lat, 50) * 1000,
+            "p99_ms": _percentile(k_lat, 99) * 1000,
+        }
+
+    return {
+        "profile": profile,
+        "sent": sent,
+        "done": len(done),
+        "unfinished": sent - len(done),
+        "errors": sum(1 for _, _, ok in done if not ok),
+        "p50_ms": _percentile(lat, 50) * 1000,
+        "p95_ms": _percentile(lat, 95) * 1000,
+        "p99_ms": _percentile(lat, 99) * 1000,
+        "max_queue": max((d for _, d in depth), default=0),
+        "queue_growth_per_sec": depth_at_end / duration if duration else 0.0,
+        "by_kind": by_kind,
+        "faults": fault_injection.get_stats(),
+    }
+
+
+# -----------------------
+# Report
+# -----------------------
+def print_report(results):
+    header = (f"{'profile':<20}{'sent':>6}{'done':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'p99 ms':>9}{'max q':>7}{'q/s':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['profile']:<20}{r['sent']:>6}{r['done']:>6}{r['errors']:>5}{r['p50_ms']:>9.0f}"
+            f"{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}{r['max_queue']:>7}{r['queue_growth_per_sec']:>7.2f}"
+        )
+
+    print("\ninjected faults:")
+    for r in results:
+        faults = {k: v for k, v in r["faults"].items() if k != "profile"}
+        print(f"  {r['profile']:<20}{json.dumps(faults) if faults else '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the request path under injected faults.")
+    parser.add_argument("--profiles", default="none,slow_llm,openrouter_429,llm_hang,malformed_json,slow_google_token,google_5xx")
+    parser.add_argument("--rate", type=float, default=2.0, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load per profile")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sync-share", type=float, default=0.2, help="fraction of jobs that are Google syncs")
+    parser.add_argument("--drain", type=float, default=30.0, help="seconds to wait for in-flight jobs")
+    parser.add_argument("--stub-latency", default="lognormal:300,0.4")
+    parser.add_argument("--stub-port", type=int, default=8199)
+    parser.add_argument("--llm-timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    base = f"http://127.0.0.1:{args.stub_port}"
+    os.environ["LLM_STUB_URL"] = f"{base}/v1"
+    os.environ["GOOGLE_TOKEN_URL"] = f"{base}/token"
+    os.environ["GOOGLE_TASKS_URL"] = f"{base}/tasks"
+    os.environ["LLM_TIMEOUT_SECONDS"] = str(args.llm_timeout)
+
+    # repo modules read/write relative paths: run inside a scratch directory
+    workdir = tempfile.mkdtemp(prefix="bench_faults_")
+    fixture_dir = tempfile.mkdtemp(prefix="bench_faults_fixture_")
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    _write_fixtures(workdir)
+    shutil.copy(os.path.join(workdir, "tasks.csv"), os.path.join(fixture_dir, "tasks.csv"))
+
+    import llm_stub_server
+    server = llm_stub_server.serve(args.stub_port, latency=args.stub_latency, seed=args.seed)
+
+    results = []
+    try:
+        # first calls pay for imports, model loading and connection setup
+        _reset_state(workdir, fixture_dir)
+        import intent_engine
+        for message in MESSAGES:
+            intent_engine.ai_thought(USERS[0], message)
+
+        for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            _reset_state(workdir, fixture_dir)
+            print(f"▶️ {profile}: {args.rate}/s for {args.duration:.0f}s, {args.workers} workers")
+            results.append(run_profile(
+                profile, args.rate, args.duration, args.workers,
+                args.sync_share, args.drain, args.seed
+            ))
+    finally:
+        server.shutdown()
+        os.chdir(REPO_DIR)
+
+    print()
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+# bench_time_fixer.py
+#
+# Accuracy / throughput benchmark for time_fixer.fix_time_from_text.
+#
+# Builds a labelled corpus (a few thousand expressions across many
+# timezones, DST edges and relative forms), then runs it through:
+#   - fast       : time_fixer._fast_parse only (no dateparser)
+#   - dateparser : time_fixer._dateparser_parse only (no fast path)
+#   - full       : fix_time_from_text (fast path + dateparser + cache)
+#   - model-stub : time_fixer_ai prompt/parse pipeline with a stubbed model
+#
+# Usage:
+#   python bench_time_fixer.py
+#   python bench_time_fixer.py --tiers fast,full --passes 3
+#   python bench_time_fixer.py --dump time_corpus.jsonl
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytz
+
+import time_fixer
+
+# -----------------------
+# Corpus config
+# -----------------------
+TIMEZONES = [
+    "UTC",
+    "Africa/Lagos",
+    "Europe/London",
+    "Europe/Athens",
+    "America/New_York",
+    "America/Los_Angeles",
+    "America/St_Johns",
+    "America/Sao_Paulo",
+    "Asia/Kolkata",
+    "Asia/Kathmandu",
+    "Asia/Tokyo",
+    "Australia/Sydney",
+    "Pacific/Auckland",
+]
+
+# ordinary reference times used for every zone (local wall clock)
+GENERIC_REFERENCES = [
+    datetime(2026, 1, 15, 9, 15),
+    datetime(2026, 7, 1, 18, 40),
+]
+
+# evenings just before a DST switch, so relative forms cross it
+DST_EDGE_REFERENCES = {
+    "America/New_York": [datetime(2026, 3, 7, 22, 30), datetime(2026, 10, 31, 22, 30)],
+    "America/Los_Angeles": [datetime(2026, 3, 7, 22, 30), datetime(2026, 10, 31, 22, 30)],
+    "America/St_Johns": [datetime(2026, 3, 7, 22, 30), datetime(2026, 10, 31, 22, 30)],
+    "Europe/London": [datetime(2026, 3, 28, 23, 30), datetime(2026, 10, 24, 23, 30)],
+    "Europe/Athens": [datetime(2026, 3, 28, 23, 30), datetime(2026, 10, 24, 23, 30)],
+    "Australia/Sydney": [datetime(2026, 4, 4, 22, 30), datetime(2026, 10, 3, 22, 30)],
+    "Pacific/Auckland": [datetime(2026, 4, 4, 22, 30), datetime(2026, 9, 26, 22, 30)],
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["jan", "feb", "march", "april", "may", "june", "july", "aug", "sept", "oct", "nov", "dec"]
+
+UTC = timezone.utc
+
+
+# -----------------------
+# Label helpers (zoneinfo, independent of time_fixer's pytz code)
+# -----------------------
+def _wall(naive, tz):
+    """
+    Localize a wall-clock time; None if it falls in a DST gap or overlap.
+    """
+    first = naive.replace(tzinfo=tz, fold=0)
+    second = naive.replace(tzinfo=tz, fold=1)
+    if first.utcoffset() != second.utcoffset():
+        return None
+    roundtrip = first.astimezone(UTC).astimezone(tz).replace(tzinfo=None)
+    if roundtrip != naive:
+        return None
+    return first
+
+
+def _elapsed(ref, **delta):
+    return (ref.astimezone(UTC) + timedelta(**delta)).astimezone(ref.tzinfo)
+
+
+def _next_date(ref, month, day):
+    year = ref.year
+    if (month, day) <= (ref.month, ref.day):
+        year += 1
+    return datetime(year, month, day)
+
+
+def _ordinal(n):
+    if 10 <= n % 100 <= 20:
+        return f"{n}th"
+    return f"{n}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th') }"
+
+
+def _hour_text(hour):
+    meridiem = "am" if hour < 12 else "pm"
+    h12 = hour % 12 or 12
+    return f"{h12}{meridiem}"
+
+
+# -----------------------
+# Corpus
+# -----------------------
+def _expressions_for(ref, tz, rng):
+    """
+    Yield (kind, text, expected_datetime_or_None) for one reference time.
+    """
+    naive_ref = ref.replace(tzinfo=None)
+    today = naive_ref.date()
+    tomorrow = today + timedelta(days=1)
+
+    # ISO strings, as handed back by the LLM processors
+    for hours in (1, 5, 26, 24 * 9):
+        target = _elapsed(ref, hours=hours)
+        yield "iso_offset", target.isoformat(), target
+        utc_text = target.astimezone(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        yield "iso_z", utc_text, target  # answer is expected in the user's zone
+        wall = _wall(target.replace(tzinfo=None), tz)
+        if wall:
+            yield "iso_naive", wall.strftime("%Y-%m-%dT%H:%M:%S"), wall
+
+    # in N minutes / hours (elapsed time)
+    for n in (5, 15, 30, 45, 90):
+        yield "in_minutes", f"in {n} minutes", _elapsed(ref, minutes=n)
+    for n in (1, 2, 3, 6, 12, 24):
+        yield "in_hours", f"in {n} hours", _elapsed(ref, hours=n)
+    yield "in_hours", "in an hour", _elapsed(ref, hours=1)
+
+    # in N days / weeks (same wall clock)
+    for n in (1, 2, 3, 7):
+        yield "in_days", f"in {n} days", _wall(naive_ref + timedelta(days=n), tz)
+    yield "in_days", "in a week", _wall(naive_ref + timedelta(days=7), tz)
+    yield "in_days", "in 2 weeks", _wall(naive_ref + timedelta(days=14), tz)
+
+    # today / tomorrow / tonight
+    for hour in rng.sample(range(7, 23), 4):
+        day = datetime(today.year, today.month, today.day, hour)
+        yield "today_at", f"today at {_hour_text(hour)}", _wall(day, tz)
+    for hour in rng.sample(range(6, 23), 4):
+        day = datetime(tomorrow.year, tomorrow.month, tomorrow.day, hour)
+        yield "tomorrow_at", f"tomorrow at {_hour_text(hour)}", _wall(day, tz)
+        day = day.replace(minute=30)
+        yield "tomorrow_at", f"tomorrow {day.strftime('%H:%M')}", _wall(day, tz)
+    yield "tonight", "tonight", _wall(datetime(today.year, today.month, today.day, 21), tz)
+    yield "tonight", "tonight at 8", _wall(datetime(today.year, today.month, today.day, 20), tz)
+
+    # bare times -> next occurrence
+    for hour in rng.sample(range(0, 24), 3):
+        candidate = datetime(today.year, today.month, today.day, hour)
+        if candidate <= naive_ref:
+            candidate += timedelta(days=1)
+        yield "bare_time", f"at {_hour_text(hour)}", _wall(candidate, tz)
+
+    # weekdays -> next occurrence (strictly after today)
+    for name in rng.sample(WEEKDAYS, 3):
+        ahead = (WEEKDAYS.index(name) - today.weekday()) % 7 or 7
+        day = today + timedelta(days=ahead)
+        target = _wall(datetime(day.year, day.month, day.day, 17), tz)
+        yield "weekday", f"{name} at 5pm", target
+        yield "weekday_next", f"next {name} at 5pm", target
+
+    # calendar dates -> next occurrence
+    for _ in range(3):
+        month = rng.randint(1, 12)
+        day_num = rng.randint(1, 28)
+        date = _next_date(naive_ref, month, day_num)
+        yield "date_at", f"{_ordinal(day_num)} {MONTHS[month - 1]} at 3pm", _wall(date.replace(hour=15), tz)
+        yield "date", f"{MONTHS[month - 1]} {day_num}", _wall(date, tz)
+
+    # N days/weeks before/after a date
+    for _ in range(2):
+        month = rng.randint(1, 12)
+        day_num = rng.randint(1, 28)
+        qty = rng.randint(1, 5)
+        date = _next_date(naive_ref, month, day_num)
+        yield (
+            "relative_date",
+            f"{qty} days after {_ordinal(day_num)} {MONTHS[month - 1]}",
+            _wall(date + timedelta(days=qty), tz),
+        )
+        yield (
+            "relative_date",
+            f"a week before the {_ordinal(day_num)} of {MONTHS[month - 1]}",
+            _wall(date - timedelta(days=7), tz),
+        )
+
+
+def build_corpus(seed=26):
+    """
+    Returns a list of dicts:
+    {kind, text, user_timezone, reference_time, expected}
+    """
+    rng = random.Random(seed)
+    corpus = []
+
+    for tz_name in TIMEZONES:
+        tz = ZoneInfo(tz_name)
+        references = GENERIC_REFERENCES + DST_EDGE_REFERENCES.get(tz_name, [])
+
+        for naive_ref in references:
+            ref = _wall(naive_ref, tz)
+            if ref is None:
+                continue
+
+            for kind, text, expected in _expressions_for(ref, tz, rng):
+                if expected is None:
+                    continue  # label falls in a DST gap/overlap
+                corpus.append({
+                    "kind": kind,
+                    "text": text,
+                    "user_timezone": tz_name,
+                    "reference_time": ref.isoformat(),
+                    "expected": expected.isoformat(),
+                })
+
+    return corpus
+
+
+# -----------------------
+# Scoring
+# -----------------------
+def _is_correct(got, expected):
+    """
+    Same instant AND same UTC offset (catches wrong-DST answers).
+    """
+    if not got:
+        return False
+    try:
+        got_dt = datetime.fromisoformat(str(got).replace("Z", "+00:00"))
+        exp_dt = datetime.fromisoformat(expected)
+    except ValueError:
+        return False
+    if got_dt.tzinfo is None:
+        return False
+    return got_dt == exp_dt and got_dt.utcoffset() == exp_dt.utcoffset()
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _summarize(name, latencies, handled, correct, total, by_kind, cache=None):
+    lat = sorted(latencies)
+    elapsed = sum(lat)
+    return {
+        "tier": name,
+        "expressions": total,
+        "handled": handled,
+        "correct": correct,
+        "accuracy": correct / total if total else 0.0,
+        "parses_per_sec": total / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(lat, 50) * 1000,
+        "p99_ms": _percentile(lat, 99) * 1000,
+        "cache_hit_rate": cache["hit_rate"] if cache else None,
+        "by_kind": by_kind,
+    }
+
+
+def _run(name, corpus, parse_fn, cache_fn=None):
+    latencies = []
+    handled = 0
+    correct = 0
+    by_kind = {}
+
+    for item in corpus:
+        t0 = time.perf_counter()
+        try:
+            got = parse_fn(item)
+        except Exception:
+            got = None
+        latencies.append(time.perf_counter() - t0)
+
+        ok = _is_correct(got, item["expected"])
+        handled += 1 if got else 0
+        correct += 1 if ok else 0
+
+        stats = by_kind.setdefault(item["kind"], {"total": 0, "correct": 0})
+        stats["total"] += 1
+        stats["correct"] += 1 if ok else 0
+
+    cache = cache_fn() if cache_fn else None
+    return _summarize(name, latencies, handled, correct, len(corpus), by_kind, cache)
+
+
+# -----------------------
+# Tiers
+# -----------------------
+def _tier_inputs(item):
+    user_tz = pytz.timezone(item["user_timezone"])
+    base_dt = time_fixer._resolve_base(item["reference_time"], user_tz)
+    raw = item["text"].strip()
+    return raw, time_fixer._normalize_time_text(raw), user_tz, base_dt
+
+
+def _iso(dt):
+    return dt.isoformat() if dt else None
+
+
+def run_fast(corpus):
+    def parse(item):
+        raw, norm, user_tz, base_dt = _tier_inputs(item)
+        return _iso(time_fixer._fast_parse(raw, norm, user_tz, base_dt))
+    return _run("fast", corpus, parse)
+
+
+def run_dateparser(corpus):
+    def parse(item):
+        raw, norm, user_tz, base_dt = _tier_inputs(item)
+        return _iso(time_fixer._dateparser_parse(norm, user_tz, base_dt))
+    return _run("dateparser", corpus, parse)
+
+
+def run_full(corpus, passes=2):
+    time_fixer.clear_cache()
+
+    def parse(item):
+        return time_fixer.fix_time_from_text(
+            item["text"],
+            user_timezone=item["user_timezone"],
+            reference_time=item["reference_time"],
+        )
+
+    results = []
+    for p in range(passes):
+        r = _run(f"full (pass {p + 1})", corpus, parse, time_fixer.get_cache_stats)
+        results.append(r)
+    return results
+
+
+_PROMPT_NOW_RE = re.compile(r"reference current time: (\S+)")
+_PROMPT_TZ_RE = re.compile(r"Assume timezone: (\S+)")
+_PROMPT_TEXT_RE = re.compile(r'Text to convert:\s*"(.*)"')
+
+
+def run_model_stub(corpus, latency_ms=0.0, error_rate=0.0, seed=26):
+    """
+    Runs time_fixer_ai's prompt building and response parsing with a
+    stubbed model (optionally wrong / slow). The stub only sees the
+    prompt: it reads the text, reference time and timezone back out of it
+    and resolves them with time_fixer, so a prompt that drops or garbles
+    any of them costs accuracy. Measures pipeline overhead, not the real
+    model.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "bench-stub")
+    try:
+        import time_fixer_ai
+    except Exception as e:
+        print(f"⚠️ model-stub tier skipped: {e}")
+        return None
+
+    rng = random.Random(seed)
+
+    def stub_model(prompt):
+        if latency_ms:
+            time.sleep(rng.expovariate(1.0 / (latency_ms / 1000.0)))
+        if rng.random() < error_rate:
+            return "Sorry, I can't help with that."
+        now = _PROMPT_NOW_RE.search(prompt)
+        tz = _PROMPT_TZ_RE.search(prompt)
+        text = _PROMPT_TEXT_RE.search(prompt)
+        if not (now and tz and text):
+            return json.dumps({"iso": None})
+        return json.dumps({"iso": time_fixer.fix_time_from_text(
+            text.group(1), user_timezone=tz.group(1), reference_time=now.group(1)
+        )})
+
+    def parse(item):
+        now = time_fixer_ai._reference_now(item["user_timezone"], item["reference_time"])
+        prompt = time_fixer_ai._build_prompt(item["text"], item["user_timezone"], now)
+        return time_fixer_ai._parse_iso_response(stub_model(prompt))
+
+    time_fixer.clear_cache()
+    return _run("model-stub", corpus, parse)
+
+
+# -----------------------
+# Report
+# -----------------------
+def print_report(results, show_kinds=False):
+    header = f"{'tier':<16}{'n':>7}{'handled':>9}{'acc':>8}{'parses/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'cache':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        cache = "-" if r["cache_hit_rate"] is None else f"{r['cache_hit_rate']:.0%}"
+        print(
+            f"{r['tier']:<16}{r['expressions']:>7}{r['handled']:>9}{r['accuracy']:>8.1%}"
+            f"{r['parses_per_sec']:>11.0f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}{cache:>8}"
+        )
+
+    if show_kinds:
+        for r in results:
+            print(f"\n{r['tier']} accuracy by kind:")
+            for kind, s in sorted(r["by_kind"].items()):
+                print(f"  {kind:<16}{s['correct']:>5}/{s['total']:<5}{s['correct'] / s['total']:>8.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark time_fixer parsing tiers.")
+    parser.add_argument("--tiers", default="fast,dateparser,full,model-stub")
+    parser.add_argument("--passes", type=int, default=2, help="passes over the corpus for the cached tier")
+    parser.add_argument("--seed", type=int, default=26)
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--kinds", action="store_true", help="show accuracy per expression kind")
+    parser.add_argument("--dump", help="write the corpus as JSONL and exit")
+    parser.add_argument("--json", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(seed=args.seed)
+
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            for item in corpus:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        print(f"Wrote {len(corpus)} expressions to {args.dump}")
+        return 0
+
+    tiers = [t.strip() for t in args.tiers.split(",") if t.strip()]
+    print(f"Corpus: {len(corpus)} expressions, {len(TIMEZONES)} timezones\n")
+
+    results = []
+    for tier in tiers:
+        if tier == "fast":
+            results.append(run_fast(corpus))
+        elif tier == "dateparser":
+            results.append(run_dateparser(corpus))
+        elif tier == "full":
+            results.extend(run_full(corpus, passes=args.passes))
+        elif tier == "model-stub":
+            r = run_model_stub(corpus, args.stub_latency_ms, args.stub_error_rate, args.seed)
+            if r:
+                results.append(r)
+        else:
+            print(f"Unknown tier: {tier}")
+
+    print_report(results, show_kinds=args.kinds)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
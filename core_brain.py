@@ -1,18 +1,20 @@
 # core_brain.py
 import os
+import csv
+import time
 import asyncio
 import json
-from collections import Counter
-from dotenv import load_dotenv
-from openrouter import OpenRouter
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+import llm_client
+import llm_telemetry
+import prompt_builder
 
 # -----------------------
 # Config
 # -----------------------
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in .env")
+PROVIDER = "openrouter"
 
 # Ranked models for ensemble voting
 MODELS = [
@@ -23,49 +25,396 @@ MODELS = [
     "qwen/qwen3-max-thinking",
 ]
 
-client = OpenRouter(api_key=OPENROUTER_API_KEY)
+# Early-exit voting (None disables it and waits for every model):
+# - QUORUM: return once this many models agree on an intent
+# - TOP_RANKED_QUORUM: return once the first N ranked models all agree
+QUORUM = int(os.getenv("INTENT_QUORUM", "0")) or None
+TOP_RANKED_QUORUM = int(os.getenv("INTENT_TOP_RANKED_QUORUM", "0")) or None
+
+# Per-model deadlines (seconds); a model that misses it abstains
+DEFAULT_MODEL_DEADLINE_SECONDS = float(os.getenv("INTENT_MODEL_DEADLINE_SECONDS", "15"))
+MODEL_DEADLINE_SECONDS = {
+    "qwen/qwen3-max-thinking": 30,
+}
+
+# Hedging: if one of the first HEDGE_TOP_N ranked models hasn't answered
+# by its observed p95 latency, fire a duplicate request and take the first answer
+HEDGE_TOP_N = int(os.getenv("INTENT_HEDGE_TOP_N", "2"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# llm_cache key for intent votes: message, tasks and the last N turns
+# (chat_context ends with the message itself), see _intent_cache_basis
+INTENT_CACHE_TURNS = 3
+
+# Circuit breaker: a model that fails (error, timeout, or slower than
+# BREAKER_SLOW_FRACTION of its deadline) BREAKER_FAILURES times in a row is
+# dropped from voting for BREAKER_OPEN_SECONDS, then one probe call decides
+# whether it comes back (half-open)
+BREAKER_FAILURES = int(os.getenv("INTENT_BREAKER_FAILURES", "3"))
+BREAKER_OPEN_SECONDS = float(os.getenv("INTENT_BREAKER_OPEN_SECONDS", "60"))
+BREAKER_SLOW_FRACTION = 0.8
+
+# Adaptive ranking: order models by agreement with the final vote minus a
+# latency penalty (per second of median latency), once RANK_MIN_SAMPLES exist
+ADAPTIVE_RANKING = os.getenv("INTENT_ADAPTIVE_RANKING", "1") == "1"
+RANK_MIN_SAMPLES = 20
+RANK_LATENCY_WEIGHT = 0.02
+
+# Mode: "ensemble" (every model votes) or "cascade" (cheapest model first,
+# escalating through CASCADE_STAGES only when the answer isn't trusted)
+INTENT_MODE = os.getenv("INTENT_MODE", "ensemble")
+
+# Cascade stages, cheapest / fastest first. Override with
+# INTENT_CASCADE_STAGES="model_a;model_b,model_c;model_d" (";" between stages)
+CASCADE_STAGES = [
+    ["openai/gpt-4o-mini"],
+    ["openai/gpt-5.1", "meta-llama/llama-3.1-70b-instruct"],
+    ["openai/gpt-5.2", "qwen/qwen3-max-thinking"],
+]
+if os.getenv("INTENT_CASCADE_STAGES"):
+    CASCADE_STAGES = [
+        [m.strip() for m in stage.split(",") if m.strip()]
+        for stage in os.getenv("INTENT_CASCADE_STAGES").split(";") if stage.strip()
+    ]
+
+# Escalation policy: a stage's answer is accepted when its valid votes
+# agree and all have confidence >= CASCADE_MIN_CONFIDENCE; otherwise the
+# reasons listed in CASCADE_ESCALATE_ON send the message to the next stage.
+# "unavailable" (every model of a stage has an open breaker) is a reason
+# like the others: without it the cascade stops at the empty stage.
+CASCADE_MIN_CONFIDENCE = float(os.getenv("INTENT_CASCADE_MIN_CONFIDENCE", "0.8"))
+CASCADE_ESCALATE_ON = {
+    reason.strip()
+    for reason in os.getenv(
+        "INTENT_CASCADE_ESCALATE_ON", "low_confidence,disagreement,parse_failure,error,unavailable"
+    ).split(",")
+    if reason.strip()
+}
+
+# Per-message cascade decisions (no message text), for tuning; off by default
+CASCADE_LOG = os.getenv("INTENT_CASCADE_LOG", "0") == "1"
+CASCADE_LOG_CSV = "intent_cascade_log.csv"
+CASCADE_LOG_FIELDS = [
+    "timestamp_utc", "user_id", "intent",
+    "resolved_stage", "models_called", "path", "decision_seconds"
+]
+
+_latencies = {}  # model -> deque of recent successful latencies (seconds)
+_agreement = {}  # model -> deque of recent votes (True = agreed with the decision)
+_breakers = {}   # model -> {"state", "failures", "opened_at", "probing"}
+_cascade_log_lock = threading.Lock()
+_cascade_stats = {
+    "messages": 0, "models_called": 0, "unresolved": 0,
+    "resolved_at_stage": Counter(), "escalations": Counter()
+}
 
 # -----------------------
-# Sync call wrapper
+# Prompt / parsing
 # -----------------------
-def call_model_sync(model_name, user_packet):
-    """
-    Call a single model to detect intent
-    """
+def _intent_messages(user_packet):
     prompt = f"""
 You are an assistant that detects user intent.
 Possible intents: list, create, update, delete, chat
 You are given the user packet:
-{json.dumps(user_packet, indent=2)}
+{prompt_builder.compact_packet_json(user_packet, "intent")}
 Respond in JSON format:
 {{ "intent": "<intent>", "confidence": 0-1, "message": "<short summary>" }}
 """
+    return [{"role": "user", "content": prompt}]
+
+
+def _intent_cache_basis(user_packet):
+    """
+    What an intent answer depends on, for the llm_cache key: the message,
+    the exchange just before it and the task titles/due times. The full
+    prompt also carries the clock and older turns, which change on every
+    message and would make the cache miss almost always.
+    """
+    compact = prompt_builder.compact_packet(user_packet, "intent")
+    basis = {
+        "user_message": compact["user_message"],
+        "chat_context": compact["chat_context"][-INTENT_CACHE_TURNS:],
+        "tasks": compact["tasks"],
+    }
+    return [{"role": "user", "content": prompt_builder.compact_json(basis)}]
+
+
+def _error_vote(model_name, e):
+    return {
+        "intent": "chat",
+        "confidence": 0,
+        "message": f"Error: {str(e)}",
+        "model": model_name,
+        "error": True
+    }
+
+
+# -----------------------
+# Latency tracking
+# -----------------------
+def _record_latency(model_name, seconds):
+    _latencies.setdefault(model_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def model_p95(model_name):
+    """
+    p95 of recent successful calls, or None until HEDGE_MIN_SAMPLES exist.
+    """
+    samples = _latencies.get(model_name)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+def model_deadline(model_name):
+    return MODEL_DEADLINE_SECONDS.get(model_name, DEFAULT_MODEL_DEADLINE_SECONDS)
+
+
+# -----------------------
+# Circuit breaker
+# -----------------------
+def _breaker(model_name):
+    b = _breakers.get(model_name)
+    if b is None:
+        b = _breakers[model_name] = {"state": "closed", "failures": 0, "opened_at": None, "probing": False}
+    return b
+
+
+def breaker_allows(model_name):
+    """
+    True if the model may vote now. An open breaker turns half-open after
+    BREAKER_OPEN_SECONDS and lets exactly one probe call through.
+    """
+    b = _breaker(model_name)
+    if b["state"] == "closed":
+        return True
+    if b["state"] == "open" and time.monotonic() - b["opened_at"] >= BREAKER_OPEN_SECONDS:
+        b["state"] = "half_open"
+    if b["state"] == "half_open" and not b["probing"]:
+        b["probing"] = True
+        return True
+    return False
+
+
+def _record_outcome(model_name, ok):
+    b = _breaker(model_name)
+    b["probing"] = False
+    if ok:
+        if b["state"] != "closed":
+            print(f"✅ intent model {model_name} recovered, breaker closed")
+        b.update(state="closed", failures=0, opened_at=None)
+        return
+
+    b["failures"] += 1
+    if b["state"] == "half_open" or b["failures"] >= BREAKER_FAILURES:
+        if b["state"] != "open":
+            print(f"⛔ intent model {model_name} breaker open after {b['failures']} failure(s)")
+        b.update(state="open", opened_at=time.monotonic())
+
+
+def get_breaker_states():
+    return {
+        m: {"state": _breaker(m)["state"], "failures": _breaker(m)["failures"]}
+        for m in MODELS
+    }
+
+
+# -----------------------
+# Adaptive ranking
+# -----------------------
+def _record_agreement(model_name, agreed):
+    _agreement.setdefault(model_name, deque(maxlen=LATENCY_WINDOW)).append(agreed)
+
+
+def model_score(model_name):
+    """
+    Agreement rate with the final decision minus a latency penalty. Until
+    enough samples exist, the static MODELS order is kept.
+    """
+    score = 1.0 - 0.01 * MODELS.index(model_name)
+
+    agreed = _agreement.get(model_name)
+    if agreed and len(agreed) >= RANK_MIN_SAMPLES:
+        score = sum(agreed) / len(agreed)
+
+    samples = _latencies.get(model_name)
+    if samples and len(samples) >= RANK_MIN_SAMPLES:
+        score -= RANK_LATENCY_WEIGHT * sorted(samples)[len(samples) // 2]
+
+    return score
+
+
+def ranked_models():
+    if not ADAPTIVE_RANKING:
+        return list(MODELS)
+    return sorted(MODELS, key=model_score, reverse=True)
+
+
+# -----------------------
+# Async call (shared pooled client)
+# -----------------------
+async def call_model_async(model_name, user_packet):
+    """
+    Call a single model to detect intent
+    """
+    started = time.perf_counter()
     try:
-        completion = client.chat.send(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            stream=False
+        completion = await llm_client.complete(
+            PROVIDER,
+            model_name,
+            _intent_messages(user_packet),
+            stage="intent",
+            cache_basis=_intent_cache_basis(user_packet),
+            timeout=model_deadline(model_name)
         )
         text = completion.choices[0].message.content.strip()
-        data = json.loads(text)
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            llm_telemetry.record_parse_failure(model_name, "intent")
+            vote = _error_vote(model_name, e)
+            vote["parse_failure"] = True
+            return vote
         data["model"] = model_name
+        # a cache hit's ~0s would drag down the p95 that hedging relies on
+        if not llm_client.from_cache(completion):
+            _record_latency(model_name, time.perf_counter() - started)
         return data
     except Exception as e:
-        return {"intent": "chat", "confidence": 0, "message": f"Error: {str(e)}", "model": model_name}
+        return _error_vote(model_name, e)
+
+
+async def call_model_hedged(model_name, user_packet, ranking=None):
+    """
+    call_model_async bounded by the model's deadline, with one hedged
+    duplicate for top-ranked models that run past their p95 latency.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = model_deadline(model_name)
+
+    hedge_after = None
+    if model_name in (ranking or MODELS)[:HEDGE_TOP_N]:
+        hedge_after = model_p95(model_name)
+        if hedge_after is not None and hedge_after >= deadline:
+            hedge_after = None
+
+    attempts = {asyncio.create_task(call_model_async(model_name, user_packet))}
+    hedged = False
+    last_error = None
+
+    try:
+        while attempts:
+            elapsed = loop.time() - started
+            if elapsed >= deadline:
+                break
+
+            timeout = deadline - elapsed
+            if not hedged and hedge_after is not None:
+                timeout = max(0, hedge_after - elapsed)
+
+            done, attempts = await asyncio.wait(
+                attempts,
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for t in done:
+                result = t.result()
+                if not result.get("error"):
+                    result["hedged"] = hedged
+                    return result
+                last_error = result
+
+            if not done and not hedged and hedge_after is not None:
+                attempts.add(asyncio.create_task(call_model_async(model_name, user_packet)))
+                hedged = True
+    finally:
+        for t in attempts:
+            t.cancel()
+
+    if last_error and not attempts:
+        return last_error
+
+    vote = _error_vote(model_name, f"no answer within {deadline:.1f}s")
+    vote["timed_out"] = True
+    return vote
+
+
+async def call_model_guarded(model_name, user_packet, ranking=None):
+    """
+    call_model_hedged that feeds the model's circuit breaker. Errors,
+    timeouts and slow answers count as failures; cancelled calls (quorum
+    reached elsewhere) don't count either way.
+    """
+    started = time.perf_counter()
+    try:
+        result = await call_model_hedged(model_name, user_packet, ranking)
+    except asyncio.CancelledError:
+        _breaker(model_name)["probing"] = False
+        raise
+
+    slow = time.perf_counter() - started > BREAKER_SLOW_FRACTION * model_deadline(model_name)
+    _record_outcome(model_name, not result.get("error") and not slow)
+    return result
 
 
 # -----------------------
-# Async wrapper
+# Sync wrapper
 # -----------------------
-async def call_model_async(model_name, user_packet):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, call_model_sync, model_name, user_packet)
+def call_model_sync(model_name, user_packet):
+    return llm_client.run_sync(call_model_guarded(model_name, user_packet))
 
 
 # -----------------------
 # Ensemble voting
 # -----------------------
-async def detect_intent(user_packet):
+def _quorum_winner(results, quorum, top_ranked, ranking=None):
+    """
+    Intent agreed by the quorum so far, or None.
+    Error votes never count toward a quorum.
+    """
+    votes = {r["model"]: r["intent"] for r in results if not r.get("error")}
+
+    if top_ranked:
+        top = (ranking or MODELS)[:top_ranked]
+        top_votes = [votes.get(m) for m in top]
+        if all(top_votes) and len(set(top_votes)) == 1:
+            return top_votes[0]
+
+    if quorum and votes:
+        intent, count = Counter(votes.values()).most_common(1)[0]
+        if count >= quorum:
+            return intent
+
+    return None
+
+
+def _record_votes(results, winning_intent):
+    """
+    Agreement with the final decision (does each model pay its way?)
+    """
+    for r in results:
+        if not r.get("error"):
+            agreed = r["intent"] == winning_intent
+            _record_agreement(r["model"], agreed)
+            llm_telemetry.record_vote(r["model"], "intent", agreed)
+
+
+def _winning_response(results, winning_intent, ranking):
+    """
+    Message from the highest-ranked model that predicted the winning intent.
+    """
+    for model_name in ranking:
+        for r in results:
+            if r["model"] == model_name and r["intent"] == winning_intent and not r.get("error"):
+                return r.get("message", "")
+    return None
+
+
+async def detect_intent(user_packet, quorum=None, top_ranked=None, on_vote=None, mode=None):
     """
     user_packet example:
     {
@@ -76,31 +425,222 @@ async def detect_intent(user_packet):
         "user_timezone": str,
         "current_time": ISO string
     }
+
+    quorum / top_ranked override QUORUM / TOP_RANKED_QUORUM. When either is
+    set, voting stops as soon as it is met and outstanding calls are cancelled.
+    on_vote(result) is called for each model result as it arrives.
+    mode overrides INTENT_MODE ("cascade" runs detect_intent_cascade).
+
+    Models whose circuit breaker is open don't vote; error votes abstain.
     """
-    tasks = [call_model_async(m, user_packet) for m in MODELS]
-    results = await asyncio.gather(*tasks)
+    if (mode or INTENT_MODE) == "cascade":
+        return await detect_intent_cascade(user_packet, on_vote=on_vote)
+
+    quorum = QUORUM if quorum is None else quorum
+    top_ranked = TOP_RANKED_QUORUM if top_ranked is None else top_ranked
+    early_exit = bool(quorum or top_ranked)
+
+    started = time.perf_counter()
+    ranking = ranked_models()
+    voting = [m for m in ranking if breaker_allows(m)]
+    skipped = [m for m in ranking if m not in voting]
+    if not voting:
+        # every breaker is open: still ask the best-ranked model
+        voting = ranking[:1]
+
+    pending = {
+        asyncio.create_task(call_model_guarded(m, user_packet, ranking)): m
+        for m in voting
+    }
+
+    results = []
+    quorum_intent = None
+    try:
+        for next_done in asyncio.as_completed(pending):
+            result = await next_done
+            results.append(result)
+            if on_vote:
+                on_vote(result)
+            if early_exit:
+                quorum_intent = _quorum_winner(results, quorum, top_ranked, voting)
+                if quorum_intent:
+                    break
+    finally:
+        for t in pending:
+            if not t.done():
+                t.cancel()
 
-    # Count votes
-    intents = [r["intent"] for r in results]
+    decision_seconds = time.perf_counter() - started
+    voters = [r["model"] for r in results]
+    cancelled = [m for m in voting if m not in voters]
+
+    # Count votes (errors abstain; all-error falls back to chat)
+    intents = [r["intent"] for r in results if not r.get("error")]
     intent_counts = Counter(intents)
-    winning_intent = intent_counts.most_common(1)[0][0]
+    winning_intent = quorum_intent or (intent_counts.most_common(1)[0][0] if intent_counts else "chat")
 
-    # Pick response from highest-ranked model predicting winning intent
-    winning_response = None
-    for model_name in MODELS:
-        for r in results:
-            if r["model"] == model_name and r["intent"] == winning_intent:
-                winning_response = r.get("message", "")
-                break
-        if winning_response:
-            break
+    _record_votes(results, winning_intent)
 
     return {
         "intent": winning_intent,
-        "response": winning_response,
+        "response": _winning_response(results, winning_intent, ranking),
         "stats": {
+            "mode": "ensemble",
             "votes": dict(intent_counts),
-            "model_results": results
+            "model_results": results,
+            "voters": voters,
+            "cancelled": cancelled,
+            "skipped": skipped,
+            "ranking": ranking,
+            "quorum_reached": quorum_intent is not None,
+            "decision_seconds": decision_seconds
+        }
+    }
+
+
+# -----------------------
+# Cascade
+# -----------------------
+def _confidence(result):
+    try:
+        return float(result.get("confidence") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _stage_verdict(stage_results):
+    """
+    (intent, None) if the stage's answer can be trusted, else
+    (None, escalation reason).
+    """
+    valid = [r for r in stage_results if not r.get("error")]
+    if not valid:
+        if any(r.get("parse_failure") for r in stage_results):
+            return None, "parse_failure"
+        return None, "error"
+
+    intents = {r["intent"] for r in valid}
+    if len(intents) > 1:
+        return None, "disagreement"
+    if min(_confidence(r) for r in valid) < CASCADE_MIN_CONFIDENCE:
+        return None, "low_confidence"
+    return valid[0]["intent"], None
+
+
+def _log_cascade(user_packet, intent, resolved, path, seconds):
+    with _cascade_log_lock:
+        file_exists = os.path.exists(CASCADE_LOG_CSV)
+        with open(CASCADE_LOG_CSV, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CASCADE_LOG_FIELDS)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerow({
+                "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+                "user_id": user_packet.get("user_id", ""),
+                "intent": intent,
+                "resolved_stage": "" if resolved is None else resolved,
+                "models_called": sum(len(p["models"]) for p in path),
+                "path": json.dumps(path, ensure_ascii=False),
+                "decision_seconds": round(seconds, 3)
+            })
+
+
+def get_cascade_stats():
+    messages = _cascade_stats["messages"]
+    return {
+        "messages": messages,
+        "resolved_at_stage": dict(_cascade_stats["resolved_at_stage"]),
+        "unresolved": _cascade_stats["unresolved"],
+        "escalations": dict(_cascade_stats["escalations"]),
+        "avg_models_called": (_cascade_stats["models_called"] / messages) if messages else 0.0,
+    }
+
+
+async def detect_intent_cascade(user_packet, on_vote=None):
+    """
+    Ask CASCADE_STAGES in order, stopping at the first stage whose answer
+    passes the escalation policy. The last stage decides by majority over
+    every valid vote so far. Models with an open breaker are skipped; a
+    stage left empty escalates as "unavailable" when CASCADE_ESCALATE_ON
+    lists it, otherwise the cascade stops there. Messages no stage
+    accepted are counted as unresolved in get_cascade_stats().
+
+    Returns the detect_intent() shape; stats["path"] records every stage
+    tried, its votes and why it escalated.
+    """
+    started = time.perf_counter()
+    ranking = ranked_models()
+    results = []
+    path = []
+    skipped = []
+    intent = None
+    resolved = None
+
+    for i, stage in enumerate(CASCADE_STAGES):
+        models = [m for m in stage if breaker_allows(m)]
+        skipped += [m for m in stage if m not in models]
+
+        step = {"stage": i, "models": models, "votes": {}, "escalated": None}
+        path.append(step)
+        if not models:
+            if "unavailable" not in CASCADE_ESCALATE_ON:
+                break
+            step["escalated"] = "unavailable"
+            _cascade_stats["escalations"]["unavailable"] += 1
+            continue
+
+        stage_results = await asyncio.gather(*(call_model_guarded(m, user_packet, ranking) for m in models))
+        for r in stage_results:
+            results.append(r)
+            step["votes"][r["model"]] = None if r.get("error") else [r["intent"], _confidence(r)]
+            if on_vote:
+                on_vote(r)
+
+        intent, reason = _stage_verdict(stage_results)
+        if intent is None and reason not in CASCADE_ESCALATE_ON:
+            # policy says keep what this stage has (if anything valid)
+            valid = [r["intent"] for r in stage_results if not r.get("error")]
+            intent = Counter(valid).most_common(1)[0][0] if valid else None
+        if intent is not None:
+            resolved = i
+            break
+        step["escalated"] = reason
+        _cascade_stats["escalations"][reason] += 1
+
+    if intent is None:
+        valid = Counter(r["intent"] for r in results if not r.get("error"))
+        intent = valid.most_common(1)[0][0] if valid else "chat"
+
+    decision_seconds = time.perf_counter() - started
+    _record_votes(results, intent)
+
+    _cascade_stats["messages"] += 1
+    if resolved is None:
+        _cascade_stats["unresolved"] += 1
+    else:
+        _cascade_stats["resolved_at_stage"][resolved] += 1
+    _cascade_stats["models_called"] += len(results)
+    if CASCADE_LOG:
+        try:
+            await asyncio.to_thread(_log_cascade, user_packet, intent, resolved, path, decision_seconds)
+        except Exception as e:
+            print(f"⚠️ Failed to log intent cascade: {e}")
+
+    return {
+        "intent": intent,
+        "response": _winning_response(results, intent, ranking),
+        "stats": {
+            "mode": "cascade",
+            "votes": dict(Counter(r["intent"] for r in results if not r.get("error"))),
+            "model_results": results,
+            "voters": [r["model"] for r in results],
+            "cancelled": [],
+            "skipped": skipped,
+            "ranking": ranking,
+            "path": path,
+            "resolved_stage": resolved,
+            "quorum_reached": False,
+            "decision_seconds": decision_seconds
         }
     }
 
@@ -109,6 +649,4 @@ async def detect_intent(user_packet):
 # Sync callable
 # -----------------------
 def get_ensemble_intent(user_packet):
-    import nest_asyncio
-    nest_asyncio.apply()
-    return asyncio.run(detect_intent(user_packet))
+    return llm_client.run_sync(detect_intent(user_packet))
@@ -2,9 +2,8 @@ import os
 import csv
 import json
 from datetime import datetime, timezone
-from dotenv import load_dotenv
-from openrouter import OpenRouter
 import pytz
+import llm_client
 
 # -----------------------
 # Config
@@ -13,16 +12,6 @@ TASKS_CSV = "tasks.csv"
 DATABASE_JSON = "database.json"
 REMINDERS_LOG_CSV = "reminders_sent.csv"
 
-# -----------------------
-# Load environment
-# -----------------------
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("🚨 OPENROUTER_API_KEY not found in .env")
-
-client = OpenRouter(api_key=OPENROUTER_API_KEY)
-
 # -----------------------
 # Data loaders
 # -----------------------
@@ -160,10 +149,11 @@ def generate_ai_daily_summary(tasks):
     )
 
     try:
-        completion = client.chat.send(
+        completion = llm_client.complete_sync(
+            "openrouter",
             model="openai/gpt-5.2",
-            messages=[{"role": "user", "content": prompt}],
-            stream=False
+            stage="morning_summary",
+            messages=[{"role": "user", "content": prompt}]
         )
         return completion.choices[0].message.content.strip()
     except Exception as e:
@@ -1,13 +1,36 @@
 # ensemble.py
+import os
+import time
 import asyncio
-from core_brain import get_ensemble_intent as core_brain_intent
+import threading
+import llm_client
+import speculation
+from core_brain import get_ensemble_intent as core_brain_intent, detect_intent
+from intent_rules import classify as rule_based_intent
+from local_intent import (
+    classify as local_model_intent,
+    predict as local_model_predict,
+    log_vote as log_intent_vote
+)
 from task_utils import normalize_user_id, load_user_tasks
 from ai_core_packet import process_packet as ai_chat_processor
 from ai_core_create import process_create_packet as ai_create_processor
 from ai_core_update import process_update_packet as ai_update_processor
 from ai_core_delete import process_delete_packet as ai_delete_processor
+from ai_core_combined import process_combined_packet as ai_combined_processor
 from list_fun import get_user_task_list  # your GPT-based task listing
 
+# "ensemble": core_brain vote, then the matching ai_core_* processor
+# "single_call": one function-calling request for intent + parameters
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "ensemble")
+
+# Start the likely action processor while core_brain is still voting
+SPECULATIVE_EXECUTION = os.getenv("SPECULATIVE_EXECUTION", "0") == "1"
+SPECULATABLE_INTENTS = {"create", "update", "delete", "list", "chat"}
+
+_speculation_lock = threading.Lock()
+_speculation_stats = {"started": 0, "hits": 0, "misses": 0, "wasted_seconds": 0.0}
+
 # -----------------------
 # Async stub for list actions
 # -----------------------
@@ -34,11 +57,127 @@ def get_ensemble_response(packet):
             "response_text": "User ID missing."
         }
 
-    # ----- Step 1: Detect intent via core brain -----
+    # ----- Step 1: Detect intent (rules, local model, then core brain) -----
+    fast_result = rule_based_intent(packet) or local_model_intent(packet)
+    if fast_result:
+        return route_intent(fast_result["intent"], packet)
+
+    if PIPELINE_MODE == "single_call":
+        combined = ai_combined_processor(packet)
+        if combined:
+            if combined["action"] == "list":
+                return route_intent("list", packet)
+            return combined
+
+    if SPECULATIVE_EXECUTION:
+        response, intent_result = llm_client.run_sync(_speculative_response(packet))
+        _log_votes(packet, intent_result)
+        return response
+
     intent_result = core_brain_intent(packet)
     intent = intent_result.get("intent", "chat")
+    _log_votes(packet, intent_result)
 
     # ----- Step 2: Trigger action based on intent -----
+    return route_intent(intent, packet)
+
+
+def _log_votes(packet, intent_result):
+    try:
+        log_intent_vote(packet, intent_result)
+    except Exception as e:
+        print(f"⚠️ Failed to log intent votes: {e}")
+
+
+# -----------------------
+# Speculative execution
+# -----------------------
+def _record_speculation(key):
+    with _speculation_lock:
+        _speculation_stats[key] += 1
+
+
+def get_speculation_stats():
+    with _speculation_lock:
+        stats = dict(_speculation_stats)
+    decided = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / decided) if decided else 0.0
+    stats["waste_rate"] = (stats["misses"] / decided) if decided else 0.0
+    return stats
+
+
+def _record_waste(task, started):
+    """
+    Done-callback of a discarded speculative run: the worker thread can't
+    be interrupted, so the waste is counted until it actually finishes.
+    """
+    with _speculation_lock:
+        _speculation_stats["wasted_seconds"] += time.perf_counter() - started
+    if not task.cancelled():
+        task.exception()  # retrieve it so asyncio doesn't warn
+
+
+async def _speculative_response(packet):
+    """
+    Runs route_intent() for a guessed intent while core_brain votes.
+    The guess is the local model's prediction (any confidence) or, failing
+    that, the first valid vote to arrive. The speculative result is kept if
+    the final intent matches; otherwise it is discarded and the right
+    handler runs.
+    The speculative run's cache writes and router outcomes are deferred
+    (speculation.py) and only applied on a hit. Its model calls still
+    happen (and show up in llm_telemetry); a discarded run's worker thread
+    finishes its request, and wasted_seconds counts until it does.
+    """
+    spec = {"intent": None, "task": None, "started": None}
+
+    def start(intent):
+        if spec["task"] is not None or intent not in SPECULATABLE_INTENTS:
+            return
+        spec["intent"] = intent
+        spec["started"] = time.perf_counter()
+        spec["task"] = asyncio.ensure_future(
+            asyncio.to_thread(speculation.run, route_intent, intent, packet)
+        )
+        _record_speculation("started")
+
+    try:
+        prior, _ = local_model_predict(packet.get("user_message"))
+    except Exception:
+        prior = None
+    if prior:
+        start(prior)
+
+    def on_vote(result):
+        if not result.get("error"):
+            start(result.get("intent"))
+
+    intent_result = await detect_intent(packet, on_vote=on_vote)
+    intent = intent_result.get("intent", "chat")
+
+    if spec["task"] is not None:
+        if spec["intent"] == intent:
+            _record_speculation("hits")
+            response, pending = await spec["task"]
+            speculation.commit(pending)
+            return response, intent_result
+
+        _record_speculation("misses")
+        started = spec["started"]
+        spec["task"].add_done_callback(lambda task: _record_waste(task, started))
+
+    return await asyncio.to_thread(route_intent, intent, packet), intent_result
+
+
+# -----------------------
+# Intent -> action handlers
+# -----------------------
+def route_intent(intent, packet):
+    """
+    Runs the ai_core processor (or list_fun) for an already-decided intent.
+    """
+    user_id = packet.get("user_id")
+
     if intent == "create":
         create_result = ai_create_processor({**packet, "intent": "create"})
         params = create_result.get("parameters") or {}
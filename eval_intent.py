@@ -0,0 +1,470 @@
+# eval_intent.py
+#
+# Offline evaluation of intent / action strategies on a labelled corpus.
+#
+# Every corpus message (with a fixed set of fixture tasks) is decided by
+# each strategy:
+#   - full        : core_brain.detect_intent, every model votes
+#   - quorum      : detect_intent stopping at --quorum agreeing votes
+#   - cascade     : detect_intent(mode="cascade")
+#   - single_call : ai_core_combined (falls back to the full vote, like
+#                   ensemble.get_ensemble_response does)
+#   - local       : intent_rules + local_intent, full vote when neither
+#                   is sure (needs --local-model for the classifier)
+#   - speculative : the full vote with ensemble's speculative execution;
+#                   the action always runs (its latency is part of the
+#                   decision), so compare it with --actions runs. Its
+#                   speculation hit / waste rates are reported too
+# With --actions the decided intent is also run through the matching
+# ai_core_* processor (ensemble.route_intent) and the action and target
+# task (google_id) are checked too.
+#
+# Reports accuracy, p50/p95 latency and model calls per message: calls
+# that completed (answer or error) and calls cancelled before finishing
+# (lost a hedge or quorum race) in separate columns. Each strategy first
+# runs one discarded pass over the corpus (with --actions, through the
+# action processors too), so one-off costs like imports, connections and
+# dateparser's lazily loaded data (per phrase shape, not just the first
+# call) are not charged to whichever strategy runs first.
+#
+# Backends:
+#   stub   : llm_stub_server (default; numbers measure the pipeline, not
+#            model quality)
+#   live   : the real providers
+#   replay : answers from a --record file with their recorded latency
+#            (see llm_replay), so strategies are compared on real answers
+# --record <file> keeps the live (or stub) responses for later replays.
+#
+# Usage:
+#   python eval_intent.py
+#   python eval_intent.py --strategies full,cascade --actions --json eval.json
+#   python eval_intent.py --backend live --record eval_recording.jsonl
+#   python eval_intent.py --backend replay --replay eval_recording.jsonl
+#   python eval_intent.py --corpus my_corpus.jsonl --local-model intent_model.json
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# -----------------------
+# Corpus
+# -----------------------
+USER_ID = "user_eval"
+USER_TIMEZONE = "Africa/Lagos"
+
+# (title, details, due in days)
+FIXTURE_TASKS = [
+    ("Gym session", "leg day", 1),
+    ("Quarterly report", "finish the draft", 2),
+    ("Dentist appointment", "", 3),
+    ("Buy groceries", "milk, eggs", 4),
+    ("Call mom", "", 5),
+    ("Pay electricity bill", "", 6),
+]
+
+# {"message", "intent", "target"}: target is the fixture title an
+# update / delete must act on
+CORPUS = [
+    {"message": "remind me to call the plumber tomorrow at 5pm", "intent": "create"},
+    {"message": "add a task to renew my passport on friday", "intent": "create"},
+    {"message": "schedule a meeting with Ada next monday 10am", "intent": "create"},
+    {"message": "I need to water the plants every evening", "intent": "create"},
+    {"message": "create a reminder for the team standup at 9", "intent": "create"},
+    {"message": "new task: book flight to Abuja", "intent": "create"},
+    {"message": "move the gym session to saturday morning", "intent": "update", "target": "Gym session"},
+    {"message": "change the quarterly report deadline to thursday", "intent": "update", "target": "Quarterly report"},
+    {"message": "push my dentist appointment to next week", "intent": "update", "target": "Dentist appointment"},
+    {"message": "rename buy groceries to buy groceries and bread", "intent": "update", "target": "Buy groceries"},
+    {"message": "reschedule call mom to sunday evening", "intent": "update", "target": "Call mom"},
+    {"message": "delete the groceries task", "intent": "delete", "target": "Buy groceries"},
+    {"message": "cancel the dentist appointment", "intent": "delete", "target": "Dentist appointment"},
+    {"message": "remove the gym session", "intent": "delete", "target": "Gym session"},
+    {"message": "I already paid the electricity bill, get rid of it", "intent": "delete", "target": "Pay electricity bill"},
+    {"message": "what do I have today", "intent": "list"},
+    {"message": "show my tasks for this week", "intent": "list"},
+    {"message": "list my pending tasks", "intent": "list"},
+    {"message": "when is my dentist appointment", "intent": "list"},
+    {"message": "which tasks are about the report", "intent": "list"},
+    {"message": "anything due tomorrow?", "intent": "list"},
+    {"message": "hey, how are you?", "intent": "chat"},
+    {"message": "thanks, that helps a lot", "intent": "chat"},
+    {"message": "good morning", "intent": "chat"},
+    {"message": "what can you do?", "intent": "chat"},
+    {"message": "I'm feeling a bit overwhelmed today", "intent": "chat"},
+    {"message": "lol ok", "intent": "chat"},
+]
+
+STRATEGIES = ["full", "quorum", "cascade", "single_call", "local", "speculative"]
+
+
+def load_corpus(path):
+    """
+    JSONL, one {"message", "intent", "target"?} per line.
+    """
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                corpus.append(json.loads(line))
+    return corpus
+
+
+# -----------------------
+# Environment
+# -----------------------
+def _write_fixtures(workdir):
+    from task_utils import CSV_FIELDS
+
+    with open(os.path.join(workdir, "database.json"), "w", encoding="utf-8") as f:
+        json.dump({USER_ID: {"refresh_token": "eval", "timezone": USER_TIMEZONE}}, f)
+
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    with open(os.path.join(workdir, "tasks.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for i, (title, details, days) in enumerate(FIXTURE_TASKS):
+            writer.writerow({
+                "user_id": USER_ID, "title": title, "details": details,
+                "due": (now + timedelta(days=days)).isoformat(),
+                "status": "pending", "google_status": "done",
+                "google_id": _fixture_id(i), "ai_comment": ""
+            })
+
+
+def _fixture_id(i):
+    return f"eval-g{i}"
+
+
+def _target_id(title):
+    for i, (t, _, _) in enumerate(FIXTURE_TASKS):
+        if t == title:
+            return _fixture_id(i)
+    return None
+
+
+def _reset_state():
+    import core_brain
+    import ensemble
+    import llm_telemetry
+    llm_telemetry.reset()
+    core_brain._latencies.clear()
+    core_brain._agreement.clear()
+    core_brain._breakers.clear()
+    with ensemble._speculation_lock:
+        ensemble._speculation_stats.update(started=0, hits=0, misses=0, wasted_seconds=0.0)
+
+
+def _packet(message):
+    import pytz
+    from task_utils import load_user_tasks
+
+    return {
+        "user_id": USER_ID,
+        "user_message": message,
+        "chat_context": [],
+        "tasks": load_user_tasks(USER_ID)[:40],
+        "user_timezone": USER_TIMEZONE,
+        "current_time": datetime.now(pytz.timezone(USER_TIMEZONE)).isoformat()
+    }
+
+
+def _model_calls():
+    """
+    (completed, cancelled) model calls so far.
+    """
+    import llm_telemetry
+    summary = llm_telemetry.model_summary().values()
+    return sum(r["finished"] for r in summary), sum(r["cancelled"] for r in summary)
+
+
+# -----------------------
+# Strategies
+# -----------------------
+def decide(strategy, packet, quorum):
+    """
+    (intent, path, combined_result) for one packet. path tells which part
+    of the strategy answered; combined_result is set when the single-call
+    or speculative pipeline already produced the action.
+    """
+    import llm_client
+    import core_brain
+    import ensemble
+    from intent_rules import classify as rule_based_intent
+    from local_intent import classify as local_model_intent
+    from ai_core_combined import process_combined_packet
+
+    def vote(**kwargs):
+        return llm_client.run_sync(core_brain.detect_intent(packet, **kwargs))["intent"]
+
+    if strategy == "full":
+        return vote(quorum=0, top_ranked=0, mode="ensemble"), "vote", None
+
+    if strategy == "quorum":
+        return vote(quorum=quorum, top_ranked=0, mode="ensemble"), "quorum", None
+
+    if strategy == "cascade":
+        return vote(mode="cascade"), "cascade", None
+
+    if strategy == "single_call":
+        combined = process_combined_packet(packet)
+        if combined:
+            return combined["action"], "single_call", combined
+        return vote(quorum=0, top_ranked=0, mode="ensemble"), "fallback_vote", None
+
+    if strategy == "local":
+        rule = rule_based_intent(packet)
+        if rule:
+            return rule["intent"], "rules", None
+        local = local_model_intent(packet)
+        if local:
+            return local["intent"], "local_model", None
+        return vote(quorum=0, top_ranked=0, mode="ensemble"), "fallback_vote", None
+
+    if strategy == "speculative":
+        response, intent_result = llm_client.run_sync(ensemble._speculative_response(packet))
+        return intent_result["intent"], "speculative", response
+
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def act(intent, path, packet, combined):
+    """
+    The action result get_ensemble_response would return for this decision.
+    """
+    from ensemble import route_intent
+
+    if combined and (path == "speculative" or combined.get("action") != "list"):
+        return combined
+    return route_intent(intent, packet)
+
+
+# -----------------------
+# Evaluation
+# -----------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def warm_up(strategy, corpus, quorum, actions):
+    """
+    One discarded pass over the corpus through the strategy (and the
+    action processors with --actions).
+    """
+    for item in corpus:
+        packet = _packet(item["message"])
+        try:
+            intent, path, combined = decide(strategy, packet, quorum)
+            if actions:
+                act(intent, path, packet, combined)
+        except Exception as e:
+            print(f"⚠️ warm-up failed ({strategy}): {type(e).__name__}: {e}")
+
+
+def run_strategy(strategy, corpus, quorum, actions, passes):
+    warm_up(strategy, corpus, quorum, actions)
+    _reset_state()
+    rows = []
+
+    for _ in range(passes):
+        for item in corpus:
+            packet = _packet(item["message"])
+            completed_before, cancelled_before = _model_calls()
+            started = time.perf_counter()
+            row = {"message": item["message"], "expected": item["intent"], "error": None}
+
+            try:
+                intent, path, combined = decide(strategy, packet, quorum)
+                row.update({"intent": intent, "path": path})
+                if actions:
+                    result = act(intent, path, packet, combined) or {}
+                    row["action"] = result.get("action")
+                    row["google_id"] = (result.get("parameters") or {}).get("google_id")
+            except Exception as e:
+                row.update({"intent": None, "path": "error", "error": f"{type(e).__name__}: {e}"})
+
+            row["seconds"] = time.perf_counter() - started
+            completed, cancelled = _model_calls()
+            row["calls"] = completed - completed_before
+            row["cancelled_calls"] = cancelled - cancelled_before
+
+            row["intent_ok"] = row["intent"] == item["intent"]
+            if actions:
+                row["action_ok"] = row.get("action") == item["intent"]
+                if item.get("target"):
+                    row["target_ok"] = row.get("google_id") == _target_id(item["target"])
+            rows.append(row)
+
+    return summarize(strategy, rows, actions)
+
+
+def summarize(strategy, rows, actions):
+    n = len(rows)
+    lat = sorted(r["seconds"] for r in rows)
+    paths = {}
+    for r in rows:
+        paths[r["path"]] = paths.get(r["path"], 0) + 1
+
+    summary = {
+        "strategy": strategy,
+        "messages": n,
+        "intent_accuracy": sum(r["intent_ok"] for r in rows) / n if n else 0.0,
+        "p50_ms": _percentile(lat, 50) * 1000,
+        "p95_ms": _percentile(lat, 95) * 1000,
+        "calls_per_message": sum(r["calls"] for r in rows) / n if n else 0.0,
+        "cancelled_per_message": sum(r["cancelled_calls"] for r in rows) / n if n else 0.0,
+        "errors": sum(1 for r in rows if r["error"]),
+        "paths": paths,
+        "mistakes": [
+            {k: r.get(k) for k in ("message", "expected", "intent", "action", "google_id", "path", "error")}
+            for r in rows
+            if not r["intent_ok"] or not r.get("action_ok", True) or not r.get("target_ok", True)
+        ],
+    }
+
+    if strategy == "speculative":
+        import ensemble
+        summary["speculation"] = ensemble.get_speculation_stats()
+
+    if actions:
+        targeted = [r for r in rows if "target_ok" in r]
+        summary["action_accuracy"] = sum(r["action_ok"] for r in rows) / n if n else 0.0
+        summary["target_accuracy"] = (
+            sum(r["target_ok"] for r in targeted) / len(targeted) if targeted else None
+        )
+
+    return summary
+
+
+# -----------------------
+# Report
+# -----------------------
+def print_report(results, actions):
+    header = f"{'strategy':<14}{'n':>5}{'intent':>8}"
+    if actions:
+        header += f"{'action':>8}{'target':>8}"
+    header += f"{'p50 ms':>9}{'p95 ms':>9}{'calls/msg':>11}{'cancel/msg':>12}{'err':>5}"
+    print(header)
+    print("-" * len(header))
+
+    for r in results:
+        line = f"{r['strategy']:<14}{r['messages']:>5}{r['intent_accuracy']:>8.1%}"
+        if actions:
+            target = r["target_accuracy"]
+            line += f"{r['action_accuracy']:>8.1%}" + (f"{target:>8.1%}" if target is not None else f"{'-':>8}")
+        line += (
+            f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+            f"{r['calls_per_message']:>11.2f}{r['cancelled_per_message']:>12.2f}{r['errors']:>5}"
+        )
+        print(line)
+
+    print("\npaths:")
+    for r in results:
+        print(f"  {r['strategy']:<14}{json.dumps(r['paths'])}")
+
+    for r in results:
+        spec = r.get("speculation")
+        if spec:
+            print(
+                f"\nspeculation ({r['strategy']}): {spec['started']} started, "
+                f"hit rate {spec['hit_rate']:.1%}, waste rate {spec['waste_rate']:.1%}, "
+                f"{spec['wasted_seconds']:.2f}s wasted"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare intent strategies on a labelled corpus.")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--corpus", help="JSONL corpus (default: built-in CORPUS)")
+    parser.add_argument("--dump", help="write the built-in corpus to this JSONL file and exit")
+    parser.add_argument("--actions", action="store_true", help="also run the action processors")
+    parser.add_argument("--quorum", type=int, default=3)
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--backend", choices=["stub", "live", "replay"], default="stub")
+    parser.add_argument("--record", help="append model responses to this file (for --backend replay)")
+    parser.add_argument("--replay", help="replay backend: recorded responses file")
+    parser.add_argument("--local-model", help="intent_model.json for the local strategy")
+    parser.add_argument("--stub-latency", default="lognormal:300,0.4")
+    parser.add_argument("--stub-port", type=int, default=8198)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            for item in CORPUS:
+                f.write(json.dumps(item) + "\n")
+        print(f"💾 {len(CORPUS)} messages written to {args.dump}")
+        return
+
+    corpus = load_corpus(os.path.abspath(args.corpus)) if args.corpus else CORPUS
+    local_model = os.path.abspath(args.local_model) if args.local_model else None
+    record = os.path.abspath(args.record) if args.record else None
+    replay = os.path.abspath(args.replay) if args.replay else None
+    json_out = os.path.abspath(args.json) if args.json else None
+    if args.backend == "replay" and not replay:
+        parser.error("--backend replay needs --replay <file>")
+
+    # every decision must reach the models: no cached answers
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["CHAT_CACHE"] = "0"
+    if args.backend == "stub":
+        os.environ["LLM_STUB_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+
+    # repo modules read/write relative paths: run inside a scratch directory
+    # (removed with its fixtures and state files when the run ends)
+    scratch = tempfile.TemporaryDirectory(prefix="eval_intent_")
+    workdir = scratch.name
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    _write_fixtures(workdir)
+    if local_model:
+        shutil.copy(local_model, os.path.join(workdir, "intent_model.json"))
+
+    import llm_replay
+    if replay:
+        llm_replay.start_replay(replay)
+    elif record:
+        llm_replay.start_recording(record)
+
+    server = None
+    if args.backend == "stub":
+        import llm_stub_server
+        server = llm_stub_server.serve(args.stub_port, latency=args.stub_latency, seed=args.seed)
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    results = []
+    try:
+        for strategy in strategies:
+            print(f"▶️ {strategy}: {len(corpus) * args.passes} messages")
+            results.append(run_strategy(strategy, corpus, args.quorum, args.actions, args.passes))
+    finally:
+        if server:
+            server.shutdown()
+        os.chdir(REPO_DIR)
+        scratch.cleanup()
+
+    print()
+    print_report(results, args.actions)
+    if replay:
+        print(f"\nreplay: {json.dumps(llm_replay.get_stats())}")
+
+    if json_out:
+        with open(json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {json_out}")
+
+
+if __name__ == "__main__":
+    main()
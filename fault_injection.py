@@ -0,0 +1,264 @@
+# fault_injection.py
+#
+# Injectable faults for the model clients (llm_client) and the Google
+# HTTP calls in ayth_script, for benchmark runs (see bench_faults.py).
+#
+# A profile configures two targets, "llm" and "google":
+#   {"latency": "lognormal:800,0.5",   # extra delay (see parse_latency)
+#    "error_rate": 0.1, "error_status": 429,
+#    "timeout_rate": 0.02, "hang_seconds": 30,
+#    "malformed_rate": 0.05,
+#    "match": ["openrouter"]}          # only providers / URLs containing these
+#
+# - error: OpenAI SDK status error (llm) or an HTTP error response (google)
+# - timeout: the call hangs for hang_seconds (capped at the client timeout)
+#   and then raises the client's timeout error
+# - malformed: a successful call whose body is not valid JSON
+#
+# Nothing is injected unless a profile is active: FAULT_PROFILE=<name>
+# in the environment, or set_profile() at runtime.
+
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+
+# -----------------------
+# Profiles
+# -----------------------
+PROFILES = {
+    "none": {},
+    "slow_llm": {"llm": {"latency": "lognormal:1500,0.6"}},
+    "openrouter_429": {"llm": {"error_rate": 0.2, "error_status": 429, "match": ["openrouter"]}},
+    "llm_5xx": {"llm": {"error_rate": 0.1, "error_status": 503}},
+    "llm_hang": {"llm": {"timeout_rate": 0.05, "hang_seconds": 60}},
+    "malformed_json": {"llm": {"malformed_rate": 0.1}},
+    "slow_google_token": {"google": {"latency": "lognormal:2000,0.5", "match": ["token"]}},
+    "google_5xx": {"google": {"error_rate": 0.1, "error_status": 503}},
+    "google_hang": {"google": {"timeout_rate": 0.05, "hang_seconds": 30}},
+    "degraded": {
+        "llm": {"latency": "lognormal:800,0.5", "error_rate": 0.05, "error_status": 429,
+                "timeout_rate": 0.01, "hang_seconds": 30, "malformed_rate": 0.02},
+        "google": {"latency": "lognormal:500,0.5", "error_rate": 0.05, "error_status": 503},
+    },
+}
+
+MALFORMED_BODY = '{"intent": "cre'
+
+_lock = threading.Lock()
+_active = {"name": None, "targets": {}}
+_stats = Counter()  # "target:kind" -> count
+
+
+# -----------------------
+# Latency distributions (also used by llm_stub_server)
+# -----------------------
+def parse_latency(spec):
+    """
+    "fixed:MS" | "uniform:MIN,MAX" | "lognormal:MEDIAN,SIGMA" | "exp:MEAN"
+    Returns a sampler () -> seconds.
+    """
+    kind, _, args = (spec or "fixed:0").partition(":")
+    vals = [float(v) for v in args.split(",") if v.strip()] if args else []
+
+    if kind == "fixed":
+        return lambda: vals[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(vals[0], vals[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(max(vals[0], 1e-3))
+        return lambda: random.lognormvariate(mu, vals[1]) / 1000
+    if kind == "exp":
+        return lambda: random.expovariate(1 / vals[0]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+# -----------------------
+# Activation
+# -----------------------
+def _compile(spec):
+    spec = dict(spec or {})
+    spec["sampler"] = parse_latency(spec["latency"]) if spec.get("latency") else None
+    return spec
+
+
+def set_profile(profile):
+    """
+    Activate a profile by name (see PROFILES) or as a dict; None disables.
+    """
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown fault profile: {profile}")
+        name, targets = profile, PROFILES[profile]
+    elif profile:
+        name, targets = "custom", profile
+    else:
+        name, targets = None, {}
+
+    with _lock:
+        _active["name"] = name
+        _active["targets"] = {t: _compile(spec) for t, spec in targets.items()}
+        _stats.clear()
+
+    if name and name != "none":
+        print(f"🧨 Fault profile active: {name}")
+
+
+def active_profile():
+    return _active["name"]
+
+
+def enabled():
+    return _active["name"] not in (None, "none")
+
+
+def get_stats():
+    with _lock:
+        return {"profile": _active["name"], **dict(_stats)}
+
+
+def _count(target, kind):
+    with _lock:
+        _stats[f"{target}:{kind}"] += 1
+
+
+def _plan(target, key):
+    """
+    Faults to apply to one call: (delay_seconds, fault, spec) where fault
+    is None, "error", "timeout" or "malformed".
+    """
+    spec = _active["targets"].get(target)
+    if not spec:
+        return 0.0, None, None
+    if spec.get("match") and not any(m in (key or "") for m in spec["match"]):
+        return 0.0, None, None
+
+    delay = max(0.0, spec["sampler"]()) if spec["sampler"] else 0.0
+    roll = random.random()
+    fault = None
+    for kind in ("error", "timeout", "malformed"):
+        rate = spec.get(f"{kind}_rate") or 0.0
+        if roll < rate:
+            fault = kind
+            break
+        roll -= rate
+
+    _count(target, "calls")
+    if delay:
+        _count(target, "delayed")
+    if fault:
+        _count(target, fault)
+    return delay, fault, spec
+
+
+# -----------------------
+# LLM (llm_client)
+# -----------------------
+def _status_error(status, provider):
+    import httpx
+    import openai
+
+    request = httpx.Request("POST", f"https://{provider}.invalid/chat/completions")
+    response = httpx.Response(status, request=request)
+    message = f"Injected fault: HTTP {status}"
+    if status == 429:
+        return openai.RateLimitError(message, response=response, body=None)
+    if status >= 500:
+        return openai.InternalServerError(message, response=response, body=None)
+    return openai.APIStatusError(message, response=response, body=None)
+
+
+async def llm_call(provider, call, timeout_seconds):
+    """
+    Run call() (a coroutine factory for the real request) with the
+    active profile's faults for this provider.
+    """
+    delay, fault, spec = _plan("llm", provider)
+    if delay:
+        await asyncio.sleep(delay)
+
+    if fault == "error":
+        raise _status_error(spec.get("error_status", 500), provider)
+
+    if fault == "timeout":
+        import openai
+        await asyncio.sleep(min(spec.get("hang_seconds", timeout_seconds), timeout_seconds))
+        raise openai.APITimeoutError(request=_status_error(504, provider).request)
+
+    completion = await call()
+
+    if fault == "malformed":
+        try:
+            completion.choices[0].message.content = MALFORMED_BODY
+        except (AttributeError, IndexError):
+            pass
+    return completion
+
+
+# -----------------------
+# Google HTTP (ayth_script)
+# -----------------------
+def _fake_response(status, body, url):
+    import requests
+
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body.encode()
+    resp.url = url
+    resp.headers["Content-Type"] = "application/json"
+    return resp
+
+
+class FaultyRequests:
+    """
+    Drop-in for the requests functions ayth_script uses (get, post,
+    patch, delete) that applies the "google" target's faults.
+    """
+
+    def __init__(self, session, timeout_seconds=30):
+        self.session = session
+        self.timeout_seconds = timeout_seconds
+
+    def _request(self, method, url, **kwargs):
+        delay, fault, spec = _plan("google", url)
+        if delay:
+            time.sleep(delay)
+
+        if fault == "error":
+            status = spec.get("error_status", 500)
+            body = json.dumps({"error": {"code": status, "message": "Injected fault"}})
+            return _fake_response(status, body, url)
+
+        if fault == "timeout":
+            import requests
+            time.sleep(min(spec.get("hang_seconds", self.timeout_seconds), self.timeout_seconds))
+            raise requests.exceptions.Timeout(f"Injected timeout: {method.upper()} {url}")
+
+        if fault == "malformed":
+            self.session.request(method, url, **kwargs)
+            return _fake_response(200, MALFORMED_BODY, url)
+
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self._request("get", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._request("post", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self._request("patch", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._request("delete", url, **kwargs)
+
+
+# -----------------------
+# Startup
+# -----------------------
+if os.getenv("FAULT_PROFILE"):
+    set_profile(os.getenv("FAULT_PROFILE"))
@@ -3,8 +3,8 @@
 import os
 import csv
 from datetime import datetime, timezone
-from dotenv import load_dotenv
-from openrouter import OpenRouter
+import llm_client
+import task_fragments
 
 # -----------------------
 # Config
@@ -20,19 +20,6 @@ REMINDER_MINUTES = [30, 10, 1]
 
 WINDOW_SECONDS = 30   # allow small clock drift (±30s)
 
-# -----------------------
-# Env / client
-# -----------------------
-
-load_dotenv()
-
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in .env")
-
-client = OpenRouter(api_key=OPENROUTER_API_KEY)
-
-
 # -----------------------
 # CSV helpers
 # -----------------------
@@ -62,6 +49,8 @@ def save_tasks(rows):
         writer.writeheader()
         writer.writerows(rows)
 
+    task_fragments.invalidate_all()
+
 
 def load_existing_queue_keys():
     if not os.path.exists(REMINDERS_QUEUE_CSV):
@@ -121,10 +110,11 @@ def generate_ai_reminder(task_title, ai_comment="", minutes_left=None):
             prompt += f"\nIt is due in {int(minutes_left)} minutes."
 
     try:
-        completion = client.chat.send(
+        completion = llm_client.complete_sync(
+            "openrouter",
             model="openai/gpt-5.2",
-            messages=[{"role": "user", "content": prompt}],
-            stream=False
+            stage="hard_starter",
+            messages=[{"role": "user", "content": prompt}]
         )
 
         text = completion.choices[0].message.content.strip()
@@ -7,6 +7,8 @@ import pytz
 import csv
 from difflib import SequenceMatcher
 
+import prompt_builder
+import task_fragments
 from upload_pending_tasks import upload_pending_tasks
 from ensemble import get_ensemble_response
 from task_utils import (
@@ -139,6 +141,8 @@ def save_task(task):
         writer.writeheader()
         writer.writerows(rows)
 
+    task_fragments.invalidate(task["user_id"])
+
 
 def mark_task_for_delete(user_id, google_id):
     uid = normalize_user_id(user_id)
@@ -163,6 +167,8 @@ def mark_task_for_delete(user_id, google_id):
             writer.writeheader()
             writer.writerows(rows)
 
+        task_fragments.invalidate(uid, [google_id])
+
     return found
 
 
@@ -251,6 +257,7 @@ def ai_thought(user_id, message):
                     writer.writeheader()
                     writer.writerows(rows)
 
+                task_fragments.invalidate(user_id)
                 trigger_background_upload()
 
     # ---------------- DELETE ----------------
@@ -285,4 +292,7 @@ def ai_thought(user_id, message):
         reply = response_text or "Okay."
 
     save_chat_context(user_id, "assistant", reply)
+
+    # fold turns that left the raw window into the rolling summary
+    prompt_builder.schedule_summary_update(user_id, load_chat_context(user_id, 40))
     return reply
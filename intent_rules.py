@@ -0,0 +1,160 @@
+# intent_rules.py
+#
+# Deterministic pre-classifier that runs before the LLM ensemble.
+# Resolves only high-confidence intents (small talk and plain list
+# queries) from keyword/regex patterns plus the user's task titles,
+# and returns None whenever it is unsure so the ensemble decides.
+# Small talk is never resolved right after the assistant asked something:
+# "ok" / "sure" then answer the question ("Delete the gym task?").
+
+import re
+import threading
+from difflib import SequenceMatcher
+
+# -----------------------
+# Patterns
+# -----------------------
+# every word in the message must be one of these for a "chat" hit
+SMALL_TALK_WORDS = {
+    "hi", "hello", "hey", "heya", "yo", "hiya",
+    "good", "morning", "afternoon", "evening", "night",
+    "thanks", "thank", "you", "thx", "ty", "cheers", "appreciate", "it", "so", "much", "very",
+    "ok", "okay", "k", "kk", "cool", "great", "nice", "awesome", "perfect",
+    "alright", "sure", "got", "noted",
+    "bye", "goodbye", "later", "see", "ya",
+    "lol", "haha",
+}
+SMALL_TALK_MAX_WORDS = 5
+
+LIST_PATTERNS = [
+    r"^show (?:me )?all$",
+    r"^(?:show|list|display|view|see) (?:me )?(?:all )?(?:of )?(?:my )?(?:pending |upcoming )?(?:tasks|todos|to-dos|reminders|schedule)$",
+    r"^(?:my|all my|all) (?:pending |upcoming )?(?:tasks|todos|reminders)$",
+    r"^what(?:'s|s| is) (?:on|next|up next|pending)(?: for| on)?(?: today| tomorrow| this week)?$",
+    r"^what(?:'s|s| is) on my (?:plate|schedule|list|agenda)(?: for)?(?: today| tomorrow| this week)?$",
+    r"^what do i have(?: to do)?(?: pending| lined up| planned)?(?: for| on)?(?: today| tomorrow| this week| next)?$",
+    r"^(?:do i have|are there) any (?:pending |upcoming )?tasks(?: today| tomorrow| this week)?$",
+    r"^(?:what are )?my (?:pending|upcoming) tasks$",
+    r"^any tasks(?: today| tomorrow| this week)?$",
+]
+LIST_RES = [re.compile(p) for p in LIST_PATTERNS]
+
+# asking about a known task by title, e.g. "when is the dentist appointment"
+TASK_QUESTION_RE = re.compile(r"^(?:when|what time) is (?:my |the )?(.+)$")
+TITLE_MATCH_RATIO = 0.8
+
+# any of these means the user may want to change something
+MUTATION_WORDS = {
+    "add", "create", "new", "remind", "reminder", "schedule", "set", "book", "plan",
+    "delete", "remove", "cancel", "drop", "clear",
+    "update", "change", "move", "reschedule", "rename", "edit", "push", "postpone",
+    "shift", "mark", "done", "finished", "complete", "completed",
+}
+
+# -----------------------
+# Stats
+# -----------------------
+_stats_lock = threading.Lock()
+_stats = {"seen": 0, "handled": 0, "fallback": 0, "by_intent": {}}
+
+
+def _record(intent):
+    with _stats_lock:
+        _stats["seen"] += 1
+        if intent:
+            _stats["handled"] += 1
+            _stats["by_intent"][intent] = _stats["by_intent"].get(intent, 0) + 1
+        else:
+            _stats["fallback"] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        seen = _stats["seen"]
+        return {
+            "seen": seen,
+            "handled": _stats["handled"],
+            "fallback": _stats["fallback"],
+            "handled_rate": (_stats["handled"] / seen) if seen else 0.0,
+            "by_intent": dict(_stats["by_intent"])
+        }
+
+
+# -----------------------
+# Helpers
+# -----------------------
+def _normalize(text):
+    t = (text or "").strip().lower()
+    t = t.replace("’", "'")
+    t = re.sub(r"[!?.,;:]+", " ", t)
+    t = re.sub(r"\s+", " ", t)
+    return t.strip()
+
+
+def _content(msg):
+    return str(msg.get("content") or msg.get("message") or "")
+
+
+def assistant_asked(chat_context):
+    """
+    True when the latest assistant turn ends with a question, i.e. a short
+    user reply is probably an answer to it.
+    """
+    for msg in reversed(chat_context or []):
+        if msg.get("role") == "assistant":
+            return _content(msg).rstrip().endswith("?")
+    return False
+
+
+def _matches_task_title(phrase, tasks):
+    phrase = phrase.strip()
+    if not phrase:
+        return False
+    for t in tasks or []:
+        title = (t.get("title") or "").strip().lower()
+        if not title:
+            continue
+        if phrase == title or SequenceMatcher(None, phrase, title).ratio() >= TITLE_MATCH_RATIO:
+            return True
+    return False
+
+
+def _rule_intent(packet):
+    text = _normalize(packet.get("user_message"))
+    if not text:
+        return None, None
+
+    # whole-message list queries first: "show my schedule" is not a mutation
+    for rx in LIST_RES:
+        if rx.match(text):
+            return "list", "list_query"
+
+    words = text.split()
+    if MUTATION_WORDS.intersection(words):
+        return None, None
+
+    if len(words) <= SMALL_TALK_MAX_WORDS and all(w in SMALL_TALK_WORDS for w in words):
+        if assistant_asked(packet.get("chat_context")):
+            return None, None
+        return "chat", "small_talk"
+
+    match = TASK_QUESTION_RE.match(text)
+    if match and _matches_task_title(match.group(1), packet.get("tasks")):
+        return "list", "task_question"
+
+    return None, None
+
+
+# -----------------------
+# Public API
+# -----------------------
+def classify(packet):
+    """
+    Returns {"intent": "list"|"chat", "rule": str} when the message is
+    unambiguous, otherwise None (caller should use the ensemble).
+    """
+    intent, rule = _rule_intent(packet)
+    _record(intent)
+    if not intent:
+        return None
+    return {"intent": intent, "rule": rule}
@@ -0,0 +1,377 @@
+# list_engine.py
+#
+# Deterministic local list engine.
+#
+# Answers the common list queries (pending, today, tomorrow, this/next
+# week, weekend, this month, overdue, next N, "tasks about X") straight
+# from an in-memory per-user task index, in the user's timezone.
+# parse_query() returns None for anything it can't fully understand, so
+# the caller falls back to the LLM filter in list_fun.
+#
+# Queries are compiled into a small structured filter:
+#   {"start": iso|None, "end": iso|None, "keywords": [...],
+#    "status": "pending"|"overdue"|"any", "limit": int|None,
+#    "sort": "due_asc"|"due_desc"}
+# which execute_filter() runs over the index.
+
+import os
+import re
+import csv
+import threading
+from datetime import datetime, timedelta, time as dtime, timezone
+import pytz
+from task_utils import TASKS_CSV, normalize_user_id
+
+# -----------------------
+# Config
+# -----------------------
+STATUSES = ("pending", "overdue", "any")
+SORTS = ("due_asc", "due_desc")
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# words that carry no filter meaning in a list query
+FILLER_WORDS = {
+    "show", "list", "display", "view", "see", "give", "get", "tell", "check",
+    "what", "whats", "what's", "which", "do", "does", "i", "have", "got", "my", "me",
+    "tasks", "task", "todos", "todo", "to-dos", "reminders", "reminder", "items", "things",
+    "schedule", "agenda", "plate", "plans", "anything", "something",
+    "any", "are", "is", "there", "for", "on", "the", "a", "of", "to", "in", "at", "all",
+    "due", "scheduled", "planned", "lined", "up", "coming", "please", "pls", "can", "you",
+    "could", "would", "let", "know", "and", "left", "still", "only", "just", "now",
+    "everything", "remaining", "pending", "upcoming", "open", "outstanding",
+    "overdue", "missed", "late", "past", "expired",
+    "today", "tonight", "tomorrow", "this", "next", "week", "weekend", "month",
+    "first", "last", "latest", "soonest", "earliest",
+}
+
+PENDING_WORDS = {"pending", "upcoming", "remaining", "left", "open", "outstanding", "coming"}
+OVERDUE_WORDS = {"overdue", "missed", "late", "expired"}
+ANY_PHRASES = ("show all", "list all", "all tasks", "all my tasks", "everything", "all of them")
+
+_KEYWORD_RE = re.compile(r"\b(?:about|regarding|related to|relating to|involving|mentioning|with|for)\s+(.+)$")
+KEYWORD_TRIGGERS = {"about", "regarding", "related", "relating", "involving", "mentioning", "with"}
+# never keywords: left in the query so it falls back to the LLM
+NON_KEYWORDS = {"by", "am", "pm", "before", "after", "until", "from"}
+_NEXT_N_RE = re.compile(r"\b(?:next|first|upcoming)\s+(\d{1,2}|one|two|three|four|five|six|seven|eight|nine|ten)\b")
+_WORD_RE = re.compile(r"[a-z0-9'\-]+")
+# a bare "next" ("what's next", "what's up next") means the next task
+_BARE_NEXT_RE = re.compile(
+    r"\bnext\b(?! (?:week|weekend|month|" + "|".join(WEEKDAYS) + r")\b)"
+)
+# keywords match whole words of the title/details; these never count
+KEYWORD_STOP_WORDS = FILLER_WORDS | NON_KEYWORDS | {"an", "or", "no", "not", "it", "be", "by", "with"}
+
+# -----------------------
+# Index (rebuilt when tasks.csv changes)
+# -----------------------
+_lock = threading.Lock()
+_index = {"stamp": None, "by_user": {}}
+_stats_lock = threading.Lock()
+_stats = {"local": 0, "fallback": 0}
+
+
+def _parse_due(due):
+    if not due:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(due).replace("Z", "+00:00"))
+    except Exception:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _file_stamp():
+    try:
+        st = os.stat(TASKS_CSV)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _user_index(user_id):
+    stamp = _file_stamp()
+    with _lock:
+        if stamp != _index["stamp"]:
+            by_user = {}
+            if stamp is not None:
+                with open(TASKS_CSV, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        if row.get("google_status") == "delete":
+                            continue
+                        text = f"{row.get('title') or ''} {row.get('details') or ''}".lower()
+                        by_user.setdefault(normalize_user_id(row.get("user_id")), []).append({
+                            "task": row,
+                            "due": _parse_due(row.get("due")),
+                            "words": {_stem(w) for w in _WORD_RE.findall(text)}
+                        })
+            _index["by_user"] = by_user
+            _index["stamp"] = stamp
+        return _index["by_user"].get(normalize_user_id(user_id), [])
+
+
+# -----------------------
+# Query parsing
+# -----------------------
+def _normalize(text):
+    t = (text or "").strip().lower().replace("’", "'")
+    t = re.sub(r"[!?.,;:]+", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+
+def _day_bounds(tz, day):
+    start = tz.localize(datetime.combine(day, dtime.min))
+    end = tz.localize(datetime.combine(day, dtime.max))
+    return start, end
+
+
+def _date_range(text, words, now, tz):
+    """
+    (start, end) in the user's timezone for the time words in the query,
+    or (None, None).
+    """
+    today = now.date()
+
+    if "today" in words or "tonight" in words:
+        return _day_bounds(tz, today)
+    if "tomorrow" in words:
+        return _day_bounds(tz, today + timedelta(days=1))
+
+    if "weekend" in words:
+        # on a weekend day "the weekend" is the current one
+        saturday = today + timedelta(days=5 - today.weekday())
+        if "next" in words:
+            saturday += timedelta(days=7)
+        return _day_bounds(tz, saturday)[0], _day_bounds(tz, saturday + timedelta(days=1))[1]
+
+    if "next week" in text:
+        monday = today + timedelta(days=7 - today.weekday())
+        return _day_bounds(tz, monday)[0], _day_bounds(tz, monday + timedelta(days=6))[1]
+    if "week" in words:
+        sunday = today + timedelta(days=6 - today.weekday())
+        return now, _day_bounds(tz, sunday)[1]
+
+    if "next month" in text:
+        first = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return _day_bounds(tz, first)[0], _day_bounds(tz, last)[1]
+    if "month" in words:
+        last = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return now, _day_bounds(tz, last)[1]
+
+    for i, name in enumerate(WEEKDAYS):
+        if name in words:
+            day = today + timedelta(days=(i - today.weekday()) % 7)
+            return _day_bounds(tz, day)
+
+    return None, None
+
+
+def parse_query(message, user_tz="UTC", now=None):
+    """
+    Compile a list query into a structured filter, or None if any part of
+    the message isn't understood (the caller should use the LLM instead).
+    """
+    tz = pytz.timezone(user_tz or "UTC")
+    now = now.astimezone(tz) if now else datetime.now(tz)
+
+    text = _normalize(message)
+    if not text:
+        return None
+
+    # "about X" / "related to X" / "with X": non-filler words become keywords
+    keywords = []
+    kw_match = _KEYWORD_RE.search(text)
+    if kw_match:
+        keywords = [
+            w for w in _keyword_tokens(kw_match.group(1))
+            if w not in WEEKDAYS and not w[0].isdigit()
+        ]
+
+    kw_set = set(keywords)
+    words = [w for w in _WORD_RE.findall(text) if w not in kw_set]
+    text_wo_kw = " ".join(words)
+
+    limit = None
+    next_n = _NEXT_N_RE.search(text_wo_kw)
+    if next_n:
+        n = next_n.group(1)
+        limit = int(n) if n.isdigit() else NUMBER_WORDS[n]
+        words = [w for w in words if w != n]
+    elif re.search(r"\b(?:next|first|soonest|earliest) (?:task|reminder|thing|one)\b", text_wo_kw):
+        limit = 1
+    elif _BARE_NEXT_RE.search(text_wo_kw):
+        limit = 1
+
+    unknown = [
+        w for w in words
+        if w not in FILLER_WORDS and w not in WEEKDAYS and w not in KEYWORD_TRIGGERS
+    ]
+    if unknown:
+        return None
+
+    start, end = _date_range(text_wo_kw, set(words), now, tz)
+
+    if OVERDUE_WORDS.intersection(words) or "past due" in text_wo_kw:
+        status = "overdue"
+    elif PENDING_WORDS.intersection(words) or limit:
+        status = "pending"
+    elif start is not None or any(p in text_wo_kw for p in ANY_PHRASES):
+        status = "any"
+    else:
+        status = "pending"
+
+    return {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "keywords": keywords,
+        "status": status,
+        "limit": limit,
+        "sort": "due_desc" if status == "overdue" else "due_asc"
+    }
+
+
+def normalize_filter(raw, user_tz="UTC"):
+    """
+    Validate a structured filter produced elsewhere (e.g. by the LLM).
+    Naive start/end are read in the user's timezone. Returns None if raw
+    isn't usable.
+    """
+    if not isinstance(raw, dict):
+        return None
+    tz = pytz.timezone(user_tz or "UTC")
+
+    bounds = {}
+    for key in ("start", "end"):
+        value = raw.get(key)
+        if not value:
+            bounds[key] = None
+            continue
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except Exception:
+            return None
+        if dt.tzinfo is None:
+            dt = tz.localize(dt)
+        bounds[key] = dt.isoformat()
+
+    keywords = raw.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split()
+    keywords = _keyword_tokens(" ".join(str(k) for k in keywords))
+
+    limit = raw.get("limit")
+    try:
+        limit = int(limit) if limit not in (None, "") else None
+    except (TypeError, ValueError):
+        limit = None
+    if limit is not None and limit <= 0:
+        limit = None
+
+    return {
+        "start": bounds["start"],
+        "end": bounds["end"],
+        "keywords": keywords,
+        "status": raw.get("status") if raw.get("status") in STATUSES else "any",
+        "limit": limit,
+        "sort": raw.get("sort") if raw.get("sort") in SORTS else "due_asc"
+    }
+
+
+# -----------------------
+# Execution
+# -----------------------
+def _stem(word):
+    # "meetings" finds "meeting" and vice versa
+    word = word.strip("'-")
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def _keyword_tokens(text):
+    return [
+        w for w in _WORD_RE.findall(str(text or "").lower())
+        if w.strip("'-") and w not in KEYWORD_STOP_WORDS
+    ]
+
+
+def _keyword_hit(words, keywords):
+    """
+    Every keyword is a whole word of the task (so "no" doesn't hit "notes").
+    """
+    return all(_stem(k) in words for k in keywords)
+
+
+def execute_filter(user_id, filt, user_tz="UTC", now=None):
+    """
+    Run a structured filter over the user's indexed tasks.
+    Returns [{"title", "google_id"}] like list_fun.gpt_filter_tasks.
+    """
+    tz = pytz.timezone(user_tz or "UTC")
+    now = now.astimezone(tz) if now else datetime.now(tz)
+
+    start = _parse_due(filt.get("start"))
+    end = _parse_due(filt.get("end"))
+    status = filt.get("status") if filt.get("status") in STATUSES else "any"
+    keywords = _keyword_tokens(" ".join(str(k) for k in filt.get("keywords") or []))
+
+    rows = []
+    for entry in _user_index(user_id):
+        due = entry["due"]
+
+        if status == "pending" and due is not None and due < now:
+            continue
+        if status == "overdue" and (due is None or due >= now):
+            continue
+        if (start or end) and due is None:
+            continue
+        if start and due < start:
+            continue
+        if end and due > end:
+            continue
+        if keywords and not _keyword_hit(entry["words"], keywords):
+            continue
+        rows.append(entry)
+
+    far = datetime.max.replace(tzinfo=timezone.utc)
+    rows.sort(key=lambda e: e["due"] or far, reverse=filt.get("sort") == "due_desc")
+
+    limit = filt.get("limit")
+    if isinstance(limit, int) and limit > 0:
+        rows = rows[:limit]
+
+    return [{"title": e["task"].get("title"), "google_id": e["task"].get("google_id")} for e in rows]
+
+
+# -----------------------
+# Public API
+# -----------------------
+def answer(user_id, message, user_tz="UTC", now=None):
+    """
+    Local answer for a list query, or None when the LLM is needed.
+    """
+    filt = parse_query(message, user_tz, now)
+    _record("fallback" if filt is None else "local")
+    if filt is None:
+        return None
+    return execute_filter(user_id, filt, user_tz, now)
+
+
+def _record(key):
+    # answer() runs on list worker threads (bot handlers, speculation)
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        seen = _stats["local"] + _stats["fallback"]
+        return {
+            **_stats,
+            "local_rate": (_stats["local"] / seen) if seen else 0.0
+        }
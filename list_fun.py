@@ -1,55 +1,33 @@
 import os
 import json
 import time
+import asyncio
 from datetime import datetime
 import pytz
-from dotenv import load_dotenv
-from openai import OpenAI
 import csv
 import re
+import llm_client
+import llm_telemetry
+import model_router
+import list_engine
+import task_aliases
 
 # =====================================================
 # CONFIG – choose provider here
 # =====================================================
 
-LLM_PROVIDER = "openai"      # "openai" or "openrouter"
-
-OPENAI_MODEL = "gpt-4o-mini"
-OPENROUTER_MODEL = "openai/gpt-5.2"
-
 TASKS_CSV = "tasks.csv"
 
-# =====================================================
-# ENV
-# =====================================================
-
-load_dotenv()
+# "structured": the model only returns a filter that list_engine executes
+#               (prompt/response size independent of the number of tasks)
+# "full":       the model receives every task and returns the matches
+LIST_LLM_MODE = os.getenv("LIST_LLM_MODE", "structured")
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# max LLM list queries in flight per get_user_task_list call
+LIST_CONCURRENCY = int(os.getenv("LIST_CONCURRENCY", "4"))
 
-if LLM_PROVIDER == "openai":
-    if not OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY not found in .env")
-elif LLM_PROVIDER == "openrouter":
-    if not OPENROUTER_API_KEY:
-        raise ValueError("OPENROUTER_API_KEY not found in .env")
-else:
-    raise ValueError("LLM_PROVIDER must be 'openai' or 'openrouter'")
-
-# =====================================================
-# CLIENT
-# =====================================================
-
-if LLM_PROVIDER == "openai":
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    MODEL = OPENAI_MODEL
-else:
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=OPENROUTER_API_KEY,
-    )
-    MODEL = OPENROUTER_MODEL
+# provider / model per mode come from model_router
+# (stages "list_full" and "list_structured")
 
 # =====================================================
 # CSV helpers
@@ -93,94 +71,207 @@ def extract_json(text: str):
 # LLM filtering
 # =====================================================
 
-def gpt_filter_tasks(user_message: str, user_tz: str, current_time: datetime, tasks: list):
+async def gpt_filter_tasks_async(user_message: str, user_tz: str, current_time: datetime, tasks: list):
     tz_str = f"{user_tz} time"
 
-    # --------- Pre-strip status fields ----------
-    tasks_for_model = [
-        {k: v for k, v in t.items() if k not in ("status", "google_status")}
-        for t in tasks
-    ]
-
     system_prompt = (
         "You are a task filtering engine.\n"
-        "You receive a list of tasks with 'title', 'google_id', and 'due'.\n"
-        "Ignore any 'status' or 'google_status' fields.\n"
-        "A task is pending if its 'due' is in the future relative to current_time.\n"
+        "You receive a list of tasks, one per line: alias: title | due time | details.\n"
+        "Due times are in the user's timezone.\n"
+        "A task is pending if its due time is in the future relative to the current time.\n"
         "Return ONLY tasks that match the user's query.\n"
-        "Return STRICT JSON with only 'title' and 'google_id'.\n"
+        "Return STRICT JSON with only the aliases (t1, t2, ...) of the matching tasks.\n"
         "Do not include extra text or explanation."
     )
 
-    tasks_json = json.dumps(tasks_for_model, ensure_ascii=False)
+    encoded = task_aliases.encode(tasks, user_tz)
 
     user_prompt = f"""
-Current date and time: {current_time.isoformat()} ({tz_str})
+Current date and time: {task_aliases.render_due(current_time.isoformat(), user_tz)} ({tz_str})
 
 User message:
 "{user_message}"
 
 User tasks:
-{tasks_json}
+{encoded["text"] or "No tasks."}
 
 Return exactly:
 {{
-  "tasks": [
-    {{"title": "...", "google_id": "..."}}
-  ]
+  "tasks": ["t1", "t3"]
 }}
 """
 
     start = time.time()
 
-    completion = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        max_tokens=500
-    )
+    route = model_router.route("list_full")
+    try:
+        completion = await llm_client.complete(
+            route["provider"],
+            model=route["model"],
+            stage="list_full",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=500
+        )
+    except Exception:
+        model_router.record_outcome("list_full", route["model"], False)
+        raise
 
     elapsed = time.time() - start
     text = completion.choices[0].message.content or ""
     data = extract_json(text)
     if not data or "tasks" not in data:
+        llm_telemetry.record_parse_failure(route["model"], "list_full")
+        model_router.record_outcome("list_full", route["model"], False)
         return {"tasks": [], "elapsed_seconds": elapsed}
+    model_router.record_outcome("list_full", route["model"], True)
 
+    matches = [task_aliases.resolve(encoded, answer) for answer in data.get("tasks") or []]
+    data["tasks"] = [
+        {"title": t.get("title"), "google_id": t.get("google_id")}
+        for t in matches if t
+    ]
     data["elapsed_seconds"] = elapsed
     return data
 
+def gpt_filter_tasks(user_message: str, user_tz: str, current_time: datetime, tasks: list):
+    return llm_client.run_sync(gpt_filter_tasks_async(user_message, user_tz, current_time, tasks))
+
+async def gpt_structured_filter_async(user_message: str, user_tz: str, current_time: datetime, user_id: str):
+    """
+    The model turns the query into a list_engine filter; the filter is
+    executed locally. Returns None if the model's answer isn't a usable
+    filter (caller falls back to gpt_filter_tasks).
+    """
+    system_prompt = (
+        "You convert a user's question about their task list into a JSON filter.\n"
+        "You do NOT see the tasks. Return STRICT JSON only, with keys:\n"
+        '- "start": ISO8601 datetime with offset, or null (earliest due date to include)\n'
+        '- "end": ISO8601 datetime with offset, or null (latest due date to include)\n'
+        '- "keywords": list of lowercase words that must appear in the task title/details, or []\n'
+        '- "status": "pending" (due in the future), "overdue" (due in the past) or "any"\n'
+        '- "limit": integer maximum number of tasks, or null\n'
+        '- "sort": "due_asc" or "due_desc"\n'
+        "Resolve relative dates (today, next week, this month...) in the user's timezone."
+    )
+
+    user_prompt = f"""
+Current date and time: {current_time.isoformat()} ({user_tz} time)
+
+User message:
+"{user_message}"
+"""
+
+    start = time.time()
+
+    route = model_router.route("list_structured")
+    try:
+        completion = await llm_client.complete(
+            route["provider"],
+            model=route["model"],
+            stage="list_structured",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=150
+        )
+    except Exception:
+        model_router.record_outcome("list_structured", route["model"], False)
+        raise
+
+    filt = list_engine.normalize_filter(
+        extract_json(completion.choices[0].message.content or ""),
+        user_tz
+    )
+    if filt is None:
+        llm_telemetry.record_parse_failure(route["model"], "list_structured")
+        model_router.record_outcome("list_structured", route["model"], False)
+        return None
+    model_router.record_outcome("list_structured", route["model"], True)
+
+    tasks = list_engine.execute_filter(user_id, filt, user_tz, current_time)
+    return {"tasks": tasks, "filter": filt, "elapsed_seconds": time.time() - start}
+
+def gpt_structured_filter(user_message: str, user_tz: str, current_time: datetime, user_id: str):
+    return llm_client.run_sync(gpt_structured_filter_async(user_message, user_tz, current_time, user_id))
+
+async def _llm_list_query(msg, user_id, user_tz, now, get_tasks, semaphore):
+    """
+    One query through the LLM (structured mode first, then full mode).
+    Timing starts when the query gets a concurrency slot.
+    """
+    async with semaphore:
+        start = time.time()
+        r = None
+        try:
+            if LIST_LLM_MODE == "structured":
+                try:
+                    r = await gpt_structured_filter_async(msg, user_tz, now, user_id)
+                except Exception as e:
+                    print(f"⚠️ Structured list filter failed, using full mode: {e}")
+
+            if r is None:
+                r = await gpt_filter_tasks_async(msg, user_tz, now, await get_tasks())
+        except Exception as e:
+            print(f"⚠️ List query failed ({msg!r}): {e}")
+            r = {"tasks": [], "error": str(e)}
+
+        r["elapsed_seconds"] = time.time() - start
+        return r
+
+async def _llm_list_queries(msgs, user_id, user_tz, now, concurrency):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks_cache = {}
+    tasks_lock = asyncio.Lock()
+
+    async def get_tasks():
+        # one CSV read shared by every full-mode query
+        async with tasks_lock:
+            if "rows" not in tasks_cache:
+                tasks_cache["rows"] = await asyncio.to_thread(load_user_tasks, user_id)
+        return tasks_cache["rows"]
+
+    return await asyncio.gather(*(
+        _llm_list_query(msg, user_id, user_tz, now, get_tasks, semaphore)
+        for msg in msgs
+    ))
+
 # =====================================================
 # PUBLIC API
 # =====================================================
 
-def get_user_task_list(user_id: str, user_tz: str, messages: list):
+def get_user_task_list(user_id: str, user_tz: str, messages: list, concurrency: int = LIST_CONCURRENCY):
+    """
+    Answers every message: locally when list_engine understands it,
+    otherwise through the LLM with up to `concurrency` queries in flight.
+    Each result keeps its own elapsed_seconds.
+    """
     now = datetime.now(pytz.timezone(user_tz))
-    all_user_tasks = load_user_tasks(user_id)
 
     results = {}
+    llm_msgs = []
 
     for msg in messages:
-        msg_l = msg.lower()
-
-        # ----------------- HARD FILTER -----------------
-        # Remove these hard filters, AI will decide
-        filtered_tasks = all_user_tasks
-
-        # ----------------- SHOW ALL -----------------
-        if msg_l.strip() == "show all":
-            final = [
-                {"title": t.get("title"), "google_id": t.get("google_id")}
-                for t in filtered_tasks
-            ]
-            elapsed = 0
-
-        else:
-            r = gpt_filter_tasks(msg, user_tz, now, filtered_tasks)
-            final = r.get("tasks", [])
-            elapsed = r.get("elapsed_seconds", 0)
-
-        results[msg] = {"tasks": final, "elapsed_seconds": elapsed}
-
-    return results
+        # ----------------- LOCAL ENGINE -----------------
+        # pending / today / this week / overdue / next N / about X ...
+        start = time.time()
+        local = list_engine.answer(user_id, msg, user_tz, now)
+
+        if local is not None:
+            results[msg] = {"tasks": local, "elapsed_seconds": time.time() - start}
+        elif msg not in llm_msgs:
+            llm_msgs.append(msg)
+
+    # ----------------- LLM (concurrent) -----------------
+    if llm_msgs:
+        answers = llm_client.run_sync(
+            _llm_list_queries(llm_msgs, user_id, user_tz, now, concurrency)
+        )
+        for msg, r in zip(llm_msgs, answers):
+            results[msg] = {"tasks": r.get("tasks", []), "elapsed_seconds": r.get("elapsed_seconds", 0)}
+
+    # keep the caller's message order
+    return {msg: results[msg] for msg in messages}
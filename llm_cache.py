@@ -0,0 +1,272 @@
+# llm_cache.py
+#
+# Content-addressed cache for model responses to deterministic prompts.
+#
+# - Only stages listed in STAGE_TTLS are cached (intent votes, time
+#   normalization, reminder sentences, morning summaries, smart-time);
+#   processors whose output is written back to tasks are never cached.
+# - Keys are a hash of provider, model, normalized messages and the
+#   sampling parameters. Normalization collapses whitespace and cuts ISO
+#   timestamps to the minute, so the same prompt built a few seconds
+#   later still hits.
+# - Two tiers: an in-memory LRU (MEMORY_ITEMS entries) in front of a
+#   SQLite file (CACHE_DB) that survives restarts.
+# - Only answers the call site can use are stored: storable() checks a
+#   completion with the stage's validator (STAGE_VALIDATORS) first, so a
+#   malformed answer is retried next time instead of served for a day.
+# - get() / put() touch SQLite; llm_client runs them off the event loop
+#   (asyncio.to_thread).
+# - get_stats() reports hits / misses / hit rate per stage.
+#
+# llm_client consults the cache automatically; LLM_CACHE=0 disables it.
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# -----------------------
+# Config
+# -----------------------
+ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite")
+MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "2048"))
+
+# seconds an answer stays valid, per stage (stages not listed are not cached)
+STAGE_TTLS = {
+    "intent": 3600,
+    "time_fix": 24 * 3600,
+    "smart_time": 24 * 3600,
+    "hard_starter": 7 * 24 * 3600,
+    "reminder": 7 * 24 * 3600,
+    "morning_summary": 12 * 3600,
+}
+
+# request kwargs that change the answer (everything else, e.g. timeout or
+# extra_headers, is ignored for the key)
+KEY_PARAMS = ("temperature", "top_p", "max_tokens", "max_completion_tokens", "seed",
+              "response_format", "tools", "tool_choice", "stop")
+
+_JSON_BLOCK_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _json_object(text):
+    """
+    The JSON object in text (whole text first, then the outermost {...}).
+    """
+    for candidate in (text, *(m.group() for m in [_JSON_BLOCK_RE.search(text or "")] if m)):
+        try:
+            data = json.loads(candidate)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _intent_ok(text):
+    # core_brain parses the whole text, not an embedded block
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and bool(data.get("intent"))
+
+
+def _time_fix_ok(text):
+    data = _json_object(text)
+    return bool(data) and isinstance(data.get("iso"), str)
+
+
+def _text_ok(text):
+    return bool((text or "").strip())
+
+
+# stage -> validator(completion text); mirrors how the call site parses it
+STAGE_VALIDATORS = {
+    "intent": _intent_ok,
+    "time_fix": _time_fix_ok,
+    "smart_time": lambda text: _json_object(text) is not None,
+    "hard_starter": _text_ok,
+    "reminder": _text_ok,
+    "morning_summary": _text_ok,
+}
+
+_ISO_SECONDS_RE = re.compile(r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}):\d{2}(?:\.\d+)?")
+_SPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_memory = OrderedDict()  # key -> (expires_at, payload)
+_db = None
+_stats = {}  # stage -> counters
+
+
+# -----------------------
+# Keys
+# -----------------------
+def _normalize_text(text):
+    text = _ISO_SECONDS_RE.sub(r"\1", str(text or ""))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _normalize_messages(messages):
+    normalized = []
+    for m in messages or []:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = [
+                {**part, "text": _normalize_text(part.get("text"))} if isinstance(part, dict) else part
+                for part in content
+            ]
+        else:
+            content = _normalize_text(content)
+        normalized.append({"role": m.get("role"), "content": content})
+    return normalized
+
+
+def make_key(provider, model, messages, params):
+    payload = {
+        "provider": provider,
+        "model": model,
+        "messages": _normalize_messages(messages),
+        "params": {k: params[k] for k in KEY_PARAMS if params.get(k) is not None},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cacheable(stage):
+    return ENABLED and stage in STAGE_TTLS
+
+
+def storable(stage, text):
+    """
+    Whether a completion's text is a usable answer for the stage.
+    """
+    validator = STAGE_VALIDATORS.get(stage, _text_ok)
+    try:
+        return bool(validator(text))
+    except Exception:
+        return False
+
+
+# -----------------------
+# Stats
+# -----------------------
+def _count(stage, field):
+    s = _stats.setdefault(stage, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "expired": 0})
+    s[field] += 1
+
+
+def get_stats():
+    with _lock:
+        stats = {}
+        for stage, s in sorted(_stats.items()):
+            hits = s["memory_hits"] + s["disk_hits"]
+            lookups = hits + s["misses"]
+            stats[stage] = {**s, "hit_rate": (hits / lookups) if lookups else 0.0}
+        return stats
+
+
+# -----------------------
+# Tiers
+# -----------------------
+def _connect():
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, stage TEXT, expires_at REAL, payload TEXT)"
+        )
+        _db.commit()
+    return _db
+
+
+def _remember(key, expires_at, payload):
+    _memory[key] = (expires_at, payload)
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_ITEMS:
+        _memory.popitem(last=False)
+
+
+def get(stage, key):
+    """
+    Cached payload (completion JSON string) for key, or None.
+    """
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _memory.move_to_end(key)
+                _count(stage, "memory_hits")
+                return entry[1]
+            del _memory[key]
+            _count(stage, "expired")
+
+        try:
+            row = _connect().execute(
+                "SELECT expires_at, payload FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache read failed: {e}")
+            row = None
+
+        if row and row[0] > now:
+            _remember(key, row[0], row[1])
+            _count(stage, "disk_hits")
+            return row[1]
+
+        if row:
+            _count(stage, "expired")
+        _count(stage, "misses")
+        return None
+
+
+def put(stage, key, payload):
+    expires_at = time.time() + STAGE_TTLS[stage]
+    with _lock:
+        _remember(key, expires_at, payload)
+        _count(stage, "stores")
+        try:
+            db = _connect()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, stage, expires_at, payload) VALUES (?, ?, ?, ?)",
+                (key, stage, expires_at, payload)
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+
+
+def purge_expired():
+    """
+    Drop expired rows from the disk tier. Returns the number removed.
+    """
+    with _lock:
+        try:
+            db = _connect()
+            cur = db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+            return cur.rowcount
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache purge failed: {e}")
+            return 0
+
+
+def clear(memory_only=False):
+    with _lock:
+        _memory.clear()
+        _stats.clear()
+        if not memory_only:
+            try:
+                db = _connect()
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache clear failed: {e}")
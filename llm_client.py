@@ -0,0 +1,301 @@
+# llm_client.py
+#
+# One shared, pooled async client layer for every OpenAI / OpenRouter call.
+#
+# - One AsyncOpenAI client per provider, built lazily and reused, so HTTP
+#   keep-alive connections (and their TLS sessions) are shared by all call
+#   sites instead of each module opening its own.
+# - All requests run on a single background event loop; async callers on
+#   any other loop await them, sync callers block on them. No thread-pool
+#   executor is needed to fan out the ensemble.
+# - Per-provider concurrency limits and configurable timeouts.
+# - Every call is recorded in llm_telemetry (latency, tokens, errors);
+#   successful calls also feed model_router's per-stage latency.
+# - Benchmarks can inject faults per provider (see fault_injection), and
+#   evaluations can record / replay real responses (see llm_replay).
+# - Deterministic stages are answered from llm_cache when possible, and
+#   identical concurrent requests share one call (singleflight).
+#
+# Usage:
+#   completion = await llm_client.complete("openrouter", "openai/gpt-5.2", messages)
+#   completion = llm_client.complete_sync("openai", "gpt-4", messages, stage="update", temperature=0.2)
+#   text = completion.choices[0].message.content
+
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from openai.types.chat import ChatCompletion
+import llm_telemetry
+import llm_cache
+import model_router
+import singleflight
+import fault_injection
+import llm_replay
+
+# -----------------------
+# Config
+# -----------------------
+load_dotenv()
+
+PROVIDERS = {
+    "openai": {
+        "base_url": None,  # SDK default
+        "api_key_env": "OPENAI_API_KEY",
+        "max_concurrency": int(os.getenv("LLM_OPENAI_CONCURRENCY", "8")),
+    },
+    "openrouter": {
+        "base_url": "https://openrouter.ai/api/v1",
+        "api_key_env": "OPENROUTER_API_KEY",
+        "max_concurrency": int(os.getenv("LLM_OPENROUTER_CONCURRENCY", "10")),
+    },
+}
+
+# Offline mode: point every provider at llm_stub_server (or any other
+# chat-completions compatible endpoint), e.g. http://127.0.0.1:8099/v1
+STUB_URL = os.getenv("LLM_STUB_URL")
+
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+# Stages whose identical concurrent requests share one call. Not "intent":
+# core_brain's hedging sends deliberate duplicates.
+SINGLEFLIGHT_STAGES = {"time_fix", "smart_time", "hard_starter", "reminder", "morning_summary", "summary"}
+
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+
+# -----------------------
+# Shared loop / clients
+# -----------------------
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}       # provider -> AsyncOpenAI (only touched on _loop)
+_semaphores = {}    # provider -> asyncio.Semaphore (only touched on _loop)
+_inflight = singleflight.AsyncGroup("llm")  # only touched on _loop
+
+
+def _ensure_loop():
+    """
+    Start the background event loop that owns the pooled clients.
+    """
+    global _loop
+    if _loop is not None:
+        return _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever,
+                name="llm-client-loop",
+                daemon=True
+            )
+            thread.start()
+            _loop = loop
+
+    return _loop
+
+
+def _provider_config(provider):
+    cfg = PROVIDERS.get(provider)
+    if not cfg:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    return cfg
+
+
+def _get_client(provider):
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+
+    cfg = _provider_config(provider)
+    api_key = os.getenv(cfg["api_key_env"]) or ("stub" if STUB_URL else None)
+    if not api_key:
+        raise ValueError(f"{cfg['api_key_env']} not found in .env")
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+    )
+
+    kwargs = {
+        "api_key": api_key,
+        "http_client": http_client,
+        "max_retries": MAX_RETRIES,
+        "timeout": httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+    }
+    if STUB_URL:
+        kwargs["base_url"] = STUB_URL
+    elif cfg["base_url"]:
+        kwargs["base_url"] = cfg["base_url"]
+
+    client = AsyncOpenAI(**kwargs)
+    _clients[provider] = client
+    return client
+
+
+def _get_semaphore(provider):
+    sem = _semaphores.get(provider)
+    if sem is None:
+        sem = asyncio.Semaphore(_provider_config(provider)["max_concurrency"])
+        _semaphores[provider] = sem
+    return sem
+
+
+async def _call(provider, model, messages, stage, kwargs, cache_key=None):
+    """
+    One model request. Recorded in llm_telemetry under (model, stage);
+    latency excludes the concurrency-slot wait.
+    """
+    if llm_replay.replaying():
+        request = lambda: llm_replay.replay(provider, model, messages, kwargs)
+    else:
+        client = _get_client(provider)
+        request = lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            **kwargs
+        )
+
+    async with _get_semaphore(provider):
+        start = time.perf_counter()
+        try:
+            completion = await fault_injection.llm_call(provider, request, TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            llm_telemetry.record_call(model, stage, time.perf_counter() - start, cancelled=True)
+            raise
+        except Exception as e:
+            llm_telemetry.record_call(model, stage, time.perf_counter() - start, error=e)
+            raise
+
+        seconds = time.perf_counter() - start
+        llm_telemetry.record_call(model, stage, seconds, usage=getattr(completion, "usage", None))
+        if stage:
+            model_router.record_latency(stage, model, seconds)
+        if llm_replay.recording():
+            llm_replay.record(provider, model, messages, kwargs, stage, seconds, completion)
+
+    if cache_key and llm_cache.storable(stage, _text(completion)):
+        await asyncio.to_thread(llm_cache.put, stage, cache_key, completion.model_dump_json())
+    return completion
+
+
+def _text(completion):
+    try:
+        return completion.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        return ""
+
+
+def from_cache(completion):
+    """
+    True when the completion was served by llm_cache (no model call, so
+    its latency says nothing about the model).
+    """
+    return bool(getattr(completion, "_from_cache", False))
+
+
+async def _complete(provider, model, messages, stage=None, cache_basis=None, **kwargs):
+    """
+    Runs on the shared loop. Cache hits (llm_cache) return without a
+    model call; identical in-flight requests for SINGLEFLIGHT_STAGES
+    share one call.
+    cache_basis (optional) replaces messages in the cache key, for callers
+    whose prompt carries detail that doesn't change the answer.
+    """
+    if fault_injection.enabled():
+        return await _call(provider, model, messages, stage, kwargs)
+
+    use_cache = llm_cache.cacheable(stage)
+    collapse = stage in SINGLEFLIGHT_STAGES
+    cache_key = llm_cache.make_key(provider, model, cache_basis or messages, kwargs) if use_cache else None
+
+    if use_cache:
+        payload = await asyncio.to_thread(llm_cache.get, stage, cache_key)
+        if payload is not None:
+            completion = ChatCompletion.model_validate_json(payload)
+            completion._from_cache = True
+            return completion
+
+    if collapse:
+        key = llm_cache.make_key(provider, model, messages, kwargs)
+        return await _inflight.do(key, lambda: _call(provider, model, messages, stage, kwargs, cache_key))
+    return await _call(provider, model, messages, stage, kwargs, cache_key)
+
+
+# -----------------------
+# Public API
+# -----------------------
+async def complete(provider, model, messages, **kwargs):
+    """
+    Chat completion awaitable from any event loop.
+
+    stage tags the call in llm_telemetry (e.g. "intent", "update");
+    cache_basis overrides what the llm_cache key is computed from.
+    Other kwargs are passed to chat.completions.create (temperature,
+    max_tokens, timeout, extra_headers, ...). Cancelling the awaiting task cancels the
+    request on the shared loop.
+    """
+    loop = _ensure_loop()
+    coro = _complete(provider, model, messages, **kwargs)
+
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        return await coro
+
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def _blocking_loop(caller):
+    """
+    The shared loop, for a caller that is about to block on it (which
+    would deadlock if we are running on that loop).
+    """
+    loop = _ensure_loop()
+
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        raise RuntimeError(f"{caller}() called from the LLM client loop; await the coroutine instead")
+    return loop
+
+
+def complete_sync(provider, model, messages, **kwargs):
+    """
+    Blocking chat completion for the sync call sites.
+    """
+    loop = _blocking_loop("complete_sync")
+    future = asyncio.run_coroutine_threadsafe(
+        _complete(provider, model, messages, **kwargs),
+        loop
+    )
+    return future.result()
+
+
+def run_sync(coro):
+    """
+    Run a coroutine on the shared loop and block for its result.
+    """
+    try:
+        loop = _blocking_loop("run_sync")
+    except RuntimeError:
+        coro.close()  # never scheduled; avoid a "never awaited" warning
+        raise
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -0,0 +1,161 @@
+# llm_replay.py
+#
+# Record real model responses once, replay them offline (eval_intent.py).
+#
+# - record: every successful llm_client call is appended to a JSONL
+#   cassette: {"key", "provider", "model", "stage", "seconds", "completion"}
+# - replay: llm_client answers from the cassette instead of the network,
+#   after sleeping the recorded latency, so strategy comparisons keep
+#   realistic timing. Requests recorded several times (hedges, retries)
+#   replay their answers in order. A request that was never recorded
+#   raises ReplayMiss (it shows up as an error in llm_telemetry).
+#
+# Keys are llm_cache.make_key() over the prompt with every date / time
+# replaced by a placeholder, so a cassette recorded on one day still
+# matches prompts built on another.
+#
+# Enabled with LLM_RECORD_FILE=<path> or LLM_REPLAY_FILE=<path>, or
+# start_recording() / start_replay() at runtime.
+
+import os
+import re
+import json
+import asyncio
+import threading
+from openai.types.chat import ChatCompletion
+import llm_cache
+
+# -----------------------
+# Config
+# -----------------------
+_DATETIME_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?"
+)
+DATETIME_PLACEHOLDER = "<datetime>"
+
+_lock = threading.Lock()
+_state = {"record": None, "replay": None}
+_cassette = {}  # key -> list of entries
+_cursor = {}    # key -> next entry index
+_stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+
+class ReplayMiss(Exception):
+    pass
+
+
+# -----------------------
+# Keys
+# -----------------------
+def _strip_times(messages):
+    stripped = []
+    for m in messages or []:
+        content = m.get("content")
+        if isinstance(content, str):
+            content = _DATETIME_RE.sub(DATETIME_PLACEHOLDER, content)
+        stripped.append({**m, "content": content})
+    return stripped
+
+
+def make_key(provider, model, messages, params):
+    return llm_cache.make_key(provider, model, _strip_times(messages), params)
+
+
+# -----------------------
+# Modes
+# -----------------------
+def start_recording(path):
+    with _lock:
+        _state["record"] = path
+        _state["replay"] = None
+
+
+def start_replay(path):
+    """
+    Load a cassette; llm_client then stops calling the network.
+    """
+    cassette = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                cassette.setdefault(entry["key"], []).append(entry)
+
+    with _lock:
+        _state["replay"] = path
+        _state["record"] = None
+        _cassette.clear()
+        _cassette.update(cassette)
+        _cursor.clear()
+    print(f"📼 Replaying {sum(len(v) for v in cassette.values())} recorded responses from {path}")
+
+
+def stop():
+    with _lock:
+        _state["record"] = None
+        _state["replay"] = None
+        _cassette.clear()
+        _cursor.clear()
+
+
+def recording():
+    return _state["record"] is not None
+
+
+def replaying():
+    return _state["replay"] is not None
+
+
+def get_stats():
+    with _lock:
+        return {"record_file": _state["record"], "replay_file": _state["replay"], **_stats}
+
+
+# -----------------------
+# Record / replay
+# -----------------------
+def record(provider, model, messages, params, stage, seconds, completion):
+    entry = {
+        "key": make_key(provider, model, messages, params),
+        "provider": provider,
+        "model": model,
+        "stage": stage,
+        "seconds": round(seconds, 4),
+        "completion": json.loads(completion.model_dump_json()),
+    }
+    with _lock:
+        path = _state["record"]
+        if not path:
+            return
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            _stats["recorded"] += 1
+        except OSError as e:
+            print(f"⚠️ Could not record LLM response: {e}")
+
+
+async def replay(provider, model, messages, params):
+    """
+    The recorded completion for this request, after its recorded latency.
+    """
+    key = make_key(provider, model, messages, params)
+    with _lock:
+        entries = _cassette.get(key)
+        if not entries:
+            _stats["misses"] += 1
+            raise ReplayMiss(f"No recorded response for {provider}/{model}")
+        idx = _cursor.get(key, 0)
+        _cursor[key] = idx + 1
+        entry = entries[idx % len(entries)]
+        _stats["replayed"] += 1
+
+    await asyncio.sleep(entry.get("seconds") or 0)
+    return ChatCompletion.model_validate(entry["completion"])
+
+
+if os.getenv("LLM_REPLAY_FILE"):
+    start_replay(os.getenv("LLM_REPLAY_FILE"))
+elif os.getenv("LLM_RECORD_FILE"):
+    start_recording(os.getenv("LLM_RECORD_FILE"))
@@ -0,0 +1,416 @@
+# llm_stub_server.py
+#
+# Local stand-in for the OpenAI / OpenRouter chat-completions API, for
+# offline benchmarking and load tests of ai_thought (no keys, no cost).
+#
+# - POST /v1/chat/completions (and /api/v1/chat/completions)
+# - Rule-based answers for every prompt this bot sends: intent votes,
+#   create / update / delete / chat processors, the single-call tool
+#   pipeline, list filters (full and structured), reminders, daily
+#   summaries, time normalization, smart-time and chat summaries.
+# - Configurable latency distributions, globally and per model (specs
+#   as in fault_injection.parse_latency).
+# - Optional scripted responses ({"match": regex, "content": str}) that
+#   take precedence over the rules.
+# - Minimal Google OAuth token / Tasks endpoints for ayth_script
+#   (latency under the model name "google").
+#
+# Point the bot at it with LLM_STUB_URL (see llm_client):
+#   python llm_stub_server.py --port 8099 --latency lognormal:600,0.5 \
+#       --model-latency qwen/qwen3-max-thinking=lognormal:3000,0.6
+#   LLM_STUB_URL=http://127.0.0.1:8099/v1 python telegram_bot.py
+#   (GOOGLE_TOKEN_URL=http://127.0.0.1:8099/token and
+#    GOOGLE_TASKS_URL=http://127.0.0.1:8099/tasks for the Google calls)
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from fault_injection import parse_latency
+
+# -----------------------
+# Config
+# -----------------------
+DEFAULT_PORT = 8099
+DEFAULT_LATENCY = "lognormal:400,0.4"
+
+CREATE_WORDS = {"add", "create", "remind", "schedule", "set", "book", "plan", "new"}
+UPDATE_WORDS = {"update", "change", "move", "reschedule", "rename", "edit", "push", "postpone", "shift"}
+DELETE_WORDS = {"delete", "remove", "cancel", "drop", "clear", "erase"}
+LIST_WORDS = {"show", "list", "what", "whats", "what's", "pending", "upcoming", "tasks", "agenda", "schedule"}
+
+
+# -----------------------
+# Prompt helpers
+# -----------------------
+def _all_text(messages):
+    return "\n".join(str(m.get("content") or "") for m in messages)
+
+
+def _last_user(messages):
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return str(m.get("content") or "")
+    return ""
+
+
+def _field(text, label):
+    """
+    Value after "label:" on the same line, or on the next non-empty line.
+    """
+    m = re.search(rf"{re.escape(label)}:[ \t]*(.*)", text)
+    if not m:
+        return None
+    value = m.group(1).strip()
+    if value:
+        return value
+    rest = text[m.end():].lstrip("\n")
+    return rest.split("\n", 1)[0].strip().strip('"') or None
+
+
+def _words(text):
+    return set(re.findall(r"[a-z']+", (text or "").lower()))
+
+
+def _guess_intent(message):
+    words = _words(message)
+    if words & DELETE_WORDS:
+        return "delete"
+    if words & UPDATE_WORDS:
+        return "update"
+    if words & CREATE_WORDS and not message.lower().startswith(("what", "show", "list")):
+        return "create"
+    if words & LIST_WORDS:
+        return "list"
+    return "chat"
+
+
+_ALIAS_LINE_RE = re.compile(r"^\s*(t\d+): (.*)$")
+
+
+def _task_lines(text):
+    """
+    Aliased task lines ("t1: title | due ... | details", see task_aliases)
+    in update/delete/combined/list prompts.
+    """
+    tasks = []
+    for line in text.splitlines():
+        match = _ALIAS_LINE_RE.match(line)
+        if match:
+            tasks.append({"alias": match.group(1), "title": match.group(2).split(" | ")[0]})
+    return tasks
+
+
+def _best_task(message, tasks):
+    words = _words(message)
+    scored = sorted(
+        tasks,
+        key=lambda t: len(words & _words(t.get("title"))),
+        reverse=True
+    )
+    return scored[0] if scored else None
+
+
+def _due_from(message, current_time=None):
+    """
+    Longest trailing phrase of the message the local time parser accepts
+    ("remind me to call mom tomorrow at 5pm" -> "tomorrow at 5pm"),
+    else one hour from now.
+    """
+    try:
+        from time_fixer import fix_time_from_text
+        words = (message or "").split()
+        for i in range(len(words)):
+            due = fix_time_from_text(" ".join(words[i:]), "UTC", current_time)
+            if due:
+                return due
+    except Exception:
+        pass
+    return (datetime.utcnow() + timedelta(hours=1)).replace(microsecond=0).isoformat() + "+00:00"
+
+
+def _title_from(message):
+    words = [w for w in re.findall(r"[A-Za-z']+", message) if w.lower() not in CREATE_WORDS | {"me", "to", "a", "reminder", "task"}]
+    return " ".join(words[:5]).capitalize() or "New task"
+
+
+# -----------------------
+# Rule-based responder
+# -----------------------
+def rule_response(body):
+    """
+    Returns (content, tool_calls) for a chat-completions request body.
+    """
+    messages = body.get("messages") or []
+    text = _all_text(messages)
+    user = _last_user(messages)
+
+    # single-call pipeline (function calling)
+    if body.get("tools"):
+        intent = _guess_intent(user)
+        name = {"create": "create_task", "update": "update_task", "delete": "delete_task",
+                "list": "list_tasks", "chat": "chat_reply"}[intent]
+        args = {}
+        tasks = _task_lines(text)
+        if intent == "create":
+            args = {"title": _title_from(user), "details": user, "due": _due_from(user),
+                    "ai_comment": "Stub comment.", "response_text": "Task created."}
+        elif intent in ("update", "delete"):
+            task = _best_task(user, tasks)
+            args = {"task": task.get("alias") if task else None, "ai_comment": "Stub comment."}
+            if intent == "update":
+                args.update({"title": None, "details": None, "due": _due_from(user)})
+        elif intent == "chat":
+            args = {"response_text": "Hello from the stub."}
+        return None, [{
+            "id": "call_stub", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)}
+        }]
+
+    if "detects user intent" in text:
+        packet_match = re.search(r"user packet:\s*(\{.*\})\s*Respond", text, re.S)
+        message = user
+        if packet_match:
+            try:
+                message = json.loads(packet_match.group(1)).get("user_message") or user
+            except ValueError:
+                pass
+        intent = _guess_intent(message)
+        return json.dumps({"intent": intent, "confidence": 0.9, "message": f"stub: {intent}"}), None
+
+    if "creating tasks from a user's message" in text:
+        message = _field(text, "User message") or user
+        return json.dumps({
+            "action": "create",
+            "parameters": {"title": _title_from(message), "details": message,
+                           "due": _due_from(message, _field(text, "Current time"))},
+            "ai_comment": "Stub comment.",
+            "response_text": "Task created."
+        }), None
+
+    if "updating an existing task" in text or "deleting a task" in text:
+        action = "update" if "updating an existing task" in text else "delete"
+        message = _field(text, "User request") or _field(text, "User message") or user
+        task = _best_task(message, _task_lines(text))
+        params = {"task": task.get("alias") if task else None}
+        if action == "update":
+            params.update({"title": None, "details": None, "due": _due_from(message)})
+        return json.dumps({"action": action, "parameters": params, "ai_comment": "Stub comment."}), None
+
+    if "processing user intents" in text:
+        return json.dumps({
+            "action": "chat",
+            "parameters": {"title": None, "details": None, "due": None, "list_scope": None},
+            "ai_comment": "",
+            "response_text": "Hello from the stub."
+        }), None
+
+    if "task filtering engine" in text:
+        return json.dumps({"tasks": [t["alias"] for t in _task_lines(text)]}), None
+
+    if "into a JSON filter" in text:
+        return json.dumps({"start": None, "end": None, "keywords": [], "status": "pending",
+                           "limit": None, "sort": "due_asc"}), None
+
+    if "datetime normalization engine" in text:
+        expr = re.search(r'Text to convert:\s*"(.*)"', text)
+        now = _field(text, "Use the reference current time")
+        return json.dumps({"iso": _due_from(expr.group(1) if expr else user, now)}), None
+
+    if "time-parsing assistant" in text:
+        return json.dumps({"start_time": None, "end_time": None}), None
+
+    if "running summary" in text:
+        return "The user has been managing tasks with the assistant.", None
+
+    if "good-morning message" in text:
+        return "Good morning! You have a few things planned today, you've got this.", None
+
+    if "reminder" in text.lower():
+        task = re.search(r"Task: (.*)|task: '(.*)'", text)
+        title = (task.group(1) or task.group(2)) if task else "your task"
+        return f"Friendly reminder: {title.strip()}", None
+
+    return "OK", None
+
+
+# -----------------------
+# HTTP server
+# -----------------------
+class StubConfig:
+    def __init__(self, latency=DEFAULT_LATENCY, model_latency=None, script=None, seed=None):
+        self.default_sampler = parse_latency(latency)
+        self.model_samplers = {m: parse_latency(s) for m, s in (model_latency or {}).items()}
+        self.script = [(re.compile(r["match"], re.S), r["content"]) for r in (script or [])]
+        self.requests = 0
+        self.google_ids = 0
+        self.lock = threading.Lock()
+        if seed is not None:
+            random.seed(seed)
+
+    def latency_for(self, model):
+        return self.model_samplers.get(model, self.default_sampler)()
+
+    def scripted(self, body):
+        text = _all_text(body.get("messages") or [])
+        for pattern, content in self.script:
+            if pattern.search(text):
+                return content
+        return None
+
+
+def _completion(body, content, tool_calls):
+    prompt_tokens = math.ceil(len(_all_text(body.get("messages") or [])) / 4)
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": f"stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls" if tool_calls else "stop",
+            "message": message
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": math.ceil(len(content or json.dumps(tool_calls or "")) / 4),
+            "total_tokens": prompt_tokens + math.ceil(len(content or "") / 4)
+        }
+    }
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            out = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            try:
+                self.wfile.write(out)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (cancelled hedge / timeout)
+
+        def _google(self, method):
+            """
+            Minimal Google OAuth token + Tasks endpoints (for ayth_script
+            pointed here via GOOGLE_TOKEN_URL / GOOGLE_TASKS_URL).
+            """
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            time.sleep(max(0.0, config.latency_for("google")))
+
+            with config.lock:
+                config.requests += 1
+                config.google_ids += 1
+                new_id = f"stub-task-{config.google_ids}"
+
+            if self.path.rstrip("/").endswith("/token"):
+                self._send(200, {"access_token": "stub-access-token", "expires_in": 3599, "token_type": "Bearer"})
+            elif method == "GET":
+                self._send(200, {"kind": "tasks#tasks", "items": []})
+            elif method == "DELETE":
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = {}
+                task_id = self.path.rstrip("/").rsplit("/", 1)[-1] if method == "PATCH" else new_id
+                self._send(200, {"kind": "tasks#task", "id": task_id, "status": "needsAction", **body})
+
+        def do_GET(self):
+            self._google("GET")
+
+        def do_PATCH(self):
+            self._google("PATCH")
+
+        def do_DELETE(self):
+            self._google("DELETE")
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._google("POST")
+                return
+
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            except ValueError:
+                self._send(400, {"error": {"message": "invalid JSON body"}})
+                return
+
+            with config.lock:
+                config.requests += 1
+
+            time.sleep(max(0.0, config.latency_for(body.get("model"))))
+
+            scripted = config.scripted(body)
+            if scripted is not None:
+                content, tool_calls = scripted, None
+            else:
+                content, tool_calls = rule_response(body)
+
+            self._send(200, _completion(body, content, tool_calls))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=DEFAULT_PORT, host="127.0.0.1", background=True, **config_kwargs):
+    """
+    Start the stub. With background=True returns the server (call
+    .shutdown() to stop); otherwise blocks.
+    """
+    config = StubConfig(**config_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.stub_config = config
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"🧪 LLM stub listening on http://{host}:{port}/v1")
+    server.serve_forever()
+
+
+# -----------------------
+# CLI
+# -----------------------
+def main():
+    parser = argparse.ArgumentParser(description="Local chat-completions stub for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help="fixed:MS | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--model-latency", action="append", default=[],
+                        help="MODEL=SPEC, repeatable")
+    parser.add_argument("--script", help="JSON file: list of {match, content}")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    model_latency = dict(item.split("=", 1) for item in args.model_latency)
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+
+    serve(args.port, args.host, background=False, latency=args.latency,
+          model_latency=model_latency, script=script, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
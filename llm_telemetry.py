@@ -0,0 +1,242 @@
+# llm_telemetry.py
+#
+# Telemetry for every model call made through llm_client.
+#
+# Per (model, stage) it keeps:
+# - a rolling window of the last WINDOW latencies (histogram + p50/p95/p99)
+# - cumulative calls, errors (by exception type), cancellations,
+#   JSON-parse failures and prompt/completion token counts
+# - for voting stages, how often the model agreed with the final decision
+#
+# llm_client records calls automatically; callers tag them with a
+# stage= kwarg and report parse failures with record_parse_failure().
+# snapshot() returns everything as a dict; dump() writes it to
+# TELEMETRY_JSON (telegram_bot calls it periodically) together with the
+# get_stats() of the components that spare model calls:
+# - llm_cache / semantic_cache hit rates, singleflight collapse counts,
+#   task_fragments reuse
+# - messages answered by intent_rules / local_intent, task_retrieval
+#   clear winners, list queries answered by list_engine
+# - ensemble speculation hits / misses and the seconds wasted on misses
+# - the state of each intent model's circuit breaker (core_brain)
+
+import os
+import json
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+import llm_cache
+import intent_rules
+import list_engine
+import local_intent
+import semantic_cache
+import singleflight
+import task_fragments
+import task_retrieval
+
+# -----------------------
+# Config
+# -----------------------
+TELEMETRY_JSON = "llm_telemetry.json"
+WINDOW = int(os.getenv("LLM_TELEMETRY_WINDOW", "500"))
+DUMP_SECONDS = int(os.getenv("LLM_TELEMETRY_DUMP_SECONDS", "300"))
+
+# histogram bucket upper bounds (milliseconds); the last bucket is open-ended
+BUCKETS_MS = [100, 250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000]
+
+_lock = threading.Lock()
+_series = {}  # (model, stage) -> dict
+
+
+def _new_series():
+    return {
+        "latencies": deque(maxlen=WINDOW),
+        "calls": 0,
+        "ok": 0,
+        "errors": 0,
+        "cancelled": 0,
+        "parse_failures": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "votes": 0,
+        "agreed": 0,
+        "error_types": Counter(),
+        "last_error": None,
+    }
+
+
+def _get(model, stage):
+    key = (model or "unknown", stage or "unknown")
+    series = _series.get(key)
+    if series is None:
+        series = _series[key] = _new_series()
+    return series
+
+
+# -----------------------
+# Recording
+# -----------------------
+def record_call(model, stage, seconds, usage=None, error=None, cancelled=False):
+    """
+    One finished model call. usage is the completion's usage object (or None).
+    """
+    with _lock:
+        s = _get(model, stage)
+        s["calls"] += 1
+
+        if cancelled:
+            s["cancelled"] += 1
+            return
+
+        if error is not None:
+            s["errors"] += 1
+            s["error_types"][type(error).__name__] += 1
+            s["last_error"] = str(error)[:200]
+            return
+
+        s["ok"] += 1
+        s["latencies"].append(seconds)
+        if usage is not None:
+            s["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            s["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def record_parse_failure(model, stage):
+    with _lock:
+        _get(model, stage)["parse_failures"] += 1
+
+
+def record_vote(model, stage, agreed):
+    """
+    A vote that counted towards an ensemble decision.
+    """
+    with _lock:
+        s = _get(model, stage)
+        s["votes"] += 1
+        if agreed:
+            s["agreed"] += 1
+
+
+# -----------------------
+# Reporting
+# -----------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _histogram(latencies):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for sec in latencies:
+        ms = sec * 1000
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+
+def snapshot():
+    """
+    {"generated_at", "series": {"model|stage": {...}}}
+    """
+    with _lock:
+        items = [(k, dict(v, latencies=list(v["latencies"]), error_types=dict(v["error_types"])))
+                 for k, v in _series.items()]
+
+    series = {}
+    for (model, stage), s in sorted(items):
+        lat = sorted(s["latencies"])
+        finished = s["ok"] + s["errors"]
+        series[f"{model}|{stage}"] = {
+            "model": model,
+            "stage": stage,
+            "calls": s["calls"],
+            "ok": s["ok"],
+            "errors": s["errors"],
+            "cancelled": s["cancelled"],
+            "error_rate": (s["errors"] / finished) if finished else 0.0,
+            "parse_failures": s["parse_failures"],
+            "parse_failure_rate": (s["parse_failures"] / s["ok"]) if s["ok"] else 0.0,
+            "votes": s["votes"],
+            "agreed": s["agreed"],
+            "agreement_rate": (s["agreed"] / s["votes"]) if s["votes"] else None,
+            "error_types": s["error_types"],
+            "last_error": s["last_error"],
+            "prompt_tokens": s["prompt_tokens"],
+            "completion_tokens": s["completion_tokens"],
+            "avg_prompt_tokens": (s["prompt_tokens"] / s["ok"]) if s["ok"] else 0.0,
+            "avg_completion_tokens": (s["completion_tokens"] / s["ok"]) if s["ok"] else 0.0,
+            "window": len(lat),
+            "p50_seconds": _percentile(lat, 50),
+            "p95_seconds": _percentile(lat, 95),
+            "p99_seconds": _percentile(lat, 99),
+            "histogram": _histogram(lat),
+        }
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "series": series
+    }
+
+
+def model_summary(stage=None):
+    """
+    Per-model rollup (optionally for one stage): calls, error rate, p95,
+    parse failures, tokens, agreement with ensemble decisions. calls
+    counts every call; cancelled ones (lost a hedge or quorum race) are
+    also counted apart, finished = ok + errors.
+    """
+    rollup = {}
+    for s in snapshot()["series"].values():
+        if stage and s["stage"] != stage:
+            continue
+        r = rollup.setdefault(s["model"], {
+            "calls": 0, "ok": 0, "errors": 0, "cancelled": 0, "parse_failures": 0, "votes": 0, "agreed": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "p95_seconds": None
+        })
+        for k in ("calls", "ok", "errors", "cancelled", "parse_failures", "votes", "agreed",
+                  "prompt_tokens", "completion_tokens"):
+            r[k] += s[k]
+        if s["p95_seconds"] is not None:
+            r["p95_seconds"] = max(r["p95_seconds"] or 0.0, s["p95_seconds"])
+
+    for r in rollup.values():
+        finished = r["ok"] + r["errors"]
+        r["finished"] = finished
+        r["error_rate"] = (r["errors"] / finished) if finished else 0.0
+        r["agreement_rate"] = (r["agreed"] / r["votes"]) if r["votes"] else None
+    return rollup
+
+
+def dump(path=TELEMETRY_JSON):
+    # imported here: both import this module
+    import core_brain
+    import ensemble
+
+    data = snapshot()
+    data["cache"] = llm_cache.get_stats()
+    data["chat_cache"] = semantic_cache.get_stats()
+    data["singleflight"] = singleflight.get_stats()
+    data["task_fragments"] = task_fragments.get_stats()
+    data["intent_rules"] = intent_rules.get_stats()
+    data["local_intent"] = local_intent.get_stats()
+    data["task_retrieval"] = task_retrieval.get_stats()
+    data["list_engine"] = list_engine.get_stats()
+    data["speculation"] = ensemble.get_speculation_stats()
+    data["intent_breakers"] = core_brain.get_breaker_states()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return data
+
+
+def reset():
+    with _lock:
+        _series.clear()
@@ -0,0 +1,398 @@
+# local_intent.py
+#
+# Self-training local intent classifier.
+#
+# - Every ensemble decision is appended to intent_votes.csv
+#   (message, winning intent, per-model votes).
+# - train_model() fits a TF-IDF + multinomial logistic regression model
+#   (pure Python, CPU only) on that file, calibrates its confidence with
+#   temperature scaling on a held-out split, and saves it to intent_model.json.
+# - predict() serves it; callers use the answer only when the calibrated
+#   confidence clears CONFIDENCE_THRESHOLD and fall back to the ensemble
+#   otherwise.
+# - The model only sees the message text, so it is neither trained on nor
+#   asked about messages that need the conversation to make sense
+#   ("yes", "ok" after a question, "what about tomorrow?").
+# - The vote log holds raw messages: rows older than VOTES_MAX_AGE_DAYS
+#   are dropped and at most VOTES_MAX_ROWS are kept.
+
+import os
+import re
+import csv
+import json
+import math
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from intent_rules import assistant_asked
+
+# -----------------------
+# Config
+# -----------------------
+VOTES_CSV = "intent_votes.csv"
+MODEL_FILE = "intent_model.json"
+
+VOTE_FIELDS = ["timestamp_utc", "user_id", "user_message", "intent", "votes"]
+INTENTS = ["list", "create", "update", "delete", "chat"]
+
+VOTES_MAX_ROWS = int(os.getenv("LOCAL_INTENT_MAX_ROWS", "5000"))
+VOTES_MAX_AGE_DAYS = int(os.getenv("LOCAL_INTENT_MAX_AGE_DAYS", "90"))
+TRIM_EVERY_ROWS = 100         # check the log's size every this many appends
+
+ENABLED = os.getenv("LOCAL_INTENT_ENABLED", "1") == "1"
+CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_INTENT_THRESHOLD", "0.9"))
+
+MIN_TRAIN_ROWS = 200          # don't serve a model trained on less
+RETRAIN_EVERY_ROWS = 100      # retrain once this many new rows arrived
+MAX_FEATURES = 20000
+EPOCHS = 20
+LEARNING_RATE = 0.5
+L2 = 1e-4
+HOLDOUT_FRACTION = 0.2
+TEMPERATURES = [0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0]
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# openers / words that point back at an earlier turn
+FOLLOW_UP_RE = re.compile(
+    r"^(?:yes|yeah|yep|yup|no|nope|nah|ok|okay|sure|and|also|but|or|instead|"
+    r"what about|how about|same|the other one|that one|this one)\b"
+)
+BACK_REFERENCE_WORDS = {"it", "that", "them", "those", "these", "again"}
+
+_lock = threading.Lock()
+_model = None
+_model_mtime = None
+_stats = {"served": 0, "fallback": 0, "needs_context": 0}
+_appends = 0
+
+
+# -----------------------
+# Context
+# -----------------------
+def needs_context(packet):
+    """
+    True when the message can't be classified from its text alone: it
+    answers the assistant's question or refers back to an earlier turn.
+    """
+    text = (packet.get("user_message") or "").strip().lower()
+    if assistant_asked(packet.get("chat_context")):
+        return True
+    if FOLLOW_UP_RE.match(text):
+        return True
+    return bool(BACK_REFERENCE_WORDS.intersection(_TOKEN_RE.findall(text)))
+
+
+# -----------------------
+# Vote log
+# -----------------------
+def _trim_votes():
+    """
+    Drop rows older than VOTES_MAX_AGE_DAYS and keep the newest
+    VOTES_MAX_ROWS. Caller holds _lock.
+    """
+    if not os.path.exists(VOTES_CSV):
+        return
+    with open(VOTES_CSV, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=VOTES_MAX_AGE_DAYS)).isoformat()
+    kept = [r for r in rows if (r.get("timestamp_utc") or "") >= cutoff][-VOTES_MAX_ROWS:]
+    if len(kept) == len(rows):
+        return
+
+    tmp = VOTES_CSV + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=VOTE_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(kept)
+    os.replace(tmp, VOTES_CSV)
+
+
+def log_vote(packet, intent_result):
+    """
+    Append one ensemble decision to the training set.
+    Decisions where every model errored, and messages that need the
+    conversation to be understood, are skipped.
+    """
+    global _appends
+    message = (packet.get("user_message") or "").strip()
+    intent = intent_result.get("intent")
+    stats = intent_result.get("stats") or {}
+    model_results = stats.get("model_results") or []
+
+    if not message or intent not in INTENTS:
+        return
+    if model_results and all(r.get("error") for r in model_results):
+        return
+    if needs_context(packet):
+        return
+
+    votes = {r.get("model"): r.get("intent") for r in model_results if not r.get("error")}
+
+    with _lock:
+        # trim once at startup, then every TRIM_EVERY_ROWS appends
+        if _appends % TRIM_EVERY_ROWS == 0:
+            try:
+                _trim_votes()
+            except OSError as e:
+                print(f"⚠️ Could not trim {VOTES_CSV}: {e}")
+        _appends += 1
+
+        file_exists = os.path.exists(VOTES_CSV)
+        with open(VOTES_CSV, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=VOTE_FIELDS)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerow({
+                "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+                "user_id": packet.get("user_id", ""),
+                "user_message": message,
+                "intent": intent,
+                "votes": json.dumps(votes, ensure_ascii=False)
+            })
+
+
+def load_votes():
+    if not os.path.exists(VOTES_CSV):
+        return []
+    with open(VOTES_CSV, newline="", encoding="utf-8") as f:
+        return [r for r in csv.DictReader(f) if r.get("user_message") and r.get("intent") in INTENTS]
+
+
+# -----------------------
+# Features
+# -----------------------
+def _features(text):
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    feats = Counter(f"w:{t}" for t in tokens)
+    feats.update(f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    if not tokens:
+        feats["w:<empty>"] = 1
+    return feats
+
+
+def _vectorize(text, idf):
+    raw = _features(text)
+    vec = {}
+    for f, count in raw.items():
+        w = idf.get(f)
+        if w is not None:
+            vec[f] = (1.0 + math.log(count)) * w
+    norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {f: v / norm for f, v in vec.items()}
+
+
+def _build_idf(texts):
+    df = Counter()
+    for text in texts:
+        df.update(set(_features(text)))
+    n = len(texts)
+    kept = [f for f, _ in df.most_common(MAX_FEATURES)]
+    return {f: math.log((1 + n) / (1 + df[f])) + 1.0 for f in kept}
+
+
+# -----------------------
+# Model
+# -----------------------
+def _scores(vec, weights, bias):
+    return {
+        c: bias[c] + sum(weights[c].get(f, 0.0) * v for f, v in vec.items())
+        for c in INTENTS
+    }
+
+
+def _softmax(scores, temperature=1.0):
+    top = max(scores.values())
+    exps = {c: math.exp((s - top) / temperature) for c, s in scores.items()}
+    total = sum(exps.values())
+    return {c: e / total for c, e in exps.items()}
+
+
+def _fit(samples, seed=31):
+    """
+    samples: list of (vec, label). Plain SGD on softmax cross-entropy.
+    """
+    weights = {c: {} for c in INTENTS}
+    bias = {c: 0.0 for c in INTENTS}
+    rng = random.Random(seed)
+    order = list(range(len(samples)))
+
+    for epoch in range(EPOCHS):
+        rng.shuffle(order)
+        lr = LEARNING_RATE / (1 + epoch)
+        for i in order:
+            vec, label = samples[i]
+            probs = _softmax(_scores(vec, weights, bias))
+            for c in INTENTS:
+                grad = probs[c] - (1.0 if c == label else 0.0)
+                if grad == 0.0:
+                    continue
+                wc = weights[c]
+                for f, v in vec.items():
+                    wc[f] = wc.get(f, 0.0) * (1 - lr * L2) - lr * grad * v
+                bias[c] -= lr * grad
+
+    return weights, bias
+
+
+def _calibrate(samples, weights, bias):
+    """
+    Temperature with the lowest held-out negative log-likelihood.
+    """
+    if not samples:
+        return 1.0, None
+
+    best_t, best_nll = 1.0, float("inf")
+    for t in TEMPERATURES:
+        nll = 0.0
+        for vec, label in samples:
+            probs = _softmax(_scores(vec, weights, bias), t)
+            nll -= math.log(max(probs[label], 1e-12))
+        if nll < best_nll:
+            best_t, best_nll = t, nll
+
+    correct = sum(
+        1 for vec, label in samples
+        if max(_scores(vec, weights, bias).items(), key=lambda kv: kv[1])[0] == label
+    )
+    return best_t, correct / len(samples)
+
+
+def _dedupe(rows):
+    """
+    One example per distinct message, labelled with its most common intent.
+    """
+    by_text = {}
+    for r in rows:
+        key = r["user_message"].strip().lower()
+        by_text.setdefault(key, Counter())[r["intent"]] += 1
+    return [(text, counts.most_common(1)[0][0]) for text, counts in by_text.items()]
+
+
+def train_model(min_rows=MIN_TRAIN_ROWS, seed=31):
+    """
+    Train on intent_votes.csv and save MODEL_FILE.
+    Returns a summary dict, or None if there isn't enough data.
+    """
+    rows = load_votes()
+    examples = _dedupe(rows)
+    if len(examples) < min_rows:
+        return None
+
+    rng = random.Random(seed)
+    rng.shuffle(examples)
+    cut = int(len(examples) * (1 - HOLDOUT_FRACTION))
+    train, holdout = examples[:cut], examples[cut:]
+
+    # fit on the train split, calibrate on the holdout ...
+    idf = _build_idf([t for t, _ in train])
+    weights, bias = _fit([(_vectorize(t, idf), y) for t, y in train], seed)
+    temperature, holdout_accuracy = _calibrate(
+        [(_vectorize(t, idf), y) for t, y in holdout], weights, bias
+    )
+
+    # ... then refit on everything, keeping the calibrated temperature
+    idf = _build_idf([t for t, _ in examples])
+    weights, bias = _fit([(_vectorize(t, idf), y) for t, y in examples], seed)
+
+    model = {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "trained_rows": len(rows),
+        "examples": len(examples),
+        "holdout_accuracy": holdout_accuracy,
+        "temperature": temperature,
+        "idf": idf,
+        "weights": {c: {f: round(w, 6) for f, w in ws.items() if abs(w) > 1e-6} for c, ws in weights.items()},
+        "bias": bias
+    }
+
+    tmp = MODEL_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(model, f)
+    os.replace(tmp, MODEL_FILE)
+
+    return {k: model[k] for k in ("trained_at", "trained_rows", "examples", "holdout_accuracy", "temperature")}
+
+
+def maybe_retrain():
+    """
+    Retrain when RETRAIN_EVERY_ROWS new votes arrived since the last model.
+    (Counted by timestamp: the log is capped, so its length stops growing.)
+    """
+    model = _load_model()
+    if model:
+        trained_at = model.get("trained_at") or ""
+        new_rows = sum(1 for r in load_votes() if (r.get("timestamp_utc") or "") > trained_at)
+        if new_rows < RETRAIN_EVERY_ROWS:
+            return None
+    return train_model()
+
+
+# -----------------------
+# Serving
+# -----------------------
+def _load_model():
+    global _model, _model_mtime
+    if not os.path.exists(MODEL_FILE):
+        return None
+
+    mtime = os.path.getmtime(MODEL_FILE)
+    if _model is None or mtime != _model_mtime:
+        with _lock:
+            try:
+                with open(MODEL_FILE, encoding="utf-8") as f:
+                    _model = json.load(f)
+                _model_mtime = mtime
+            except Exception:
+                return _model
+
+    return _model
+
+
+def predict(text):
+    """
+    Returns (intent, calibrated_confidence), or (None, 0.0) without a model.
+    """
+    model = _load_model()
+    if not model:
+        return None, 0.0
+
+    vec = _vectorize(text, model["idf"])
+    probs = _softmax(_scores(vec, model["weights"], model["bias"]), model["temperature"])
+    intent = max(probs, key=probs.get)
+    return intent, probs[intent]
+
+
+def classify(packet):
+    """
+    Serving entry point for the ensemble: {"intent", "confidence"} when the
+    local model is confident enough, otherwise None.
+    """
+    if not ENABLED:
+        return None
+    if needs_context(packet):
+        _stats["needs_context"] += 1
+        return None
+
+    intent, confidence = predict(packet.get("user_message"))
+    if intent and confidence >= CONFIDENCE_THRESHOLD:
+        _stats["served"] += 1
+        return {"intent": intent, "confidence": confidence}
+
+    _stats["fallback"] += 1
+    return None
+
+
+def get_stats():
+    model = _load_model()
+    seen = _stats["served"] + _stats["fallback"] + _stats["needs_context"]
+    return {
+        "served": _stats["served"],
+        "fallback": _stats["fallback"],
+        "needs_context": _stats["needs_context"],
+        "served_rate": (_stats["served"] / seen) if seen else 0.0,
+        "model_trained_at": model.get("trained_at") if model else None,
+        "holdout_accuracy": model.get("holdout_accuracy") if model else None
+    }
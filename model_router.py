@@ -0,0 +1,241 @@
+# model_router.py
+#
+# Per-stage model routing for the ai_core processors (and the single-call
+# ai_core_combined), time_fixer_ai and list_fun.
+#
+# Each stage has a routing table entry (candidates, accuracy target,
+# default). route(stage) picks the fastest candidate whose recorded
+# success rate meets the stage's target:
+# - success is reported by the call site with record_outcome(): the answer
+#   parsed and (for update/delete/combined) passed the google_id safety
+#   check. For create, chat, time_fix and the list stages it only means
+#   the JSON parsed, which says nothing about whether the answer was
+#   right, so a cheaper model can qualify there on format alone; keep
+#   their targets strict and their candidate lists short
+# - latency is the candidate's p95 for the stage over its last
+#   LATENCY_WINDOW successful calls (llm_client reports every call with
+#   record_latency); the p95 is cached and re-sorted only every
+#   P95_REFRESH_SAMPLES new samples, so route() stays cheap
+# - candidates without MIN_SAMPLES outcomes yet get EXPLORE_RATE of the
+#   traffic so they can qualify; until one does, the default is used
+#
+# The table lives in ROUTES_JSON and is re-read whenever the file changes,
+# so stages can be re-pointed at runtime. A missing file means the
+# built-in DEFAULT_ROUTES (which keep today's models as defaults).
+
+import os
+import json
+import random
+import threading
+from collections import deque
+import speculation
+
+# -----------------------
+# Config
+# -----------------------
+ROUTES_JSON = "model_routes.json"
+MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "30"))
+EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", "0.05"))
+OUTCOME_WINDOW = 500
+LATENCY_WINDOW = 200
+P95_REFRESH_SAMPLES = 10
+
+_OPENAI_CANDIDATES = [
+    {"provider": "openai", "model": "gpt-4o-mini"},
+    {"provider": "openai", "model": "gpt-4o"},
+    {"provider": "openai", "model": "gpt-4"},
+]
+
+DEFAULT_ROUTES = {
+    "create": {"target": 0.95, "default": "gpt-4", "candidates": _OPENAI_CANDIDATES},
+    "update": {"target": 0.95, "default": "gpt-4", "candidates": _OPENAI_CANDIDATES},
+    "delete": {"target": 0.95, "default": "gpt-4", "candidates": _OPENAI_CANDIDATES},
+    "chat": {"target": 0.9, "default": "gpt-4", "candidates": _OPENAI_CANDIDATES},
+    "combined": {
+        "target": 0.95,
+        "default": os.getenv("COMBINED_MODEL", "gpt-4o"),
+        "candidates": [{"provider": "openai", "model": "gpt-4o-mini"}, {"provider": "openai", "model": "gpt-4o"}],
+    },
+    "time_fix": {"target": 0.95, "default": "gpt-4o-mini", "candidates": _OPENAI_CANDIDATES},
+    "list_full": {
+        "target": 0.95,
+        "default": "gpt-4o-mini",
+        "candidates": [{"provider": "openai", "model": "gpt-4o-mini"}, {"provider": "openai", "model": "gpt-4o"}],
+    },
+    "list_structured": {
+        "target": 0.95,
+        "default": "gpt-4o-mini",
+        "candidates": [{"provider": "openai", "model": "gpt-4o-mini"}, {"provider": "openai", "model": "gpt-4o"}],
+    },
+}
+
+_lock = threading.Lock()
+_table = {"stamp": None, "routes": DEFAULT_ROUTES}
+_outcomes = {}  # (stage, model) -> deque of bools
+_latency = {}   # (stage, model) -> {"samples": deque, "p95": float|None, "stale": int}
+_decisions = {}  # stage -> {model: count}
+
+
+# -----------------------
+# Routing table
+# -----------------------
+def _file_stamp():
+    try:
+        st = os.stat(ROUTES_JSON)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def routes():
+    """
+    Current routing table (reloaded when ROUTES_JSON changes).
+    """
+    stamp = _file_stamp()
+    with _lock:
+        if stamp != _table["stamp"]:
+            table = DEFAULT_ROUTES
+            if stamp is not None:
+                try:
+                    with open(ROUTES_JSON, "r", encoding="utf-8") as f:
+                        table = {**DEFAULT_ROUTES, **json.load(f)}
+                    print(f"🔀 Model routes reloaded from {ROUTES_JSON}")
+                except Exception as e:
+                    print(f"⚠️ Could not load {ROUTES_JSON}, keeping previous routes: {e}")
+                    table = _table["routes"]
+            _table["routes"] = table
+            _table["stamp"] = stamp
+        return _table["routes"]
+
+
+def _candidate(route, model):
+    for c in route.get("candidates") or []:
+        if c.get("model") == model:
+            return c
+    return {"provider": "openai", "model": model}
+
+
+# -----------------------
+# Metrics
+# -----------------------
+def record_outcome(stage, model, ok):
+    """
+    Whether a routed call produced a usable answer. Held back while the
+    call is speculative (see speculation.py).
+
+    ok is only as strong as the call site's check: update/delete/combined
+    verify the google_id, but for create, chat, time_fix and the list
+    stages it just means the JSON parsed, not that the answer was right.
+    """
+    speculation.defer(_record_outcome, stage, model, ok)
+
+
+def _record_outcome(stage, model, ok):
+    with _lock:
+        _outcomes.setdefault((stage, model), deque(maxlen=OUTCOME_WINDOW)).append(bool(ok))
+
+
+def success_rate(stage, model):
+    with _lock:
+        samples = _outcomes.get((stage, model))
+        if not samples:
+            return None, 0
+        return sum(samples) / len(samples), len(samples)
+
+
+def record_latency(stage, model, seconds):
+    """
+    Latency of one successful model call (reported by llm_client).
+    """
+    with _lock:
+        entry = _latency.get((stage, model))
+        if entry is None:
+            entry = _latency[(stage, model)] = {
+                "samples": deque(maxlen=LATENCY_WINDOW), "p95": None, "stale": 0
+            }
+        entry["samples"].append(seconds)
+        entry["stale"] += 1
+
+
+def _p95(entry):
+    if entry["p95"] is None or entry["stale"] >= P95_REFRESH_SAMPLES:
+        ordered = sorted(entry["samples"])
+        entry["p95"] = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        entry["stale"] = 0
+    return entry["p95"]
+
+
+def _latencies(stage):
+    """
+    model -> p95 seconds for this stage.
+    """
+    with _lock:
+        return {
+            model: _p95(entry)
+            for (s, model), entry in _latency.items()
+            if s == stage and entry["samples"]
+        }
+
+
+# -----------------------
+# Selection
+# -----------------------
+def route(stage):
+    """
+    {"provider", "model", "reason"} for a stage's next call.
+    """
+    table = routes().get(stage)
+    if not table:
+        raise ValueError(f"No model route for stage: {stage}")
+
+    target = table.get("target", 0.95)
+    candidates = table.get("candidates") or []
+    latencies = _latencies(stage)
+
+    qualified = []
+    unproven = []
+    for c in candidates:
+        rate, n = success_rate(stage, c["model"])
+        if n < MIN_SAMPLES:
+            unproven.append(c)
+        elif rate >= target and c["model"] in latencies:
+            qualified.append((latencies[c["model"]], c))
+
+    if unproven and random.random() < EXPLORE_RATE:
+        choice, reason = random.choice(unproven), "explore"
+    elif qualified:
+        choice, reason = min(qualified, key=lambda q: q[0])[1], "fastest_qualified"
+    else:
+        choice, reason = _candidate(table, table.get("default")), "default"
+
+    with _lock:
+        counts = _decisions.setdefault(stage, {})
+        counts[choice["model"]] = counts.get(choice["model"], 0) + 1
+
+    return {"provider": choice.get("provider", "openai"), "model": choice["model"], "reason": reason}
+
+
+def get_stats():
+    """
+    Per stage: routing decisions and each candidate's success rate / p95.
+    """
+    stats = {}
+    for stage, table in routes().items():
+        latencies = _latencies(stage)
+        candidates = {}
+        for c in table.get("candidates") or []:
+            rate, n = success_rate(stage, c["model"])
+            candidates[c["model"]] = {
+                "success_rate": rate,
+                "samples": n,
+                "p95_seconds": latencies.get(c["model"]),
+            }
+        with _lock:
+            decisions = dict(_decisions.get(stage, {}))
+        stats[stage] = {
+            "target": table.get("target"),
+            "default": table.get("default"),
+            "decisions": decisions,
+            "candidates": candidates,
+        }
+    return stats
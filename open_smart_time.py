@@ -1,25 +1,14 @@
-import os
 import json
 import re
 import time
 from datetime import datetime
 import pytz
-from dotenv import load_dotenv
-from openai import OpenAI
+import llm_client
+import llm_telemetry
 
 # -----------------------
 # Config
 # -----------------------
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in .env")
-
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-)
-
 MODEL = "openai/gpt-5.2"
 
 # -----------------------
@@ -66,8 +55,10 @@ Return a JSON object like:
 """
 
     start_time = time.time()
-    completion = client.chat.completions.create(
+    completion = llm_client.complete_sync(
+        "openrouter",
         model=MODEL,
+        stage="smart_time",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
@@ -85,6 +76,7 @@ Return a JSON object like:
     data = extract_json(text)
 
     if not data:
+        llm_telemetry.record_parse_failure(MODEL, "smart_time")
         return {"start_time": None, "end_time": None, "elapsed_seconds": elapsed}
 
     # ensure start_time/end_time keys exist
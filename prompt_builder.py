@@ -0,0 +1,297 @@
+# prompt_builder.py
+#
+# Token-budgeted prompt building with rolling chat-context summaries.
+#
+# - Each stage (intent, chat, update, delete, ...) gets a token budget for
+#   its variable parts (conversation + task list).
+# - Only the newest RAW_TURNS conversation turns are sent verbatim (fewer
+#   when they don't fit the stage's budget); every older turn, including
+#   window turns the tightest budget drops, is folded into a per-user
+#   rolling summary that is updated incrementally in the background (only
+#   newly evicted turns are sent to the summarizer), so prompt size stops
+#   growing with chat length.
+# - Task listings are rendered from task_fragments, so unchanged tasks
+#   are not re-serialized on every message.
+
+import os
+import json
+import math
+import threading
+from datetime import datetime, timezone
+import llm_client
+import task_fragments
+from task_utils import normalize_user_id
+
+# -----------------------
+# Config
+# -----------------------
+SUMMARIES_JSON = "chat_summaries.json"
+
+RAW_TURNS = 6              # newest turns always sent verbatim (budget permitting)
+SUMMARY_MAX_WORDS = 120
+
+SUMMARY_PROVIDER = "openai"
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+
+# token budgets per stage: conversation (context) and task listing (tasks)
+STAGE_BUDGETS = {
+    "intent": {"context": 400, "tasks": 800},
+    "chat": {"context": 1200, "tasks": 0},
+    "create": {"context": 0, "tasks": 0},
+    "update": {"context": 400, "tasks": 2500},
+    "delete": {"context": 400, "tasks": 2500},
+    "combined": {"context": 400, "tasks": 2500},
+    "list": {"context": 0, "tasks": 3000},
+}
+
+_lock = threading.Lock()
+_running = set()  # user ids with a summary update in flight
+
+
+# -----------------------
+# Token helpers
+# -----------------------
+def estimate_tokens(text):
+    """
+    Cheap estimate (~4 characters per token); no tokenizer dependency.
+    """
+    if not text:
+        return 0
+    return math.ceil(len(str(text)) / 4)
+
+
+def compact_json(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def budget_for(stage, part):
+    return STAGE_BUDGETS.get(stage, {}).get(part, 0)
+
+
+def fit_items(items, render, budget_tokens):
+    """
+    Longest prefix of items whose rendered size fits the budget.
+    """
+    kept = []
+    used = 0
+    for item in items or []:
+        cost = estimate_tokens(render(item)) + 1
+        if used + cost > budget_tokens:
+            break
+        kept.append(item)
+        used += cost
+    return kept
+
+
+# -----------------------
+# Summary storage
+# -----------------------
+def _load_summaries():
+    if not os.path.exists(SUMMARIES_JSON):
+        return {}
+    try:
+        with open(SUMMARIES_JSON, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_summary(uid, record):
+    with _lock:
+        data = _load_summaries()
+        data[uid] = record
+        tmp = SUMMARIES_JSON + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, SUMMARIES_JSON)
+
+
+def get_summary(user_id):
+    if not user_id:
+        return None
+    return _load_summaries().get(normalize_user_id(user_id), {}).get("summary") or None
+
+
+# -----------------------
+# Context building
+# -----------------------
+def _content(msg):
+    return str(msg.get("content") or msg.get("message") or "")
+
+
+def _fit_turns(chat_context, budget):
+    newest_first = list(reversed((chat_context or [])[-RAW_TURNS:]))
+    kept = fit_items(newest_first, lambda m: f"{m.get('role', 'user')}: {_content(m)}", budget)
+    return list(reversed(kept))
+
+
+def recent_turns(chat_context, stage):
+    """
+    Newest turns (at most RAW_TURNS) that fit the stage's context budget.
+    """
+    return _fit_turns(chat_context, budget_for(stage, "context"))
+
+
+def verbatim_turns(chat_context):
+    """
+    Newest turns that every stage sending conversation sends verbatim
+    (the tightest non-zero context budget). Anything older belongs in the
+    summary.
+    """
+    budget = min(b["context"] for b in STAGE_BUDGETS.values() if b.get("context"))
+    return _fit_turns(chat_context, budget)
+
+
+def build_chat_messages(user_id, chat_context, stage):
+    """
+    OpenAI-style messages: rolling summary (as a system note) + newest raw turns.
+    """
+    messages = []
+    summary = get_summary(user_id)
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of earlier conversation: {summary}"})
+
+    for msg in recent_turns(chat_context, stage):
+        messages.append({"role": msg.get("role", "user"), "content": _content(msg)})
+
+    return messages
+
+
+def format_recent_messages(user_id, chat_context, stage):
+    """
+    Plain-text conversation block for single-prompt templates.
+    """
+    lines = []
+    summary = get_summary(user_id)
+    if summary:
+        lines.append(f"(earlier) {summary}")
+    for msg in recent_turns(chat_context, stage):
+        lines.append(f"{msg.get('role', 'user')}: {_content(msg)}")
+    return "\n".join(lines) if lines else "No recent messages."
+
+
+def fit_tasks(tasks, stage, render=None):
+    """
+    Leading tasks that fit the stage's task budget.
+    """
+    render = render or (lambda t: task_fragments.fragment(t, "compact"))
+    return fit_items(tasks, render, budget_for(stage, "tasks"))
+
+
+def compact_task(task):
+    return {
+        k: task.get(k)
+        for k in ("title", "due", "status")
+        if task.get(k)
+    }
+
+
+def compact_packet(packet, stage="intent"):
+    """
+    Budgeted copy of a user packet for model prompts: summary + newest
+    turns instead of the full chat_context, trimmed task fields.
+    """
+    user_id = packet.get("user_id")
+    tasks = [compact_task(t) for t in packet.get("tasks") or []]
+    compact = {
+        "user_message": packet.get("user_message"),
+        "user_timezone": packet.get("user_timezone"),
+        "current_time": packet.get("current_time"),
+        "chat_context": [
+            {"role": m.get("role", "user"), "content": _content(m)}
+            for m in recent_turns(packet.get("chat_context"), stage)
+        ],
+        "tasks": fit_items(tasks, compact_json, budget_for(stage, "tasks"))
+    }
+    summary = get_summary(user_id)
+    if summary:
+        compact["conversation_summary"] = summary
+    return compact
+
+
+def compact_packet_json(packet, stage="intent"):
+    """
+    compact_json(compact_packet(packet, stage)), with the task list taken
+    from task_fragments instead of being serialized again.
+    """
+    compact = compact_packet({**packet, "tasks": []}, stage)
+    del compact["tasks"]
+
+    render = lambda t: task_fragments.fragment(t, "compact")
+    rows = fit_items(packet.get("tasks") or [], render, budget_for(stage, "tasks"))
+    tasks_json = "[" + task_fragments.listing(rows, "compact") + "]"
+
+    return compact_json(compact)[:-1] + ',"tasks":' + tasks_json + "}"
+
+
+# -----------------------
+# Rolling summary updates
+# -----------------------
+def _summarize(previous_summary, turns):
+    transcript = "\n".join(f"{m.get('role', 'user')}: {_content(m)}" for m in turns)
+    prompt = (
+        "You maintain a running summary of a conversation between a user and their "
+        "task assistant. Update the summary with the new turns below. Keep facts the "
+        "assistant may need later (tasks mentioned, preferences, open questions). "
+        f"Maximum {SUMMARY_MAX_WORDS} words. Output only the summary.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New turns:\n{transcript}"
+    )
+    completion = llm_client.complete_sync(
+        SUMMARY_PROVIDER,
+        model=SUMMARY_MODEL,
+        stage="summary",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=300
+    )
+    return (completion.choices[0].message.content or "").strip()
+
+
+def update_summary(user_id, chat_context):
+    """
+    Fold turns that are no longer sent verbatim (and were not summarized
+    yet) into the user's rolling summary.
+    """
+    uid = normalize_user_id(user_id)
+    record = _load_summaries().get(uid, {})
+    summarized_until = record.get("summarized_until") or ""
+
+    chat_context = chat_context or []
+    evicted = chat_context[:len(chat_context) - len(verbatim_turns(chat_context))]
+    new_turns = [m for m in evicted if (m.get("timestamp") or "") > summarized_until]
+    if not new_turns:
+        return record.get("summary")
+
+    summary = _summarize(record.get("summary"), new_turns)
+    if not summary:
+        return record.get("summary")
+
+    _save_summary(uid, {
+        "summary": summary,
+        "summarized_until": new_turns[-1].get("timestamp") or "",
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    })
+    return summary
+
+
+def schedule_summary_update(user_id, chat_context):
+    """
+    Run update_summary in a background thread (one at a time per user).
+    """
+    uid = normalize_user_id(user_id)
+    with _lock:
+        if uid in _running:
+            return
+        _running.add(uid)
+
+    def _run():
+        try:
+            update_summary(uid, chat_context)
+        except Exception as e:
+            print(f"⚠️ Summary update failed for {uid}: {e}")
+        finally:
+            with _lock:
+                _running.discard(uid)
+
+    threading.Thread(target=_run, daemon=True).start()
@@ -2,17 +2,7 @@
 import os
 import csv
 from datetime import datetime, timezone
-from dotenv import load_dotenv
-from openrouter import OpenRouter
-
-# --- Load environment ---
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise ValueError("🚨 OPENROUTER_API_KEY not found in .env")
-
-# Initialize OpenRouter client
-client = OpenRouter(api_key=OPENROUTER_API_KEY)
+import llm_client
 
 TASKS_CSV = "tasks.csv"
 REMINDERS_LOG_CSV = "reminders_sent.csv"
@@ -59,10 +49,11 @@ def generate_ai_reminder(task_title, ai_comment=""):
         f"{ai_comment}"
     )
     try:
-        completion = client.chat.send(
+        completion = llm_client.complete_sync(
+            "openrouter",
             model="openai/gpt-5.2",
-            messages=[{"role": "user", "content": prompt}],
-            stream=False
+            stage="reminder",
+            messages=[{"role": "user", "content": prompt}]
         )
         message = completion.choices[0].message.content.strip()
         return message
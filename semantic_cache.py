@@ -0,0 +1,255 @@
+# semantic_cache.py
+#
+# Similarity cache for chat-intent replies (ai_core_packet).
+#
+# Near-identical small talk ("thanks!", "thank you", "ok cool") gets the
+# same kind of answer, so a recent reply is reused when a new chat
+# message is close enough to a cached one:
+# - messages become character n-gram vectors (no model, no dependency)
+# - an inverted n-gram index per user finds candidates; the nearest one
+#   by cosine similarity is a hit when it reaches THRESHOLD
+# - entries are scoped to the user and to a version of their task state,
+#   so a reply never outlives a change to the tasks it may mention
+# - only short messages are cached (MAX_MESSAGE_CHARS) and entries
+#   expire after TTL_SECONDS
+# - only context-free small talk is eligible: never a reply to an
+#   assistant question ("yes", "ok" mean something different each time),
+#   nor a message with digits, day/time words or references to an earlier
+#   turn ("is my meeting at 5pm?", "move the gym to monday?", "what
+#   about tomorrow?"), where one character separates different answers
+# - common small-talk variants are canonicalized before vectorizing
+#   ("thank you" / "thx" -> "thanks", "okay" -> "ok", "hey" -> "hi"), so
+#   the threshold can stay strict
+#
+# THRESHOLD was tuned on tests/test_semantic_cache.py's pairs: same-meaning
+# pairs score 1.0 after canonicalization (0.965 for "haha"/"hahaha"); the
+# closest different-meaning pairs are "what can you do" / "what can't you
+# do" (0.856), "are you a bot" / "are you a robot" (0.840) and "how are
+# you" / "how old are you" (0.824). 0.85 let the first through.
+#
+# get_stats() exposes the threshold, hit rate, similarity of hits and the
+# near misses just under the threshold (for tuning).
+
+import os
+import re
+import math
+import time
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from intent_rules import assistant_asked
+
+# -----------------------
+# Config
+# -----------------------
+ENABLED = os.getenv("CHAT_CACHE", "1") == "1"
+THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.9"))
+TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "1800"))
+MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "200"))  # per user
+MAX_MESSAGE_CHARS = 80
+
+NGRAM_SIZES = (2, 3)
+NEAR_MISS_MARGIN = 0.1
+
+# messages with any of these depend on the clock or an earlier turn
+CONTEXT_WORDS = {
+    "today", "tonight", "tomorrow", "yesterday", "week", "weekend", "month",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mon", "tue", "tues", "wed", "thu", "thur", "thurs", "fri", "sat", "sun",
+    "am", "pm", "noon", "midnight", "oclock", "o'clock", "hour", "hours", "minute", "minutes",
+    "next", "later", "before", "after", "until", "earlier",
+    "it", "that", "them", "those", "these", "again", "about", "instead",
+    "yes", "yeah", "yep", "no", "nope",
+}
+_DIGIT_RE = re.compile(r"\d")
+
+# (pattern, replacement) applied to normalized text before vectorizing
+CANONICAL_FORMS = [
+    (re.compile(r"\bthank you\b|\bthank u\b|\b(?:thx|ty|thanx|tnx)\b"), "thanks"),
+    (re.compile(r"\b(?:okay|okey|k|kk)\b"), "ok"),
+    (re.compile(r"\b(?:hello|hey|heya|hiya|yo)\b"), "hi"),
+    (re.compile(r"(.)\1{2,}"), r"\1\1"),  # "thanksss" -> "thankss"
+]
+
+_lock = threading.Lock()
+_users = {}  # user_id -> {"entries": OrderedDict(id -> entry), "index": {gram: set(ids)}}
+_next_id = 0
+_stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "skipped": 0,
+          "near_misses": 0, "hit_similarity_sum": 0.0}
+
+
+# -----------------------
+# Vectors
+# -----------------------
+def _normalize(text):
+    text = (text or "").lower().replace("’", "'")
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _canonical(text):
+    text = _normalize(text)
+    for pattern, replacement in CANONICAL_FORMS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def vectorize(text):
+    """
+    Character n-gram counts (with word-boundary padding) of the canonical
+    text, L2-normalized.
+    """
+    padded = f" {_canonical(text)} "
+    grams = Counter()
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    norm = math.sqrt(sum(v * v for v in grams.values())) or 1.0
+    return {g: v / norm for g, v in grams.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(g, 0.0) for g, v in a.items())
+
+
+def task_version(tasks):
+    """
+    Fingerprint of the task fields a chat reply could mention.
+    """
+    state = sorted(
+        (str(t.get("title") or ""), str(t.get("due") or ""), str(t.get("status") or ""))
+        for t in tasks or []
+    )
+    return hashlib.sha1(json.dumps(state).encode("utf-8")).hexdigest()
+
+
+# -----------------------
+# Index
+# -----------------------
+def _user(user_id):
+    return _users.setdefault(str(user_id), {"entries": OrderedDict(), "index": {}})
+
+
+def _drop(user, entry_id):
+    entry = user["entries"].pop(entry_id, None)
+    if entry is None:
+        return
+    for gram in entry["vector"]:
+        ids = user["index"].get(gram)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del user["index"][gram]
+
+
+def eligible(message, chat_context=None):
+    """
+    Whether a message is context-free small talk the cache may answer.
+    """
+    text = _normalize(message)
+    if not ENABLED or not 0 < len(text) <= MAX_MESSAGE_CHARS:
+        return False
+    if _DIGIT_RE.search(text) or CONTEXT_WORDS.intersection(text.split()):
+        return False
+    return not assistant_asked(chat_context)
+
+
+def lookup(user_id, message, tasks, chat_context=None):
+    """
+    Cached reply (a copy) for a message close enough to a recent one,
+    or None.
+    """
+    if not eligible(message, chat_context):
+        with _lock:
+            _stats["skipped"] += 1
+        return None
+
+    vector = vectorize(message)
+    version = task_version(tasks)
+    now = time.time()
+
+    with _lock:
+        _stats["lookups"] += 1
+        user = _user(user_id)
+
+        candidates = set()
+        for gram in vector:
+            candidates |= user["index"].get(gram, set())
+
+        best, best_sim = None, 0.0
+        for entry_id in candidates:
+            entry = user["entries"][entry_id]
+            if entry["expires_at"] <= now or entry["version"] != version:
+                continue
+            sim = cosine(vector, entry["vector"])
+            if sim > best_sim:
+                best, best_sim = entry, sim
+
+        if best is not None and best_sim >= THRESHOLD:
+            _stats["hits"] += 1
+            _stats["hit_similarity_sum"] += best_sim
+            return json.loads(json.dumps(best["reply"]))
+
+        if best is not None and best_sim >= THRESHOLD - NEAR_MISS_MARGIN:
+            _stats["near_misses"] += 1
+        _stats["misses"] += 1
+        return None
+
+
+def store(user_id, message, tasks, reply, chat_context=None):
+    global _next_id
+    if not eligible(message, chat_context):
+        return
+
+    entry = {
+        "message": message,
+        "vector": vectorize(message),
+        "version": task_version(tasks),
+        "reply": json.loads(json.dumps(reply)),
+        "expires_at": time.time() + TTL_SECONDS,
+    }
+
+    with _lock:
+        user = _user(user_id)
+
+        # entries for an older task state can never hit again
+        for entry_id in [i for i, e in user["entries"].items() if e["version"] != entry["version"]]:
+            _drop(user, entry_id)
+
+        _next_id += 1
+        user["entries"][_next_id] = entry
+        for gram in entry["vector"]:
+            user["index"].setdefault(gram, set()).add(_next_id)
+
+        while len(user["entries"]) > MAX_ENTRIES:
+            _drop(user, next(iter(user["entries"])))
+
+        _stats["stores"] += 1
+
+
+def get_stats():
+    with _lock:
+        hits = _stats["hits"]
+        lookups = _stats["lookups"]
+        return {
+            "threshold": THRESHOLD,
+            "lookups": lookups,
+            "hits": hits,
+            "misses": _stats["misses"],
+            "stores": _stats["stores"],
+            "skipped": _stats["skipped"],
+            "near_misses": _stats["near_misses"],
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "avg_hit_similarity": (_stats["hit_similarity_sum"] / hits) if hits else None,
+            "entries": sum(len(u["entries"]) for u in _users.values()),
+        }
+
+
+def clear():
+    with _lock:
+        _users.clear()
+        for k in _stats:
+            _stats[k] = 0.0 if k == "hit_similarity_sum" else 0
@@ -0,0 +1,126 @@
+# singleflight.py
+#
+# Collapse identical concurrent calls into one.
+#
+# While a call for a key is in flight, further calls with the same key
+# wait for it and share its result (or exception) instead of repeating
+# the work. Nothing is cached: once the call finishes the next caller
+# runs it again.
+#
+# - Group: for threads (Google sync, token refresh)
+# - AsyncGroup: for coroutines on one event loop (llm_client)
+#
+# Every group is registered by name; get_stats() shows per group how
+# many calls were made, how many actually ran and how many collapsed.
+#
+# Usage:
+#   _sync = singleflight.Group("google_sync")
+#   added = _sync.do(user_key, _sync_user, user_key)
+
+import asyncio
+import threading
+
+_registry_lock = threading.Lock()
+_stats = {}  # group name -> {"calls", "executed", "collapsed"}
+
+
+def _register(name):
+    with _registry_lock:
+        return _stats.setdefault(name, {"calls": 0, "executed": 0, "collapsed": 0})
+
+
+def _count(stats, field):
+    with _registry_lock:
+        stats["calls"] += 1
+        stats[field] += 1
+
+
+def get_stats():
+    with _registry_lock:
+        return {
+            name: {**s, "collapse_rate": (s["collapsed"] / s["calls"]) if s["calls"] else 0.0}
+            for name, s in sorted(_stats.items())
+        }
+
+
+# -----------------------
+# Threads
+# -----------------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = _register(name)
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        fn(*args, **kwargs), shared with concurrent callers using the same key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            _count(self._stats, "collapsed")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        _count(self._stats, "executed")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+# -----------------------
+# Coroutines
+# -----------------------
+class AsyncGroup:
+    """
+    Not thread-safe: use from a single event loop.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+        self._stats = _register(name)
+
+    async def do(self, key, factory):
+        """
+        await factory(), shared with concurrent callers using the same key.
+        Cancelling one caller doesn't cancel the shared call.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            _count(self._stats, "executed")
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            _count(self._stats, "collapsed")
+
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller went away
@@ -0,0 +1,57 @@
+# speculation.py
+#
+# Deferred side effects for speculative work (ensemble's
+# SPECULATIVE_EXECUTION).
+#
+# A speculative processor run may be thrown away, so the bookkeeping it
+# would normally do (semantic_cache.store, model_router.record_outcome)
+# must not happen until the guess is confirmed:
+# - run(fn, *args) calls fn in a context where defer() queues instead of
+#   executing, and returns (result, pending)
+# - commit(pending) applies the queued calls (speculation hit); a miss
+#   simply drops them
+#
+# The context travels with asyncio.to_thread, so processors running in a
+# worker thread see it too. Outside speculation defer() runs immediately.
+#
+# Model calls themselves are not deferred: they were made, and
+# llm_telemetry records them either way.
+
+import contextvars
+
+_pending = contextvars.ContextVar("speculation_pending", default=None)
+
+
+def active():
+    return _pending.get() is not None
+
+
+def defer(fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) now, or once the surrounding speculation is committed.
+    """
+    pending = _pending.get()
+    if pending is None:
+        return fn(*args, **kwargs)
+    pending.append((fn, args, kwargs))
+    return None
+
+
+def run(fn, *args):
+    """
+    fn(*args) with side effects deferred. Returns (result, pending).
+    """
+    pending = []
+    token = _pending.set(pending)
+    try:
+        return fn(*args), pending
+    finally:
+        _pending.reset(token)
+
+
+def commit(pending):
+    for fn, args, kwargs in pending or []:
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            print(f"⚠️ Deferred side effect failed: {e}")
@@ -6,6 +6,8 @@ import json
 from datetime import datetime
 import pytz
 
+import singleflight
+import task_fragments
 from ayth_script import list_tasks
 from time_fixer import fix_time_from_text
 
@@ -15,6 +17,8 @@ from time_fixer import fix_time_from_text
 TASKS_CSV = "tasks.csv"
 DATABASE_FILE = os.path.join(os.path.dirname(__file__), "database.json")
 
+_sync_flight = singleflight.Group("google_sync")
+
 FIELDS = [
     "user_id",
     "title",
@@ -95,7 +99,14 @@ def sync_user_tasks_to_csv(user_key):
     Pull Google tasks for a user and append new ones to CSV.
     Only tasks scheduled today or later (user timezone) are added.
     Does NOT delete or modify existing rows.
+
+    Concurrent syncs of the same user (onboarding + the periodic loop)
+    share one run and its result.
     """
+    return _sync_flight.do(user_key, _sync_user_tasks_to_csv, user_key)
+
+
+def _sync_user_tasks_to_csv(user_key):
     ensure_csv()
     rows = load_existing_rows()
 
@@ -155,6 +166,7 @@ def sync_user_tasks_to_csv(user_key):
         writer = csv.DictWriter(f, fieldnames=FIELDS)
         writer.writerows(new_rows)
 
+    task_fragments.invalidate(user_key)
     return len(new_rows)
 
 # -----------------------
@@ -0,0 +1,139 @@
+# task_aliases.py
+#
+# Compact task encoding for prompts that make the model pick tasks.
+#
+# Instead of JSON with 22+ character Google task ids and full ISO
+# timestamps, tasks are listed one per line under short per-request
+# aliases, with due times in the user's timezone:
+#
+#   t1: Gym session | due Sat 19 Oct 09:00 | leg day
+#   t2: Quarterly report | due Sun 20 Oct 17:00
+#
+# The model answers with the alias ("t2") and resolve() translates it
+# back to the task (and its google_id) before the usual google_id safety
+# checks. Short aliases are cheaper in both directions and can't be
+# mis-copied into an almost-right id.
+#
+# Task lines come from task_fragments (style "alias"), so unchanged tasks
+# are not re-rendered on every message.
+
+import re
+from datetime import datetime
+import pytz
+import task_fragments
+
+# -----------------------
+# Config
+# -----------------------
+ALIAS_PREFIX = "t"
+ALIAS_LABEL = ALIAS_PREFIX + "{n}: "
+ALIAS_FIELDS = ("title", "due", "details")
+
+_ALIAS_RE = re.compile(r"^\s*" + ALIAS_PREFIX + r"?(\d+)\s*$", re.I)
+
+
+# -----------------------
+# Rendering
+# -----------------------
+def render_due(due, user_timezone, this_year=None):
+    """
+    "Sat 19 Oct 09:00" in the user's timezone, with the year unless it is
+    this_year; unparseable values are returned unchanged.
+    """
+    if not due:
+        return ""
+    try:
+        dt = datetime.fromisoformat(str(due).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return str(due)
+
+    if dt.tzinfo is not None:
+        try:
+            dt = dt.astimezone(pytz.timezone(user_timezone or "UTC"))
+        except pytz.UnknownTimeZoneError:
+            pass
+
+    if dt.year != this_year:
+        return dt.strftime("%a %d %b %Y %H:%M")
+    return dt.strftime("%a %d %b %H:%M")
+
+
+def _render_alias(t, context):
+    user_timezone, this_year = context
+    parts = [str(t.get("title") or "(untitled)")]
+    due = render_due(t.get("due"), user_timezone, this_year)
+    if due:
+        parts.append(f"due {due}")
+    if t.get("details"):
+        parts.append(str(t["details"]))
+    return " | ".join(parts)
+
+
+task_fragments.register_style("alias", ALIAS_FIELDS, _render_alias)
+
+
+def _context(user_timezone):
+    try:
+        this_year = datetime.now(pytz.timezone(user_timezone or "UTC")).year
+    except pytz.UnknownTimeZoneError:
+        this_year = datetime.utcnow().year
+    return (user_timezone, this_year)
+
+
+def render_task(task, user_timezone):
+    """
+    One task's line without its alias (e.g. for prompt budget estimates).
+    """
+    return task_fragments.fragment(task, "alias", _context(user_timezone))
+
+
+# -----------------------
+# Encode / decode
+# -----------------------
+def encode(tasks, user_timezone):
+    """
+    {"text": alias listing, "tasks": {alias: task}} for tasks in order.
+    """
+    tasks = list(tasks or [])
+    return {
+        "text": task_fragments.listing(tasks, "alias", _context(user_timezone), ALIAS_LABEL),
+        "tasks": {f"{ALIAS_PREFIX}{n}": t for n, t in enumerate(tasks, 1)},
+    }
+
+
+def resolve(encoded, value):
+    """
+    The task an answer refers to: an alias ("t2", "T2", "2"), or the
+    task's google_id if the model copied that instead. None otherwise.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        value = value.get("task") or value.get("google_id")
+
+    value = str(value).strip()
+    match = _ALIAS_RE.match(value)
+    if match:
+        return encoded["tasks"].get(f"{ALIAS_PREFIX}{int(match.group(1))}")
+
+    for t in encoded["tasks"].values():
+        if value and t.get("google_id") == value:
+            return t
+    return None
+
+
+def decode_task_param(result, encoded):
+    """
+    Replace parameters["task"] (an alias) with parameters["google_id"]
+    in a model result, in place. Returns the result.
+    """
+    params = result.get("parameters")
+    if not isinstance(params, dict):
+        return result
+
+    answer = params.pop("task", None)
+    if answer is None:
+        answer = params.get("google_id")
+    task = resolve(encoded, answer)
+    params["google_id"] = task.get("google_id") if task else None
+    return result
@@ -0,0 +1,251 @@
+# task_fragments.py
+#
+# Serialized task fragments for prompts, cached per user.
+#
+# ai_core_update / ai_core_delete / ai_core_combined, list_fun (full mode)
+# and core_brain's intent packet all turn the same task rows into text on
+# every message. Here each task is serialized once per style and reused:
+# - listing(tasks, style) returns the joined text; it is cached per user
+#   on the user's task-set version, so an unchanged task list costs a
+#   dict lookup instead of serializing every task
+# - the version changes when a mutation site calls invalidate(user_id)
+#   (or invalidate_all() for whole-file rewrites) and whenever tasks.csv
+#   itself changes on disk (another process may have written it)
+# - after a version change only tasks whose rendered fields changed are
+#   serialized again; the others keep their fragment
+# - a cached listing is only reused when every task's rendered fields are
+#   unchanged too (rows edited in memory without invalidate())
+# - the first listing rebuilt after a version change drops the fragments
+#   of tasks it doesn't contain (deleted tasks, old title|due keys of
+#   tasks without a google_id), so the cache holds the current task set;
+#   a task left out of a partial listing is just rendered again later
+#
+# Styles (see STYLES): "compact" (title/due/status JSON for the intent
+# packet); task_aliases registers "alias" (update/delete/combined prompts
+# and list_fun full mode).
+# A style may depend on a context value (e.g. the user's timezone),
+# which is part of the cache key.
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from task_utils import TASKS_CSV, normalize_user_id
+
+# -----------------------
+# Config
+# -----------------------
+MAX_USERS = int(os.getenv("TASK_FRAGMENTS_MAX_USERS", "500"))
+MAX_LISTINGS_PER_USER = 16
+
+_COMPACT_FIELDS = ("title", "due", "status")
+
+
+def _render_compact(t, context=None):
+    return json.dumps(
+        {k: t.get(k) for k in _COMPACT_FIELDS if t.get(k)},
+        ensure_ascii=False, separators=(",", ":")
+    )
+
+
+# style -> (fields the fragment depends on, render(task, context), separator)
+STYLES = {
+    "compact": (_COMPACT_FIELDS, _render_compact, ","),
+}
+
+
+def register_style(name, fields, render, separator="\n"):
+    STYLES[name] = (tuple(fields), render, separator)
+
+
+_lock = threading.Lock()
+_users = OrderedDict()  # user_id -> {"version", "fragments", "listings", "pruned_at"}
+_global_version = 0
+_stats = {
+    "listing_hits": 0, "listing_misses": 0, "fragment_hits": 0,
+    "fragments_rendered": 0, "fragments_pruned": 0
+}
+
+
+# -----------------------
+# Versions
+# -----------------------
+def _file_stamp():
+    try:
+        st = os.stat(TASKS_CSV)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _user(user_id):
+    uid = normalize_user_id(user_id)
+    user = _users.get(uid)
+    if user is None:
+        user = _users[uid] = {"version": 0, "fragments": {}, "listings": OrderedDict(), "pruned_at": None}
+        while len(_users) > MAX_USERS:
+            _users.popitem(last=False)
+    else:
+        _users.move_to_end(uid)
+    return user
+
+
+def version(user_id):
+    """
+    The user's task-set version: (global, per-user, tasks.csv stamp).
+    """
+    with _lock:
+        return (_global_version, _user(user_id)["version"], _file_stamp())
+
+
+def invalidate(user_id, google_ids=None):
+    """
+    Call after changing a user's tasks. google_ids (optional) drops those
+    tasks' fragments right away (deleted tasks); other changed tasks are
+    detected when their listing is rebuilt.
+    """
+    with _lock:
+        user = _user(user_id)
+        user["version"] += 1
+        user["listings"].clear()
+        for gid in google_ids or []:
+            for key in [k for k in user["fragments"] if k[2] == gid]:
+                del user["fragments"][key]
+
+
+def invalidate_all():
+    """
+    Call after rewriting tasks for several users at once.
+    """
+    global _global_version
+    with _lock:
+        _global_version += 1
+        for user in _users.values():
+            user["listings"].clear()
+
+
+# -----------------------
+# Fragments
+# -----------------------
+def _task_key(t):
+    return t.get("google_id") or f"{t.get('title')}|{t.get('due')}"
+
+
+def _signature(t, fields):
+    return tuple(t.get(k) for k in fields)
+
+
+def _fragment(user, t, style, context):
+    fields, render, _ = STYLES[style]
+    key = (style, context, _task_key(t))
+    signature = _signature(t, fields)
+    cached = user["fragments"].get(key)
+    if cached is not None and cached[0] == signature:
+        _stats["fragment_hits"] += 1
+        return cached[1]
+    text = render(t, context)
+    user["fragments"][key] = (signature, text)
+    _stats["fragments_rendered"] += 1
+    return text
+
+
+def _owner(tasks):
+    for t in tasks:
+        if t.get("user_id"):
+            return t["user_id"]
+    return None
+
+
+def fragment(task, style, context=None):
+    """
+    One task serialized in a style.
+    """
+    owner = task.get("user_id")
+    if not owner:
+        return STYLES[style][1](task, context)
+    with _lock:
+        return _fragment(_user(owner), task, style, context)
+
+
+def fragments(tasks, style, context=None):
+    """
+    Every task serialized in a style (list of strings).
+    """
+    tasks = list(tasks or [])
+    owner = _owner(tasks)
+    if not owner:
+        return [STYLES[style][1](t, context) for t in tasks]
+    with _lock:
+        user = _user(owner)
+        return [_fragment(user, t, style, context) for t in tasks]
+
+
+def _prune(user, tasks, current):
+    """
+    Drop fragments of tasks not in this listing, once per version.
+    """
+    if user["pruned_at"] == current:
+        return
+    live = {_task_key(t) for t in tasks}
+    stale = [k for k in user["fragments"] if k[2] not in live]
+    for key in stale:
+        del user["fragments"][key]
+    _stats["fragments_pruned"] += len(stale)
+    user["pruned_at"] = current
+
+
+def _join(texts, separator, label):
+    if label:
+        texts = (label.format(n=n) + text for n, text in enumerate(texts, 1))
+    return separator.join(texts)
+
+
+def listing(tasks, style, context=None, label=None):
+    """
+    The tasks serialized in a style and joined with its separator.
+    label (e.g. "t{n}: ") prefixes each task with its 1-based position.
+    Rows must come from tasks.csv (they carry user_id); anything else is
+    rendered without caching.
+    """
+    tasks = list(tasks or [])
+    owner = _owner(tasks)
+    fields, render, separator = STYLES[style]
+    if not owner:
+        return _join((render(t, context) for t in tasks), separator, label)
+
+    current = version(owner)
+    key = (style, context, label, tuple((_task_key(t), _signature(t, fields)) for t in tasks))
+
+    with _lock:
+        user = _user(owner)
+        cached = user["listings"].get(key)
+        if cached is not None and cached[0] == current:
+            user["listings"].move_to_end(key)
+            _stats["listing_hits"] += 1
+            return cached[1]
+
+        _stats["listing_misses"] += 1
+        _prune(user, tasks, current)
+        text = _join((_fragment(user, t, style, context) for t in tasks), separator, label)
+        user["listings"][key] = (current, text)
+        while len(user["listings"]) > MAX_LISTINGS_PER_USER:
+            user["listings"].popitem(last=False)
+        return text
+
+
+def get_stats():
+    with _lock:
+        lookups = _stats["listing_hits"] + _stats["listing_misses"]
+        return {
+            **_stats,
+            "listing_hit_rate": (_stats["listing_hits"] / lookups) if lookups else 0.0,
+            "users": len(_users),
+            "fragments": sum(len(u["fragments"]) for u in _users.values()),
+        }
+
+
+def clear():
+    with _lock:
+        _users.clear()
+        for k in _stats:
+            _stats[k] = 0
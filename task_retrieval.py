@@ -0,0 +1,290 @@
+# task_retrieval.py
+#
+# Local candidate retrieval for update/delete target selection.
+#
+# Ranks ALL of a user's tasks against the message by title and details
+# similarity, time mentions ("tomorrow", "friday", "at 3pm", "jan 5") and
+# recency, so only the top-k candidates go to the model. When the top
+# candidate is a clear winner the caller can skip the model entirely
+# (for deletes only when the message's time also matches the task's due,
+# see clear_winner). Rows already marked for deletion are never candidates.
+
+import re
+import threading
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from functools import lru_cache
+import pytz
+
+# -----------------------
+# Config
+# -----------------------
+TOP_K = 12
+
+# clear winner: strong title match AND well ahead of the runner-up
+CLEAR_MIN_SCORE = 0.35
+CLEAR_MIN_TITLE = 0.6
+CLEAR_MARGIN = 0.25
+# with require_time: the mentioned date/hour must match the due time
+CLEAR_MIN_TIME = 0.7
+
+WEIGHTS = {"title": 0.6, "details": 0.15, "time": 0.2, "recency": 0.05}
+FUZZY_TOKEN_RATIO = 0.85
+PHRASE_MIN_RATIO = 0.6
+
+# words that say what to do, not which task
+STOP_WORDS = {
+    "a", "an", "the", "my", "me", "i", "to", "for", "of", "on", "at", "in", "it", "is",
+    "and", "or", "that", "this", "please", "pls", "can", "you", "task", "tasks",
+    "reminder", "reminders", "todo", "one", "about", "with", "from", "by", "be",
+    "delete", "remove", "cancel", "drop", "clear", "erase",
+    "update", "change", "move", "reschedule", "rename", "edit", "push", "postpone",
+    "shift", "set", "make", "mark", "done", "instead", "new", "time", "date", "due",
+    # time words are scored by _time_score, not as title words
+    "today", "tonight", "tomorrow", "yesterday", "am", "pm", "morning", "evening",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = {
+    m: i + 1 for i, m in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    )
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_HOUR_RE = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\bat (\d{1,2})(?::(\d{2}))?\b")
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH_DAY_RE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? (\d{1,2})(?:st|nd|rd|th)?\b")
+_DAY_MONTH_RE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)? (?:of )?(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b")
+
+# -----------------------
+# Stats
+# -----------------------
+_stats_lock = threading.Lock()
+_stats = {"queries": 0, "clear_winner": 0, "model_fallback": 0}
+
+
+def record(clear):
+    with _stats_lock:
+        _stats["queries"] += 1
+        _stats["clear_winner" if clear else "model_fallback"] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        q = _stats["queries"]
+        return {
+            **_stats,
+            "clear_winner_rate": (_stats["clear_winner"] / q) if q else 0.0
+        }
+
+
+# -----------------------
+# Helpers
+# -----------------------
+def _tokens(text):
+    return [
+        t for t in _TOKEN_RE.findall((text or "").lower().replace("’", "'").replace("'s", ""))
+        if t not in STOP_WORDS and not t.isdigit()
+    ]
+
+
+def _overlap(query_tokens, target_tokens):
+    """
+    Fraction of target tokens mentioned in the query (fuzzy, typo tolerant).
+    """
+    if not query_tokens or not target_tokens:
+        return 0.0
+    query_set = set(query_tokens)
+    targets = set(target_tokens)
+    hits = 0
+    for t in targets:
+        if t in query_set or (len(t) > 3 and any(_similar(t, q) for q in query_set)):
+            hits += 1
+    return hits / len(targets)
+
+
+@lru_cache(maxsize=65536)
+def _similar(a, b, ratio=FUZZY_TOKEN_RATIO):
+    if abs(len(a) - len(b)) > 2:
+        return False
+    sm = SequenceMatcher(None, a, b)
+    return sm.real_quick_ratio() >= ratio and sm.quick_ratio() >= ratio and sm.ratio() >= ratio
+
+
+def _title_score(query_tokens, title):
+    title_tokens = _tokens(title)
+    if not title_tokens:
+        return 0.0
+    covered = _overlap(query_tokens, title_tokens)
+    # penalize long messages matching a single common word
+    precision = _overlap(title_tokens, query_tokens) if query_tokens else 0.0
+    sm = SequenceMatcher(None, " ".join(query_tokens), " ".join(title_tokens))
+    phrase = sm.ratio() if sm.real_quick_ratio() >= PHRASE_MIN_RATIO and sm.quick_ratio() >= PHRASE_MIN_RATIO else 0.0
+    if phrase < PHRASE_MIN_RATIO:
+        phrase = 0.0
+    return max(0.7 * covered + 0.3 * precision, phrase)
+
+
+def _details_score(query_tokens, details):
+    details_tokens = _tokens(details)
+    if not details_tokens:
+        return 0.0
+    return max(_overlap(query_tokens, details_tokens), _overlap(details_tokens, query_tokens))
+
+
+def _parse_now(current_time, tz):
+    if current_time:
+        try:
+            dt = datetime.fromisoformat(str(current_time).replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = tz.localize(dt)
+            return dt.astimezone(tz)
+        except Exception:
+            pass
+    return datetime.now(tz)
+
+
+def _parse_due(due, tz):
+    if not due:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(due).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = tz.localize(dt)
+        return dt.astimezone(tz)
+    except Exception:
+        return None
+
+
+def _mentioned_time(text, now):
+    """
+    Dates and hours the message refers to: (set of dates, set of (hour, minute)).
+    """
+    text = (text or "").lower()
+    dates = set()
+    hours = set()
+
+    if "today" in text or "tonight" in text:
+        dates.add(now.date())
+    if "tomorrow" in text:
+        dates.add((now + timedelta(days=1)).date())
+    if "yesterday" in text:
+        dates.add((now - timedelta(days=1)).date())
+
+    for i, name in enumerate(WEEKDAYS):
+        if re.search(rf"\b{name}\b", text):
+            delta = (i - now.weekday()) % 7
+            dates.add((now + timedelta(days=delta)).date())
+
+    for y, m, d in _ISO_DATE_RE.findall(text):
+        try:
+            dates.add(datetime(int(y), int(m), int(d)).date())
+        except ValueError:
+            pass
+
+    pairs = [(m, d) for m, d in _MONTH_DAY_RE.findall(text)]
+    pairs += [(m, d) for d, m in _DAY_MONTH_RE.findall(text)]
+    for mon, day in pairs:
+        try:
+            dates.add(datetime(now.year, MONTHS[mon], int(day)).date())
+        except ValueError:
+            pass
+
+    for h12, m12, ampm, h24, m24 in _HOUR_RE.findall(text):
+        hour = int(h12 or h24)
+        minute = int(m12 or m24 or 0)
+        if ampm == "pm" and hour < 12:
+            hour += 12
+        elif ampm == "am" and hour == 12:
+            hour = 0
+        if 0 <= hour < 24:
+            hours.add((hour, minute))
+
+    return dates, hours
+
+
+def _time_score(due_dt, dates, hours):
+    if not dates and not hours:
+        return 0.0
+    if due_dt is None:
+        return 0.0
+    score = 0.0
+    if dates and due_dt.date() in dates:
+        score += 0.7 if hours else 1.0
+    if hours:
+        if (due_dt.hour, due_dt.minute) in hours:
+            score += 0.3 if dates else 1.0
+        elif any(due_dt.hour == h for h, _ in hours):
+            score += 0.15 if dates else 0.5
+    return min(score, 1.0)
+
+
+def _recency_score(due_dt, now, position, total):
+    # rows are appended as tasks are created: later rows are newer
+    row = (position + 1) / total if total else 0.0
+    if due_dt is None:
+        return 0.5 * row
+    days = abs((due_dt - now).total_seconds()) / 86400
+    return 0.5 * row + 0.5 / (1 + days / 7)
+
+
+# -----------------------
+# Public API
+# -----------------------
+def rank_tasks(message, tasks, user_timezone="UTC", current_time=None):
+    """
+    Returns [{"task", "score", "signals"}] sorted best first.
+    Tasks already marked for deletion (google_status "delete") are left out.
+    """
+    tasks = [t for t in tasks or [] if t.get("google_status") != "delete"]
+    try:
+        tz = pytz.timezone(user_timezone or "UTC")
+    except Exception:
+        tz = pytz.UTC
+
+    now = _parse_now(current_time, tz)
+    query_tokens = _tokens(message)
+    dates, hours = _mentioned_time(message, now)
+    total = len(tasks or [])
+
+    ranked = []
+    for i, task in enumerate(tasks or []):
+        due_dt = _parse_due(task.get("due"), tz)
+        signals = {
+            "title": _title_score(query_tokens, task.get("title")),
+            "details": _details_score(query_tokens, task.get("details")),
+            "time": _time_score(due_dt, dates, hours),
+            "recency": _recency_score(due_dt, now, i, total),
+        }
+        score = sum(WEIGHTS[k] * v for k, v in signals.items())
+        ranked.append({"task": task, "score": round(score, 4), "signals": signals})
+
+    ranked.sort(key=lambda r: r["score"], reverse=True)
+    return ranked
+
+
+def top_candidates(ranked, k=TOP_K):
+    return [r["task"] for r in ranked[:k]]
+
+
+def clear_winner(ranked, require_time=False):
+    """
+    The top task when it is unambiguous, else None.
+    require_time (deletes): the message must also name the task's due
+    date/time, so a title match alone never removes a task unconfirmed.
+    """
+    if not ranked:
+        return None
+    top = ranked[0]
+    runner_up = ranked[1]["score"] if len(ranked) > 1 else 0.0
+    if require_time and top["signals"]["time"] < CLEAR_MIN_TIME:
+        return None
+    if (
+        top["score"] >= CLEAR_MIN_SCORE
+        and top["signals"]["title"] >= CLEAR_MIN_TITLE
+        and top["score"] - runner_up >= CLEAR_MARGIN
+    ):
+        return top["task"]
+    return None
@@ -12,6 +12,8 @@ from muster_point import handle_user_message
 from hard_starter import run_reminder_ai
 from sync_google_tasks_to_csv import sync_user_tasks_to_csv
 from daily_morning_reminder_openrouter import run_daily_morning_reminder  # <-- import daily summary
+from local_intent import maybe_retrain as retrain_local_intent_model
+import llm_telemetry
 from config import DATABASE_FILE
 
 # -------------------------------------------------
@@ -127,6 +129,35 @@ async def daily_morning_summary_loop():
         await asyncio.sleep(60)  # runs every 1 min, script itself ensures 1 message/day
 
 
+# -------------------------------------------------
+# Local intent classifier retraining loop
+# -------------------------------------------------
+async def intent_model_training_loop():
+    while True:
+        try:
+            summary = await asyncio.to_thread(retrain_local_intent_model)
+            if summary:
+                print(
+                    f"🧠 local intent model retrained on {summary['examples']} examples "
+                    f"(holdout accuracy {summary['holdout_accuracy']:.1%})"
+                )
+        except Exception as e:
+            print("❌ intent model training crashed:", e)
+        await asyncio.sleep(3600)
+
+
+# -------------------------------------------------
+# LLM telemetry dump loop
+# -------------------------------------------------
+async def llm_telemetry_dump_loop():
+    while True:
+        await asyncio.sleep(llm_telemetry.DUMP_SECONDS)
+        try:
+            await asyncio.to_thread(llm_telemetry.dump)
+        except Exception as e:
+            print("❌ telemetry dump crashed:", e)
+
+
 # -------------------------------------------------
 # periodic Google Tasks → CSV sync loop
 # -------------------------------------------------
@@ -175,6 +206,8 @@ def main():
         asyncio.create_task(send_reminders_loop(app))
         asyncio.create_task(sync_google_tasks_loop())
         asyncio.create_task(daily_morning_summary_loop())  # <-- add daily summary loop
+        asyncio.create_task(intent_model_training_loop())
+        asyncio.create_task(llm_telemetry_dump_loop())
 
     asyncio.get_event_loop().create_task(start_background_tasks())
     app.run_polling()
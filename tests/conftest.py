@@ -0,0 +1,19 @@
+# tests/conftest.py
+#
+# The bot's modules live at the repo root and keep their state files
+# (tasks.csv, caches, logs) relative to the working directory, so every
+# test runs from its own empty temp directory.
+
+import os
+import sys
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
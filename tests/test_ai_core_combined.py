@@ -0,0 +1,53 @@
+# tests/test_ai_core_combined.py
+
+from types import SimpleNamespace
+import pytest
+import ai_core_combined
+import llm_client
+import model_router
+
+
+def _response(name, arguments):
+    call = SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+    message = SimpleNamespace(tool_calls=[call])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def model(monkeypatch):
+    calls = []
+
+    def answer(name, arguments):
+        def fake(provider, model, messages, **kwargs):
+            calls.append(model)
+            return _response(name, arguments)
+        monkeypatch.setattr(llm_client, "complete_sync", fake)
+        return calls
+    return answer
+
+
+PACKET = {
+    "user_id": "u1",
+    "user_message": "delete the gym task",
+    "user_timezone": "UTC",
+    "current_time": "2026-10-14T18:00:00+00:00",
+    "chat_context": [],
+}
+
+
+@pytest.mark.parametrize("arguments", ["null", "[1, 2]", '"t1"'])
+def test_non_dict_arguments_fall_back(model, arguments):
+    model("delete_task", arguments)
+    result = ai_core_combined.process_combined_packet(PACKET)
+    assert result["action"] == "delete"
+    assert result["parameters"]["google_id"] is None
+
+    model("create_task", arguments)
+    assert ai_core_combined.process_combined_packet(PACKET) is None
+
+
+def test_uses_the_combined_route(model):
+    calls = model("chat_reply", '{"response_text": "hi"}')
+    result = ai_core_combined.process_combined_packet(PACKET)
+    assert result["response_text"] == "hi"
+    assert calls and calls[0] in {c["model"] for c in model_router.routes()["combined"]["candidates"]}
@@ -0,0 +1,339 @@
+# tests/test_core_brain.py
+
+import os
+import csv
+import asyncio
+import core_brain
+
+
+def test_error_votes_never_supply_the_reply():
+    error = core_brain._error_vote("m1", RuntimeError("timeout"))
+    ok = {"model": "m2", "intent": "chat", "message": "Hi there!"}
+    assert error["intent"] == "chat" and error.get("error")
+
+    # m1 is ranked first, but its vote is an error
+    assert core_brain._winning_response([error, ok], "chat", ["m1", "m2"]) == "Hi there!"
+
+
+def test_no_reply_when_only_errors_match():
+    error = core_brain._error_vote("m1", RuntimeError("timeout"))
+    assert core_brain._winning_response([error], "chat", ["m1"]) is None
+
+
+def _cascade(monkeypatch, escalate_on, votes):
+    """
+    Stage 0's only model has an open breaker; stage 1 answers with votes.
+    """
+    monkeypatch.setattr(core_brain, "CASCADE_STAGES", [["down"], ["up"]])
+    monkeypatch.setattr(core_brain, "CASCADE_ESCALATE_ON", set(escalate_on))
+    monkeypatch.setattr(core_brain, "breaker_allows", lambda m: m != "down")
+
+    async def guarded(model_name, packet, ranking=None):
+        return {"model": model_name, "intent": votes[model_name], "confidence": 0.95, "message": ""}
+
+    monkeypatch.setattr(core_brain, "call_model_guarded", guarded)
+    return asyncio.run(core_brain.detect_intent_cascade({"user_id": "u1", "user_message": "show my tasks"}))
+
+
+def test_unavailable_stage_escalates_by_default(monkeypatch):
+    result = _cascade(monkeypatch, ["error", "unavailable"], {"up": "list"})
+    assert result["intent"] == "list"
+    assert result["stats"]["path"][0]["escalated"] == "unavailable"
+
+
+def test_unavailable_respects_escalate_on(monkeypatch):
+    result = _cascade(monkeypatch, ["error"], {"up": "list"})
+    assert result["intent"] == "chat"  # stopped at the empty stage, no votes
+    assert len(result["stats"]["path"]) == 1
+
+
+def test_cascade_log_is_opt_in_and_has_no_message(monkeypatch):
+    _cascade(monkeypatch, ["unavailable"], {"up": "list"})
+    assert not os.path.exists(core_brain.CASCADE_LOG_CSV)
+
+    monkeypatch.setattr(core_brain, "CASCADE_LOG", True)
+    _cascade(monkeypatch, ["unavailable"], {"up": "list"})
+    with open(core_brain.CASCADE_LOG_CSV, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["intent"] == "list"
+    assert "user_message" not in rows[0]
+    assert "show my tasks" not in open(core_brain.CASCADE_LOG_CSV, encoding="utf-8").read()
+
+
+def _ensemble(monkeypatch, votes, **kwargs):
+    """
+    detect_intent over fake models: votes maps model -> (intent, delay).
+    Returns (result, models whose call was cancelled).
+    """
+    monkeypatch.setattr(core_brain, "MODELS", list(votes))
+    monkeypatch.setattr(core_brain, "ADAPTIVE_RANKING", False)
+    monkeypatch.setattr(core_brain, "_breakers", {})
+    cancelled = []
+
+    async def guarded(model_name, packet, ranking=None):
+        intent, delay = votes[model_name]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(model_name)
+            raise
+        return {"model": model_name, "intent": intent, "confidence": 0.9, "message": model_name}
+
+    monkeypatch.setattr(core_brain, "call_model_guarded", guarded)
+    result = asyncio.run(core_brain.detect_intent({"user_message": "show my tasks"}, mode="ensemble", **kwargs))
+    return result, cancelled
+
+
+def test_quorum_exits_early_and_cancels_the_rest(monkeypatch):
+    votes = {
+        "a": ("list", 0.01), "b": ("list", 0.02), "c": ("list", 0.03),
+        "d": ("chat", 5), "e": ("chat", 5),
+    }
+    result, cancelled = _ensemble(monkeypatch, votes, quorum=3, top_ranked=0)
+
+    assert result["intent"] == "list"
+    assert result["stats"]["quorum_reached"]
+    assert result["stats"]["voters"] == ["a", "b", "c"]
+    assert sorted(result["stats"]["cancelled"]) == ["d", "e"]
+    assert sorted(cancelled) == ["d", "e"]
+    assert result["stats"]["decision_seconds"] < 1
+
+
+def test_top_ranked_agreement_short_circuits(monkeypatch):
+    votes = {
+        "a": ("create", 0.02), "b": ("create", 0.01),
+        "c": ("chat", 0.005), "d": ("chat", 5), "e": ("chat", 5),
+    }
+    result, cancelled = _ensemble(monkeypatch, votes, quorum=0, top_ranked=2)
+
+    # "c" answered first, but a and b are the two top-ranked models
+    assert result["intent"] == "create"
+    assert result["stats"]["quorum_reached"]
+    assert result["response"] == "a"
+    assert sorted(cancelled) == ["d", "e"]
+
+
+def test_error_votes_do_not_count_towards_quorum(monkeypatch):
+    monkeypatch.setattr(core_brain, "MODELS", ["a", "b", "c"])
+    error = core_brain._error_vote("a", RuntimeError("boom"))
+    ok = [{"model": "b", "intent": "chat"}, {"model": "c", "intent": "chat"}]
+
+    assert core_brain._quorum_winner([error] + ok[:1], 2, 0) is None
+    assert core_brain._quorum_winner([error] + ok, 2, 0) == "chat"
+
+
+def test_no_quorum_falls_back_to_plurality(monkeypatch):
+    votes = {
+        "a": ("list", 0.01), "b": ("chat", 0.02), "c": ("list", 0.03),
+        "d": ("create", 0.04), "e": ("list", 0.05),
+    }
+    result, cancelled = _ensemble(monkeypatch, votes, quorum=4, top_ranked=0)
+
+    assert result["intent"] == "list"
+    assert not result["stats"]["quorum_reached"]
+    assert result["stats"]["votes"] == {"list": 3, "chat": 1, "create": 1}
+    assert result["stats"]["cancelled"] == [] and cancelled == []
+
+
+def _hedged(monkeypatch, delays, deadline=2.0, p95=0.05, rank=0):
+    """
+    call_model_hedged for model "m" whose n-th attempt takes delays[n].
+    Returns (result, attempts started, attempts cancelled).
+    """
+    monkeypatch.setattr(core_brain, "MODELS", ["x"] * rank + ["m"])
+    monkeypatch.setattr(core_brain, "MODEL_DEADLINE_SECONDS", {"m": deadline})
+    monkeypatch.setattr(core_brain, "_latencies", {"m": [p95] * core_brain.HEDGE_MIN_SAMPLES})
+    started, cancelled = [], []
+
+    async def call(model_name, packet):
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(delays[n])
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return {"model": model_name, "intent": "list", "attempt": n}
+
+    monkeypatch.setattr(core_brain, "call_model_async", call)
+    result = asyncio.run(core_brain.call_model_hedged("m", {}))
+    return result, started, cancelled
+
+
+def test_hedge_fires_after_p95(monkeypatch):
+    result, started, cancelled = _hedged(monkeypatch, [1.0, 0.01])
+    assert result["attempt"] == 1 and result["hedged"]
+    assert started == [0, 1]
+    assert cancelled == [0]
+
+
+def test_no_hedge_when_first_answer_is_in_time(monkeypatch):
+    result, started, _ = _hedged(monkeypatch, [0.01, 0.01])
+    assert result["attempt"] == 0 and not result["hedged"]
+    assert started == [0]
+
+
+def test_no_hedge_below_the_top_ranked_models(monkeypatch):
+    result, started, _ = _hedged(monkeypatch, [0.2, 0.01], rank=core_brain.HEDGE_TOP_N)
+    assert result["attempt"] == 0 and not result["hedged"]
+    assert started == [0]
+
+
+def test_deadline_expiry_times_out(monkeypatch):
+    result, started, cancelled = _hedged(monkeypatch, [5, 5], deadline=0.3, p95=0.1)
+    assert result["timed_out"] and result["error"]
+    assert result["message"] == "Error: no answer within 0.3s"
+    assert started == [0, 1]
+    assert sorted(cancelled) == [0, 1]
+
+
+# -----------------------
+# Circuit breaker / ranking
+# -----------------------
+def _breaker_clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(core_brain, "_breakers", {})
+    monkeypatch.setattr(core_brain, "BREAKER_FAILURES", 3)
+    monkeypatch.setattr(core_brain, "BREAKER_OPEN_SECONDS", 60)
+    monkeypatch.setattr(core_brain.time, "monotonic", lambda: clock[0])
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    _breaker_clock(monkeypatch)
+    for _ in range(2):
+        core_brain._record_outcome("m", False)
+    assert core_brain.breaker_allows("m")
+
+    core_brain._record_outcome("m", True)  # a success resets the count
+    for _ in range(2):
+        core_brain._record_outcome("m", False)
+    assert core_brain._breaker("m")["state"] == "closed"
+
+    core_brain._record_outcome("m", False)
+    assert core_brain._breaker("m")["state"] == "open"
+    assert not core_brain.breaker_allows("m")
+
+
+def test_half_open_allows_one_probe(monkeypatch):
+    clock = _breaker_clock(monkeypatch)
+    for _ in range(3):
+        core_brain._record_outcome("m", False)
+
+    clock[0] += 59
+    assert not core_brain.breaker_allows("m")
+    clock[0] += 1
+    assert core_brain.breaker_allows("m")
+    assert core_brain._breaker("m")["state"] == "half_open"
+    assert not core_brain.breaker_allows("m")  # probe still in flight
+
+
+def test_failed_probe_reopens_and_good_probe_closes(monkeypatch):
+    clock = _breaker_clock(monkeypatch)
+    for _ in range(3):
+        core_brain._record_outcome("m", False)
+
+    clock[0] += 60
+    assert core_brain.breaker_allows("m")
+    core_brain._record_outcome("m", False)
+    assert core_brain._breaker("m")["state"] == "open"
+    assert not core_brain.breaker_allows("m")
+
+    clock[0] += 60
+    assert core_brain.breaker_allows("m")
+    core_brain._record_outcome("m", True)
+    assert core_brain._breaker("m") == {"state": "closed", "failures": 0, "opened_at": None, "probing": False}
+    assert core_brain.breaker_allows("m")
+
+
+def test_breaker_states_cover_every_model(monkeypatch):
+    _breaker_clock(monkeypatch)
+    monkeypatch.setattr(core_brain, "MODELS", ["a", "b"])
+    for _ in range(3):
+        core_brain._record_outcome("b", False)
+    assert core_brain.get_breaker_states() == {
+        "a": {"state": "closed", "failures": 0},
+        "b": {"state": "open", "failures": 3},
+    }
+
+
+def _ranking(monkeypatch, agreement=None, latencies=None):
+    monkeypatch.setattr(core_brain, "MODELS", ["a", "b", "c"])
+    monkeypatch.setattr(core_brain, "ADAPTIVE_RANKING", True)
+    monkeypatch.setattr(core_brain, "_agreement", {})
+    monkeypatch.setattr(core_brain, "_latencies", {})
+    n = core_brain.RANK_MIN_SAMPLES
+    for m, rate in (agreement or {}).items():
+        core_brain._agreement[m] = [True] * int(rate * n) + [False] * (n - int(rate * n))
+    for m, seconds in (latencies or {}).items():
+        core_brain._latencies[m] = [seconds] * n
+    return core_brain.ranked_models()
+
+
+def test_ranking_keeps_static_order_without_samples(monkeypatch):
+    assert _ranking(monkeypatch) == ["a", "b", "c"]
+
+
+def test_ranking_prefers_agreement(monkeypatch):
+    order = _ranking(monkeypatch, agreement={"a": 0.5, "b": 1.0, "c": 0.9})
+    assert order == ["b", "c", "a"]
+
+
+def test_ranking_penalises_latency(monkeypatch):
+    agreement = {"a": 1.0, "b": 1.0, "c": 1.0}
+    order = _ranking(monkeypatch, agreement=agreement, latencies={"a": 10.0, "b": 1.0, "c": 2.0})
+    assert order == ["b", "c", "a"]
+
+
+def test_static_order_when_adaptive_ranking_is_off(monkeypatch):
+    _ranking(monkeypatch, agreement={"a": 0.0, "b": 1.0, "c": 1.0})
+    monkeypatch.setattr(core_brain, "ADAPTIVE_RANKING", False)
+    assert core_brain.ranked_models() == ["a", "b", "c"]
+
+
+# -----------------------
+# Cascade policy / stats
+# -----------------------
+def test_escalate_on_ignores_spaces(monkeypatch):
+    import importlib
+
+    monkeypatch.setenv("INTENT_CASCADE_ESCALATE_ON", "low_confidence, error ,,unavailable")
+    try:
+        importlib.reload(core_brain)
+        assert core_brain.CASCADE_ESCALATE_ON == {"low_confidence", "error", "unavailable"}
+    finally:
+        monkeypatch.delenv("INTENT_CASCADE_ESCALATE_ON")
+        importlib.reload(core_brain)
+
+
+def _unsure_cascade(monkeypatch, confidence):
+    monkeypatch.setattr(core_brain, "CASCADE_STAGES", [["a"], ["b"]])
+    monkeypatch.setattr(core_brain, "breaker_allows", lambda m: True)
+    monkeypatch.setattr(core_brain, "_cascade_stats", {
+        "messages": 0, "models_called": 0, "unresolved": 0,
+        "resolved_at_stage": core_brain.Counter(), "escalations": core_brain.Counter()
+    })
+
+    async def guarded(model_name, packet, ranking=None):
+        return {"model": model_name, "intent": "list", "confidence": confidence, "message": ""}
+
+    monkeypatch.setattr(core_brain, "call_model_guarded", guarded)
+    return asyncio.run(core_brain.detect_intent_cascade({"user_message": "tasks?"}))
+
+
+def test_unresolved_cascade_is_counted_apart(monkeypatch):
+    result = _unsure_cascade(monkeypatch, 0.3)
+    assert result["intent"] == "list"  # majority over every vote
+    assert result["stats"]["resolved_stage"] is None
+
+    stats = core_brain.get_cascade_stats()
+    assert stats["unresolved"] == 1
+    assert stats["resolved_at_stage"] == {}
+    assert stats["escalations"] == {"low_confidence": 2}
+
+
+def test_resolved_cascade_counts_its_stage(monkeypatch):
+    result = _unsure_cascade(monkeypatch, 0.95)
+    assert result["stats"]["resolved_stage"] == 0
+    stats = core_brain.get_cascade_stats()
+    assert stats["resolved_at_stage"] == {0: 1} and stats["unresolved"] == 0
@@ -0,0 +1,152 @@
+# tests/test_fault_injection.py
+
+import os
+import sys
+import asyncio
+import subprocess
+from types import SimpleNamespace
+import openai
+import pytest
+import requests
+import fault_injection
+
+
+@pytest.fixture(autouse=True)
+def _no_profile():
+    fault_injection.set_profile(None)
+    yield
+    fault_injection.set_profile(None)
+
+
+# -----------------------
+# Latency specs
+# -----------------------
+def test_parse_latency_specs():
+    assert fault_injection.parse_latency("fixed:250")() == 0.25
+    assert fault_injection.parse_latency(None)() == 0
+    for _ in range(50):
+        assert 0.1 <= fault_injection.parse_latency("uniform:100,200")() <= 0.2
+        assert fault_injection.parse_latency("lognormal:300,0.4")() > 0
+        assert fault_injection.parse_latency("exp:100")() >= 0
+
+
+def test_parse_latency_rejects_unknown_specs():
+    with pytest.raises(ValueError):
+        fault_injection.parse_latency("gaussian:1,2")
+
+
+def test_loading_faults_does_not_load_the_stub_server():
+    # ayth_script (the production Google client) imports fault_injection
+    code = "import sys, fault_injection; print('llm_stub_server' in sys.modules)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(fault_injection.__file__),
+        capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "False"
+
+
+# -----------------------
+# Profiles
+# -----------------------
+@pytest.mark.parametrize("name", sorted(fault_injection.PROFILES))
+def test_every_profile_compiles(name):
+    fault_injection.set_profile(name)
+    assert fault_injection.active_profile() == name
+    assert fault_injection.enabled() == (name != "none")
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        fault_injection.set_profile("meteor_strike")
+
+
+def test_match_limits_the_target():
+    fault_injection.set_profile({"llm": {"error_rate": 1.0, "match": ["openrouter"]}})
+    assert fault_injection._plan("llm", "openai")[1] is None
+    assert fault_injection._plan("llm", "openrouter")[1] == "error"
+    assert fault_injection.get_stats() == {"profile": "custom", "llm:calls": 1, "llm:error": 1}
+
+
+# -----------------------
+# LLM faults
+# -----------------------
+def _completion(content='{"intent": "list"}'):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _llm_call(profile, timeout=5):
+    fault_injection.set_profile({"llm": profile})
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return _completion()
+
+    return asyncio.run(fault_injection.llm_call("openai", call, timeout)), calls
+
+
+def test_llm_error_raises_the_sdk_error():
+    with pytest.raises(openai.RateLimitError):
+        _llm_call({"error_rate": 1.0, "error_status": 429})
+    with pytest.raises(openai.InternalServerError):
+        _llm_call({"error_rate": 1.0, "error_status": 503})
+
+
+def test_llm_timeout_hangs_at_most_the_client_timeout():
+    with pytest.raises(openai.APITimeoutError):
+        _llm_call({"timeout_rate": 1.0, "hang_seconds": 60}, timeout=0.01)
+
+
+def test_llm_malformed_body():
+    completion, calls = _llm_call({"malformed_rate": 1.0})
+    assert calls == [1]
+    assert completion.choices[0].message.content == fault_injection.MALFORMED_BODY
+
+
+def test_no_profile_passes_through():
+    fault_injection.set_profile(None)
+    completion, calls = _llm_call({})
+    assert completion.choices[0].message.content == '{"intent": "list"}'
+
+
+# -----------------------
+# Google faults (FaultyRequests)
+# -----------------------
+class _Session:
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        return fault_injection._fake_response(200, '{"ok": true}', url)
+
+
+def _google(profile, method="get"):
+    fault_injection.set_profile({"google": profile})
+    session = _Session()
+    faulty = fault_injection.FaultyRequests(session, timeout_seconds=0.01)
+    return getattr(faulty, method)("https://tasks.example/lists"), session
+
+
+def test_google_error_response():
+    resp, session = _google({"error_rate": 1.0, "error_status": 503}, "post")
+    assert resp.status_code == 503 and resp.json()["error"]["code"] == 503
+    assert session.calls == []
+
+
+def test_google_timeout_raises_requests_timeout():
+    with pytest.raises(requests.exceptions.Timeout):
+        _google({"timeout_rate": 1.0, "hang_seconds": 30})
+
+
+def test_google_malformed_still_makes_the_call():
+    resp, session = _google({"malformed_rate": 1.0}, "patch")
+    assert session.calls == [("patch", "https://tasks.example/lists")]
+    with pytest.raises(ValueError):
+        resp.json()
+
+
+def test_google_passes_through_without_faults():
+    resp, session = _google({}, "delete")
+    assert resp.json() == {"ok": True}
+    assert session.calls == [("delete", "https://tasks.example/lists")]
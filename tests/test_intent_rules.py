@@ -0,0 +1,58 @@
+# tests/test_intent_rules.py
+
+import pytest
+import intent_rules
+
+
+def packet(message, chat_context=None, tasks=None):
+    return {"user_message": message, "chat_context": chat_context or [], "tasks": tasks or []}
+
+
+@pytest.mark.parametrize("message", [
+    "show my schedule",
+    "what's on my schedule",
+    "What's on my schedule for today?",
+    "list my tasks",
+    "what's next",
+])
+def test_list_queries(message):
+    assert intent_rules.classify(packet(message)) == {"intent": "list", "rule": "list_query"}
+
+
+@pytest.mark.parametrize("message", ["thanks!", "ok", "good morning", "hey"])
+def test_small_talk(message):
+    assert intent_rules.classify(packet(message)) == {"intent": "chat", "rule": "small_talk"}
+
+
+@pytest.mark.parametrize("message", ["ok", "sure", "ok thanks"])
+def test_no_small_talk_after_a_question(message):
+    context = [
+        {"role": "user", "message": "remove the gym thing"},
+        {"role": "assistant", "message": "Delete the gym task?"},
+        {"role": "user", "message": message},
+    ]
+    assert intent_rules.classify(packet(message, context)) is None
+
+
+def test_small_talk_after_a_statement():
+    context = [
+        {"role": "assistant", "content": "Done, the gym task is deleted."},
+        {"role": "user", "content": "ok"},
+    ]
+    assert intent_rules.classify(packet("ok", context))["intent"] == "chat"
+
+
+@pytest.mark.parametrize("message", [
+    "schedule a dentist appointment",
+    "delete the gym task",
+    "move my meeting to 5pm",
+    "ok delete it",
+])
+def test_mutations_fall_through(message):
+    assert intent_rules.classify(packet(message)) is None
+
+
+def test_task_question_needs_a_known_title():
+    tasks = [{"title": "dentist appointment"}]
+    assert intent_rules.classify(packet("when is the dentist appointment?", tasks=tasks))["rule"] == "task_question"
+    assert intent_rules.classify(packet("when is the board meeting?", tasks=tasks)) is None
@@ -0,0 +1,81 @@
+# tests/test_list_engine.py
+
+import csv
+from datetime import datetime
+import pytest
+import pytz
+import list_engine
+from task_utils import TASKS_CSV
+
+NOW = pytz.UTC.localize(datetime(2026, 10, 14, 12, 0))  # Wednesday
+
+ROWS = [
+    ("g1", "Piano lesson", "", "2026-10-14T17:00:00+00:00"),
+    ("g2", "Write meeting notes", "", "2026-10-15T09:00:00+00:00"),
+    ("g3", "Team meeting", "room 4", "2026-10-16T10:00:00+00:00"),
+    ("g4", "Call mum", "no rush", "2026-10-20T18:00:00+00:00"),
+    ("g5", "Old task", "", "2026-10-10T08:00:00+00:00"),
+]
+
+
+@pytest.fixture(autouse=True)
+def tasks_csv():
+    with open(TASKS_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["user_id", "title", "details", "due", "google_id", "google_status"])
+        writer.writeheader()
+        for gid, title, details, due in ROWS:
+            writer.writerow({"user_id": "u1", "title": title, "details": details, "due": due,
+                             "google_id": gid, "google_status": "pending"})
+
+
+def ids(filt):
+    return [r["google_id"] for r in list_engine.execute_filter("u1", filt, "UTC", NOW)]
+
+
+def test_keywords_match_whole_words():
+    filt = list_engine.normalize_filter({"keywords": ["meet"], "status": "any"})
+    assert ids(filt) == []  # not "meeting"
+    filt = list_engine.normalize_filter({"keywords": ["rush"], "status": "any"})
+    assert ids(filt) == ["g4"]
+
+
+def test_stop_word_keywords_are_dropped():
+    filt = list_engine.normalize_filter({"keywords": ["no", "mum"], "status": "any"})
+    assert filt["keywords"] == ["mum"]  # "no" would hit "notes" and "piano"
+    assert ids(filt) == ["g4"]
+
+
+def test_keywords_ignore_stop_words_and_plurals():
+    filt = list_engine.normalize_filter({"keywords": "the meetings", "status": "any"})
+    assert ids(filt) == ["g2", "g3"]
+
+
+def test_about_query_matches_whole_words():
+    filt = list_engine.parse_query("tasks about meeting", "UTC", NOW)
+    assert filt["keywords"] == ["meeting"]
+    assert ids(filt) == ["g2", "g3"]
+
+
+def test_stop_word_keyword_falls_back_to_the_model():
+    assert list_engine.parse_query("tasks about it", "UTC", NOW) is None
+
+
+@pytest.mark.parametrize("message", ["what's next", "what's up next", "whats next", "next task"])
+def test_whats_next_is_the_earliest_pending_task(message):
+    filt = list_engine.parse_query(message, "UTC", NOW)
+    assert filt["limit"] == 1 and filt["status"] == "pending"
+    assert ids(filt) == ["g1"]
+
+
+def test_next_week_is_a_range_not_a_limit():
+    filt = list_engine.parse_query("what's on next week", "UTC", NOW)
+    assert filt["limit"] is None
+    assert ids(filt) == ["g4"]
+
+
+def test_next_three():
+    assert ids(list_engine.parse_query("show my next 3 tasks", "UTC", NOW)) == ["g1", "g2", "g3"]
+
+
+def test_overdue():
+    assert ids(list_engine.parse_query("overdue tasks", "UTC", NOW)) == ["g5"]
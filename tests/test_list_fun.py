@@ -0,0 +1,117 @@
+# tests/test_list_fun.py
+
+import asyncio
+import list_fun
+import list_engine
+
+
+def _llm_only(monkeypatch, mode="structured", structured=None, full=None):
+    """
+    Every message goes to the LLM path; structured / full fake the two
+    modes (msg -> result) and the calls are recorded per mode.
+    """
+    calls = {"structured": [], "full": []}
+    monkeypatch.setattr(list_fun, "LIST_LLM_MODE", mode)
+    monkeypatch.setattr(list_engine, "answer", lambda *a, **k: None)
+    monkeypatch.setattr(list_fun, "load_user_tasks", lambda user_id: [{"title": "Gym", "google_id": "g1"}])
+
+    async def fake_structured(msg, user_tz, now, user_id):
+        calls["structured"].append(msg)
+        return structured(msg) if structured else None
+
+    async def fake_full(msg, user_tz, now, tasks):
+        calls["full"].append(msg)
+        return full(msg) if full else {"tasks": tasks}
+
+    monkeypatch.setattr(list_fun, "gpt_structured_filter_async", fake_structured)
+    monkeypatch.setattr(list_fun, "gpt_filter_tasks_async", fake_full)
+    return calls
+
+
+# -----------------------
+# Structured mode fallback
+# -----------------------
+def test_structured_answer_skips_full_mode(monkeypatch):
+    calls = _llm_only(monkeypatch, structured=lambda msg: {"tasks": [{"google_id": "g9"}]})
+    result = list_fun.get_user_task_list("u1", "UTC", ["gym stuff"])
+    assert result["gym stuff"]["tasks"] == [{"google_id": "g9"}]
+    assert calls["full"] == []
+
+
+def test_unusable_filter_falls_back_to_full_mode(monkeypatch):
+    calls = _llm_only(monkeypatch)
+    result = list_fun.get_user_task_list("u1", "UTC", ["gym stuff"])
+    assert calls["structured"] == ["gym stuff"] and calls["full"] == ["gym stuff"]
+    assert result["gym stuff"]["tasks"] == [{"title": "Gym", "google_id": "g1"}]
+
+
+def test_structured_error_falls_back_to_full_mode(monkeypatch):
+    def boom(msg):
+        raise RuntimeError("provider down")
+
+    calls = _llm_only(monkeypatch, structured=boom)
+    result = list_fun.get_user_task_list("u1", "UTC", ["gym stuff"])
+    assert calls["full"] == ["gym stuff"]
+    assert result["gym stuff"]["tasks"]
+
+
+def test_full_mode_never_asks_for_a_filter(monkeypatch):
+    calls = _llm_only(monkeypatch, mode="full")
+    list_fun.get_user_task_list("u1", "UTC", ["gym stuff"])
+    assert calls["structured"] == [] and calls["full"] == ["gym stuff"]
+
+
+def test_failed_query_returns_no_tasks(monkeypatch):
+    def boom(msg):
+        raise RuntimeError("provider down")
+
+    _llm_only(monkeypatch, structured=boom, full=boom)
+    assert list_fun.get_user_task_list("u1", "UTC", ["gym stuff"])["gym stuff"]["tasks"] == []
+
+
+# -----------------------
+# Concurrent LLM queries
+# -----------------------
+def _slow_queries(monkeypatch, seconds):
+    state = {"in_flight": 0, "peak": 0}
+
+    async def fake_structured(msg, user_tz, now, user_id):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(seconds)
+        state["in_flight"] -= 1
+        return {"tasks": [{"google_id": msg}]}
+
+    _llm_only(monkeypatch)
+    monkeypatch.setattr(list_fun, "gpt_structured_filter_async", fake_structured)
+    return state
+
+
+def test_semaphore_caps_queries_in_flight(monkeypatch):
+    state = _slow_queries(monkeypatch, 0.05)
+    msgs = [f"q{i}" for i in range(6)]
+    result = list_fun.get_user_task_list("u1", "UTC", msgs, concurrency=2)
+
+    assert state["peak"] == 2
+    assert list(result) == msgs
+    assert [r["tasks"][0]["google_id"] for r in result.values()] == msgs
+
+
+def test_elapsed_excludes_the_wait_for_a_slot(monkeypatch):
+    _slow_queries(monkeypatch, 0.05)
+    result = list_fun.get_user_task_list("u1", "UTC", ["a", "b", "c", "d"], concurrency=1)
+
+    # run one at a time (0.2s in total), each query still reports ~0.05s
+    assert all(r["elapsed_seconds"] < 0.15 for r in result.values())
+
+
+def test_local_answers_keep_their_place(monkeypatch):
+    _slow_queries(monkeypatch, 0.01)
+    monkeypatch.setattr(
+        list_engine, "answer", lambda user_id, msg, *a: [{"google_id": "local"}] if msg == "today" else None
+    )
+    result = list_fun.get_user_task_list("u1", "UTC", ["gym stuff", "today", "gym stuff"])
+
+    assert list(result) == ["gym stuff", "today"]
+    assert result["today"]["tasks"] == [{"google_id": "local"}]
+
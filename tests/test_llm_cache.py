@@ -0,0 +1,106 @@
+# tests/test_llm_cache.py
+
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from openai.types.chat import ChatCompletion
+import core_brain
+import llm_cache
+import llm_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, "CACHE_DB", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "ENABLED", True)
+    monkeypatch.setattr(llm_cache, "_db", None)
+    llm_cache.clear(memory_only=True)
+    yield
+    if llm_cache._db is not None:
+        llm_cache._db.close()
+    monkeypatch.setattr(llm_cache, "_db", None)
+
+
+def _completion(text):
+    return ChatCompletion.model_validate({
+        "id": "x", "object": "chat.completion", "created": 1, "model": "m",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    })
+
+
+def test_key_ignores_seconds_and_whitespace():
+    a = llm_cache.make_key("openai", "m", [{"role": "user", "content": "at  2026-10-14T18:00:05"}], {})
+    b = llm_cache.make_key("openai", "m", [{"role": "user", "content": "at 2026-10-14T18:00:59"}], {})
+    c = llm_cache.make_key("openai", "m", [{"role": "user", "content": "at 2026-10-14T18:01:00"}], {})
+    assert a == b != c
+
+
+def test_memory_and_disk_tiers():
+    llm_cache.put("intent", "k1", "payload")
+    assert llm_cache.get("intent", "k1") == "payload"
+    llm_cache.clear(memory_only=True)
+    assert llm_cache.get("intent", "k1") == "payload"
+    assert llm_cache.get_stats()["intent"]["disk_hits"] == 1
+
+
+@pytest.mark.parametrize("stage, text, ok", [
+    ("intent", '{"intent": "list", "confidence": 0.9}', True),
+    ("intent", 'Sure! {"intent": "list"}', False),   # core_brain can't parse this
+    ("intent", "not json", False),
+    ("time_fix", '{"iso": "2026-10-15T09:00:00+01:00"}', True),
+    ("time_fix", '{"iso": null}', False),
+    ("time_fix", "Sorry, I can't help with that.", False),
+    ("smart_time", 'Here: {"start_time": null}', True),
+    ("reminder", "", False),
+    ("reminder", "Time for the gym!", True),
+])
+def test_only_parsed_answers_are_storable(stage, text, ok):
+    assert llm_cache.storable(stage, text) is ok
+
+
+def test_unparseable_completions_are_not_cached(monkeypatch):
+    answers = iter(["Sorry, I can't help with that.", '{"iso": "2026-10-15T09:00:00+01:00"}'])
+
+    async def fake_call(provider, request, timeout):
+        return _completion(next(answers))
+
+    monkeypatch.setattr(llm_client.fault_injection, "llm_call", fake_call)
+    monkeypatch.setattr(llm_client, "_get_client", lambda provider: SimpleNamespace(chat=None))
+    messages = [{"role": "user", "content": "tomorrow 9am"}]
+
+    first = llm_client.complete_sync("openai", "m", messages, stage="time_fix")
+    second = llm_client.complete_sync("openai", "m", messages, stage="time_fix")
+    third = llm_client.complete_sync("openai", "m", messages, stage="time_fix")
+
+    assert "Sorry" in first.choices[0].message.content
+    assert not llm_client.from_cache(second)
+    assert llm_client.from_cache(third)
+    assert json.loads(third.choices[0].message.content)["iso"].startswith("2026-10-15")
+
+
+def test_intent_cache_basis_ignores_clock_and_older_turns():
+    turns = [{"role": "user" if n % 2 else "assistant", "message": f"turn {n}"} for n in range(6)]
+    packet = {"user_id": "u1", "user_message": "turn 5", "chat_context": turns,
+              "tasks": [{"title": "Gym", "due": "2026-10-16T17:00:00+00:00"}],
+              "current_time": "2026-10-14T18:00:00+00:00", "user_timezone": "UTC"}
+    later = {**packet, "current_time": "2026-10-14T18:07:00+00:00",
+             "chat_context": [{"role": "user", "message": "older"}] + turns}
+
+    assert core_brain._intent_cache_basis(packet) == core_brain._intent_cache_basis(later)
+    changed = {**packet, "chat_context": turns[:-2] + [{"role": "assistant", "message": "Delete it?"}, turns[-1]]}
+    assert core_brain._intent_cache_basis(packet) != core_brain._intent_cache_basis(changed)
+
+
+def test_cache_hits_do_not_record_latency(monkeypatch):
+    answer = _completion('{"intent": "list", "confidence": 0.9}')
+    answer._from_cache = True
+
+    async def fake_complete(*args, **kwargs):
+        return answer
+
+    monkeypatch.setattr(llm_client, "complete", fake_complete)
+    core_brain._latencies.pop("cached-model", None)
+    vote = asyncio.run(core_brain.call_model_async("cached-model", {"user_message": "show tasks"}))
+    assert vote["intent"] == "list"
+    assert "cached-model" not in core_brain._latencies
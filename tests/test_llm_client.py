@@ -0,0 +1,28 @@
+# tests/test_llm_client.py
+
+import pytest
+import llm_client
+
+
+async def _answer():
+    return 42
+
+
+def test_run_sync_from_another_thread():
+    assert llm_client.run_sync(_answer()) == 42
+
+
+def test_run_sync_refuses_the_loop_thread():
+    async def nested():
+        return llm_client.run_sync(_answer())
+
+    with pytest.raises(RuntimeError, match="run_sync"):
+        llm_client.run_sync(nested())
+
+
+def test_complete_sync_refuses_the_loop_thread():
+    async def nested():
+        return llm_client.complete_sync("openai", "gpt-4o-mini", [])
+
+    with pytest.raises(RuntimeError, match="complete_sync"):
+        llm_client.run_sync(nested())
@@ -0,0 +1,100 @@
+# tests/test_llm_stub_server.py
+
+import json
+import urllib.request
+import pytest
+import core_brain
+import llm_stub_server
+
+
+def _ask(content, **body):
+    return llm_stub_server.rule_response({"messages": [{"role": "user", "content": content}], **body})
+
+
+@pytest.fixture
+def stub():
+    server = llm_stub_server.serve(
+        0, latency="fixed:0", model_latency={"slow": "fixed:50"},
+        script=[{"match": "magic word", "content": '{"scripted": true}'}]
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, path, payload):
+    port = server.server_address[1]
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+# -----------------------
+# Canned responses
+# -----------------------
+@pytest.mark.parametrize("message, intent", [
+    ("remind me to call mom tomorrow at 5pm", "create"),
+    ("move the gym session to saturday", "update"),
+    ("delete the groceries task", "delete"),
+    ("show my tasks for this week", "list"),
+    ("hey, how are you?", "chat"),
+])
+def test_intent_votes(message, intent):
+    prompt = core_brain._intent_messages({"user_message": message, "chat_context": [], "tasks": []})
+    content, tool_calls = llm_stub_server.rule_response({"messages": prompt})
+    assert tool_calls is None
+    assert json.loads(content)["intent"] == intent
+
+
+def test_full_list_filter_returns_every_alias():
+    content, _ = _ask("You are a task filtering engine.\nt1: Gym | due Sat\nt2: Report | due Sun")
+    assert json.loads(content) == {"tasks": ["t1", "t2"]}
+
+
+def test_structured_list_filter_is_a_valid_filter():
+    content, _ = _ask("You convert a user's question about their task list into a JSON filter.")
+    assert json.loads(content)["status"] == "pending"
+
+
+def test_single_call_pipeline_answers_with_a_tool_call():
+    content, tool_calls = _ask("t1: Gym session | due Sat\ndelete the gym session", tools=[{}])
+    assert content is None
+    call = tool_calls[0]["function"]
+    assert call["name"] == "delete_task"
+    assert json.loads(call["arguments"])["task"] == "t1"
+
+
+def test_unknown_prompt_gets_ok():
+    assert _ask("something else entirely") == ("OK", None)
+
+
+# -----------------------
+# HTTP server
+# -----------------------
+def test_chat_completion_round_trip(stub):
+    prompt = core_brain._intent_messages({"user_message": "delete the gym session", "chat_context": [], "tasks": []})
+    reply = _post(stub, "/v1/chat/completions", {"model": "m", "messages": prompt})
+    assert reply["object"] == "chat.completion"
+    assert reply["model"] == "m"
+    assert json.loads(reply["choices"][0]["message"]["content"])["intent"] == "delete"
+    assert reply["usage"]["prompt_tokens"] > 0
+
+
+def test_scripted_responses_take_precedence(stub):
+    reply = _post(stub, "/v1/chat/completions", {"model": "m", "messages": [{"role": "user", "content": "say the magic word"}]})
+    assert reply["choices"][0]["message"]["content"] == '{"scripted": true}'
+
+
+def test_per_model_latency(stub):
+    config = stub.stub_config
+    assert config.latency_for("m") == 0
+    assert config.latency_for("slow") == pytest.approx(0.05)
+
+
+def test_google_endpoints(stub):
+    assert _post(stub, "/token", {})["access_token"] == "stub-access-token"
+    created = _post(stub, "/tasks/lists/@default/tasks", {"title": "Gym"})
+    assert created["title"] == "Gym" and created["id"].startswith("stub-task-")
@@ -0,0 +1,76 @@
+# tests/test_llm_telemetry.py
+
+import json
+from types import SimpleNamespace
+import pytest
+import llm_telemetry
+
+
+@pytest.fixture(autouse=True)
+def _fresh():
+    llm_telemetry.reset()
+    yield
+    llm_telemetry.reset()
+
+
+def _usage(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def test_series_are_kept_per_model_and_stage():
+    llm_telemetry.record_call("m1", "intent", 0.2, usage=_usage(100, 10))
+    llm_telemetry.record_call("m1", "create", 0.4)
+    llm_telemetry.record_call("m2", "intent", 0.3, error=TimeoutError("slow"))
+
+    series = llm_telemetry.snapshot()["series"]
+    assert set(series) == {"m1|intent", "m1|create", "m2|intent"}
+    assert series["m1|intent"]["prompt_tokens"] == 100
+    assert series["m2|intent"]["errors"] == 1
+    assert series["m2|intent"]["error_types"] == {"TimeoutError": 1}
+    assert series["m2|intent"]["window"] == 0  # failed calls have no latency sample
+
+
+def test_percentiles_and_histogram():
+    for ms in range(10, 1010, 10):  # 10ms .. 1000ms
+        llm_telemetry.record_call("m", "intent", ms / 1000)
+    llm_telemetry.record_call("m", "intent", 90.0)
+
+    s = llm_telemetry.snapshot()["series"]["m|intent"]
+    assert s["p50_seconds"] == pytest.approx(0.51)
+    assert s["p95_seconds"] == pytest.approx(0.96)
+    assert s["histogram"]["<=100ms"] == 10
+    assert s["histogram"]["<=250ms"] == 15
+    assert s["histogram"]["<=1000ms"] == 50
+    assert s["histogram"][">60000ms"] == 1
+    assert sum(s["histogram"].values()) == 101
+
+
+def test_model_summary_counts_cancelled_apart():
+    llm_telemetry.record_call("m", "intent", 0.2)
+    llm_telemetry.record_call("m", "intent", 0.3, error=ValueError("bad"))
+    llm_telemetry.record_call("m", "intent", 0.1, cancelled=True)
+    llm_telemetry.record_call("m", "create", 0.5)
+    llm_telemetry.record_parse_failure("m", "intent")
+    llm_telemetry.record_vote("m", "intent", True)
+    llm_telemetry.record_vote("m", "intent", False)
+
+    r = llm_telemetry.model_summary("intent")["m"]
+    assert (r["calls"], r["ok"], r["errors"], r["cancelled"], r["finished"]) == (3, 1, 1, 1, 2)
+    assert r["error_rate"] == 0.5
+    assert r["agreement_rate"] == 0.5
+    assert r["parse_failures"] == 1
+    assert llm_telemetry.model_summary()["m"]["calls"] == 4
+
+
+def test_dump_round_trip(tmp_path):
+    llm_telemetry.record_call("m", "intent", 0.25, usage=_usage(50, 5))
+    path = str(tmp_path / "telemetry.json")
+
+    data = llm_telemetry.dump(path)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == json.loads(json.dumps(data))
+
+    assert data["series"]["m|intent"]["ok"] == 1
+    for key in ("cache", "chat_cache", "singleflight", "task_fragments", "intent_rules",
+                "local_intent", "task_retrieval", "list_engine", "speculation", "intent_breakers"):
+        assert key in data
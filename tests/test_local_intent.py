@@ -0,0 +1,80 @@
+# tests/test_local_intent.py
+
+import csv
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+import local_intent
+
+EXAMPLES = {
+    "list": ["show my tasks", "what do i have today", "list everything pending", "what is due this week"],
+    "create": ["add gym at 6pm", "remind me to call mum", "create a task for the report", "new task buy milk"],
+    "delete": ["delete the gym task", "remove the dentist reminder", "cancel my meeting", "drop the report task"],
+    "chat": ["how are you doing", "tell me a joke", "good evening friend", "you are helpful"],
+}
+
+
+def packet(message, chat_context=None):
+    return {"user_id": "u1", "user_message": message, "chat_context": chat_context or []}
+
+
+def result(intent):
+    return {"intent": intent, "stats": {"model_results": [{"model": "m1", "intent": intent}]}}
+
+
+@pytest.fixture
+def trained(monkeypatch):
+    for intent, texts in EXAMPLES.items():
+        for text in texts:
+            for n in range(5):
+                local_intent.log_vote(packet(f"{text} {n}"), result(intent))
+    assert local_intent.train_model(min_rows=20)
+    monkeypatch.setattr(local_intent, "CONFIDENCE_THRESHOLD", 0.0)
+    monkeypatch.setattr(local_intent, "ENABLED", True)
+
+
+@pytest.mark.parametrize("message, context", [
+    ("yes", []),
+    ("what about tomorrow?", []),
+    ("move it to 5pm", []),
+    ("delete that", []),
+    ("the gym one", [{"role": "assistant", "message": "Which task should I delete?"}]),
+])
+def test_needs_context(message, context):
+    assert local_intent.needs_context(packet(message, context))
+
+
+@pytest.mark.parametrize("message", ["show my tasks", "add gym at 6pm", "what's on this week"])
+def test_context_free(message):
+    assert not local_intent.needs_context(packet(message))
+
+
+def test_classify_skips_context_dependent_messages(trained):
+    assert local_intent.classify(packet("delete the gym task 1"))["intent"] == "delete"
+    asked = [{"role": "assistant", "content": "Delete the gym task?"}]
+    assert local_intent.classify(packet("delete the gym task 1", asked)) is None
+
+
+def test_context_dependent_votes_are_not_logged():
+    local_intent.log_vote(packet("yes"), result("delete"))
+    local_intent.log_vote(packet("show my tasks"), result("list"))
+    assert [r["user_message"] for r in local_intent.load_votes()] == ["show my tasks"]
+
+
+def test_vote_log_is_capped(monkeypatch):
+    old = (datetime.now(timezone.utc) - timedelta(days=local_intent.VOTES_MAX_AGE_DAYS + 1)).isoformat()
+    with open(local_intent.VOTES_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=local_intent.VOTE_FIELDS)
+        writer.writeheader()
+        writer.writerow({"timestamp_utc": old, "user_id": "u1", "user_message": "stale",
+                         "intent": "chat", "votes": json.dumps({})})
+
+    monkeypatch.setattr(local_intent, "VOTES_MAX_ROWS", 3)
+    monkeypatch.setattr(local_intent, "TRIM_EVERY_ROWS", 1)
+    for n in range(5):
+        local_intent.log_vote(packet(f"show my tasks {n}"), result("list"))
+
+    messages = [r["user_message"] for r in local_intent.load_votes()]
+    assert "stale" not in messages
+    assert len(messages) <= local_intent.VOTES_MAX_ROWS + 1
+    assert messages[-1] == "show my tasks 4"
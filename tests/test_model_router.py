@@ -0,0 +1,70 @@
+# tests/test_model_router.py
+
+import model_router
+
+
+def _reset():
+    model_router._outcomes.clear()
+    model_router._latency.clear()
+    model_router._decisions.clear()
+
+
+def _prove(stage, model, ok=True, seconds=1.0):
+    for _ in range(model_router.MIN_SAMPLES):
+        model_router._record_outcome(stage, model, ok)
+        model_router.record_latency(stage, model, seconds)
+
+
+def test_route_picks_fastest_qualified(monkeypatch):
+    _reset()
+    monkeypatch.setattr(model_router, "EXPLORE_RATE", 0.0)
+    candidates = [c["model"] for c in model_router.routes()["create"]["candidates"]]
+    fast, slow = candidates[0], candidates[1]
+    _prove("create", slow, seconds=2.0)
+    _prove("create", fast, seconds=0.5)
+
+    choice = model_router.route("create")
+    assert choice["model"] == fast
+    assert choice["reason"] == "fastest_qualified"
+
+
+def test_failing_candidate_never_qualifies(monkeypatch):
+    _reset()
+    monkeypatch.setattr(model_router, "EXPLORE_RATE", 0.0)
+    table = model_router.routes()["create"]
+    cheap = next(c["model"] for c in table["candidates"] if c["model"] != table["default"])
+    _prove("create", cheap, ok=False, seconds=0.1)
+
+    assert model_router.route("create")["reason"] == "default"
+
+
+def test_p95_is_cached_between_refreshes():
+    _reset()
+    for _ in range(100):
+        model_router.record_latency("create", "m", 1.0)
+    assert model_router._latencies("create")["m"] == 1.0
+
+    for _ in range(model_router.P95_REFRESH_SAMPLES - 1):
+        model_router.record_latency("create", "m", 9.0)
+    assert model_router._latencies("create")["m"] == 1.0
+
+    model_router.record_latency("create", "m", 9.0)
+    assert model_router._latencies("create")["m"] == 9.0
+
+
+def test_latency_window_is_bounded():
+    _reset()
+    for i in range(model_router.LATENCY_WINDOW * 3):
+        model_router.record_latency("create", "m", float(i))
+    assert len(model_router._latency[("create", "m")]["samples"]) == model_router.LATENCY_WINDOW
+
+
+def test_route_does_not_read_telemetry(monkeypatch):
+    import llm_telemetry
+
+    def boom():
+        raise AssertionError("route() must not snapshot telemetry")
+
+    monkeypatch.setattr(llm_telemetry, "snapshot", boom)
+    model_router.route("create")
+    model_router.get_stats()
@@ -0,0 +1,52 @@
+# tests/test_prompt_builder.py
+
+import prompt_builder
+
+
+def turns(sizes):
+    return [
+        {"role": "user" if n % 2 == 0 else "assistant", "message": "x" * size,
+         "timestamp": f"2026-10-14T10:{n:02d}:00"}
+        for n, size in enumerate(sizes)
+    ]
+
+
+def summarize_into(monkeypatch):
+    seen = []
+
+    def fake(previous, new_turns):
+        seen.extend(new_turns)
+        return "summary"
+    monkeypatch.setattr(prompt_builder, "_summarize", fake)
+    return seen
+
+
+def test_budget_dropped_window_turns_are_summarized(monkeypatch):
+    seen = summarize_into(monkeypatch)
+    # 10 turns: the raw window is the last 6, but the 1500-char turn
+    # inside it does not fit the tightest (400 token) budget
+    context = turns([20, 20, 20, 20, 20, 1500, 20, 20, 20, 20])
+    sent = prompt_builder.verbatim_turns(context)
+    assert len(sent) == 4
+
+    prompt_builder.update_summary("u1", context)
+    assert len(seen) == len(context) - len(sent)
+    assert seen + sent == context
+
+
+def test_every_turn_is_sent_or_summarized(monkeypatch):
+    seen = summarize_into(monkeypatch)
+    context = turns([20] * 8)
+    prompt_builder.update_summary("u1", context)
+    assert seen == context[:2]
+
+    # already summarized turns are not sent again
+    seen.clear()
+    prompt_builder.update_summary("u1", context + turns([20] * 9)[8:])
+    assert seen == context[2:3]
+
+
+def test_short_conversation_needs_no_summary(monkeypatch):
+    seen = summarize_into(monkeypatch)
+    assert prompt_builder.update_summary("u1", turns([20] * 4)) is None
+    assert seen == []
@@ -0,0 +1,89 @@
+# tests/test_semantic_cache.py
+
+import pytest
+import semantic_cache
+
+TASKS = [{"title": "Gym", "due": "2026-10-16T17:00:00+00:00"}]
+REPLY = {"action": "chat", "parameters": {}, "ai_comment": "", "response_text": "You're welcome!"}
+
+# same meaning: must reuse the reply
+SAME = [
+    ("thanks!", "thank you"),
+    ("thanks", "thanks!!"),
+    ("thank you so much", "thanks so much"),
+    ("ok cool", "okay cool"),
+    ("hello", "hey"),
+    ("ok thanks", "okay thank you"),
+    ("haha", "hahaha"),
+    ("great, thanks", "great thanks!"),
+]
+
+# different meaning, close spelling: must not reuse the reply
+DIFFERENT = [
+    ("what can you do", "what can't you do"),
+    ("are you a bot", "are you a robot"),
+    ("how are you", "how old are you"),
+    ("thanks", "thanks, bye"),
+    ("i'm tired", "i'm fired"),
+    ("nice", "not nice"),
+    ("how are you", "who are you"),
+    ("tell me a joke", "tell me a story"),
+    ("good morning", "good evening"),
+]
+
+# never eligible: the answer depends on the clock or an earlier turn
+CONTEXTUAL = [
+    ("is my meeting at 5pm?", "is my meeting at 6pm?"),
+    ("move the gym to monday?", "move the gym to sunday?"),
+    ("what about tomorrow?", "what about today?"),
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "ENABLED", True)
+    semantic_cache.clear()
+    yield
+    semantic_cache.clear()
+
+
+def cached_for(stored, asked, chat_context=None):
+    semantic_cache.store("u1", stored, TASKS, REPLY, chat_context)
+    return semantic_cache.lookup("u1", asked, TASKS, chat_context)
+
+
+@pytest.mark.parametrize("stored, asked", SAME)
+def test_same_meaning_hits(stored, asked):
+    assert cached_for(stored, asked) == REPLY
+
+
+@pytest.mark.parametrize("stored, asked", DIFFERENT)
+def test_near_misses_stay_below_threshold(stored, asked):
+    sim = semantic_cache.cosine(semantic_cache.vectorize(stored), semantic_cache.vectorize(asked))
+    assert sim < semantic_cache.THRESHOLD
+    assert cached_for(stored, asked) is None
+
+
+@pytest.mark.parametrize("stored, asked", CONTEXTUAL)
+def test_time_and_reference_messages_are_not_cached(stored, asked):
+    assert not semantic_cache.eligible(stored)
+    assert cached_for(stored, asked) is None
+    assert cached_for(stored, stored) is None
+
+
+def test_no_reuse_after_an_assistant_question():
+    question = [{"role": "assistant", "message": "Should I delete the gym task?"}]
+    statement = [{"role": "assistant", "message": "Done!"}]
+    semantic_cache.store("u1", "ok", TASKS, REPLY, statement)
+    assert semantic_cache.lookup("u1", "ok", TASKS, question) is None
+    assert semantic_cache.lookup("u1", "ok", TASKS, statement) == REPLY
+
+
+def test_task_changes_invalidate():
+    semantic_cache.store("u1", "thanks", TASKS, REPLY)
+    assert semantic_cache.lookup("u1", "thanks", TASKS + [{"title": "Dentist"}]) is None
+
+
+def test_replies_are_per_user():
+    semantic_cache.store("u1", "thanks", TASKS, REPLY)
+    assert semantic_cache.lookup("u2", "thanks", TASKS) is None
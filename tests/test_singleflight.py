@@ -0,0 +1,148 @@
+# tests/test_singleflight.py
+
+import time
+import asyncio
+import threading
+import pytest
+import singleflight
+
+
+# -----------------------
+# Group (threads)
+# -----------------------
+def _run_threads(group, key, fn, n):
+    """
+    n threads call group.do(key, fn) while the first call is held open;
+    returns each thread's result or exception.
+    """
+    release = threading.Event()
+    outcomes = [None] * n
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    def worker(i):
+        try:
+            outcomes[i] = group.do(key, held)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while group._stats["calls"] < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(5)
+    return outcomes
+
+
+def test_concurrent_identical_keys_share_one_call():
+    group = singleflight.Group("test_share")
+    runs = []
+    outcomes = _run_threads(group, "k", lambda: runs.append(1) or "result", 8)
+
+    assert outcomes == ["result"] * 8
+    assert runs == [1]
+    stats = singleflight.get_stats()["test_share"]
+    assert (stats["calls"], stats["executed"], stats["collapsed"]) == (8, 1, 7)
+
+
+def test_exception_reaches_every_waiter():
+    group = singleflight.Group("test_error")
+
+    def boom():
+        raise RuntimeError("token endpoint down")
+
+    outcomes = _run_threads(group, "k", boom, 5)
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert group._stats["executed"] == 1
+
+
+def test_key_runs_again_after_completion():
+    group = singleflight.Group("test_again")
+    runs = []
+    assert group.do("k", lambda: runs.append(1) or len(runs)) == 1
+    assert group.do("k", lambda: runs.append(1) or len(runs)) == 2
+    assert group._calls == {}
+
+
+def test_different_keys_do_not_collapse():
+    group = singleflight.Group("test_keys")
+    assert _run_threads(group, "a", lambda: "a", 1) == ["a"]
+    assert _run_threads(group, "b", lambda: "b", 1) == ["b"]
+    assert group._stats["collapsed"] == 0
+
+
+# -----------------------
+# AsyncGroup (coroutines)
+# -----------------------
+def test_async_identical_keys_share_one_call():
+    group = singleflight.AsyncGroup("test_async_share")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(group.do("k", work) for _ in range(6)))
+
+    assert asyncio.run(main()) == ["result"] * 6
+    assert runs == [1]
+    assert group._stats["collapsed"] == 5
+
+
+def test_async_exception_reaches_every_waiter():
+    group = singleflight.AsyncGroup("test_async_error")
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad completion")
+
+    async def main():
+        return await asyncio.gather(*(group.do("k", boom) for _ in range(3)), return_exceptions=True)
+
+    outcomes = asyncio.run(main())
+    assert all(isinstance(o, ValueError) for o in outcomes)
+
+
+def test_cancelling_one_waiter_keeps_the_shared_call():
+    group = singleflight.AsyncGroup("test_async_cancel")
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(group.do("k", work))
+        second = asyncio.ensure_future(group.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+    assert finished == [1]
+
+
+def test_async_key_runs_again_after_completion():
+    group = singleflight.AsyncGroup("test_async_again")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        return len(runs)
+
+    async def main():
+        return [await group.do("k", work), await group.do("k", work)]
+
+    assert asyncio.run(main()) == [1, 2]
+    assert group._tasks == {}
@@ -0,0 +1,47 @@
+# tests/test_speculation.py
+
+import asyncio
+import model_router
+import speculation
+
+
+def test_defer_runs_immediately_outside_speculation():
+    calls = []
+    speculation.defer(calls.append, 1)
+    assert calls == [1]
+
+
+def test_run_defers_until_commit():
+    calls = []
+
+    def processor():
+        speculation.defer(calls.append, "stored")
+        return "reply"
+
+    result, pending = speculation.run(processor)
+    assert result == "reply" and calls == []
+    speculation.commit(pending)
+    assert calls == ["stored"]
+
+
+def test_context_reaches_worker_threads():
+    calls = []
+
+    def processor():
+        assert speculation.active()
+        speculation.defer(calls.append, "x")
+        return len(calls)
+
+    async def main():
+        return await asyncio.to_thread(speculation.run, processor)
+
+    result, pending = asyncio.run(main())
+    assert result == 0 and calls == [] and len(pending) == 1
+    assert not speculation.active()
+
+
+def test_router_outcomes_are_held_back():
+    _, pending = speculation.run(model_router.record_outcome, "chat", "spec-model", True)
+    assert model_router.success_rate("chat", "spec-model") == (None, 0)
+    speculation.commit(pending)
+    assert model_router.success_rate("chat", "spec-model") == (1.0, 1)
@@ -0,0 +1,102 @@
+# tests/test_task_aliases.py
+
+import pytest
+import task_aliases
+import task_fragments
+
+
+@pytest.fixture(autouse=True)
+def _fresh():
+    task_fragments.clear()
+    yield
+    task_fragments.clear()
+
+
+TASKS = [
+    {"user_id": "user_1", "google_id": "AbC123googleIdOne", "title": "Gym session",
+     "due": "2026-10-19T08:00:00Z", "details": "leg day"},
+    {"user_id": "user_1", "google_id": "XyZ789googleIdTwo", "title": "Quarterly report",
+     "due": "2026-10-20T16:00:00Z", "details": ""},
+    {"user_id": "user_1", "google_id": "QqQ456googleIdThree", "title": "Dentist", "due": "", "details": ""},
+]
+
+
+def _encoded():
+    return task_aliases.encode(TASKS, "Africa/Lagos")
+
+
+# -----------------------
+# encode
+# -----------------------
+def test_encode_numbers_tasks_in_order():
+    encoded = _encoded()
+    assert list(encoded["tasks"]) == ["t1", "t2", "t3"]
+    assert [t["google_id"] for t in encoded["tasks"].values()] == [t["google_id"] for t in TASKS]
+    this_year = task_aliases._context("Africa/Lagos")[1]
+    due = [task_aliases.render_due(t["due"], "Africa/Lagos", this_year) for t in TASKS[:2]]
+    assert encoded["text"].splitlines() == [
+        f"t1: Gym session | due {due[0]} | leg day",
+        f"t2: Quarterly report | due {due[1]}",
+        "t3: Dentist",
+    ]
+    # in the user's timezone
+    assert task_aliases.render_due(TASKS[0]["due"], "Africa/Lagos", 2026) == "Mon 19 Oct 09:00"
+
+
+def test_encode_is_stable():
+    assert _encoded() == _encoded()
+    reordered = task_aliases.encode(list(reversed(TASKS)), "Africa/Lagos")
+    assert reordered["tasks"]["t1"]["google_id"] == TASKS[2]["google_id"]
+    assert reordered["text"].splitlines()[0] == "t1: Dentist"
+
+
+def test_encode_without_tasks():
+    assert task_aliases.encode([], "UTC") == {"text": "", "tasks": {}}
+
+
+# -----------------------
+# resolve
+# -----------------------
+@pytest.mark.parametrize("answer", ["t2", "T2", "2", " t2 ", {"task": "t2"}])
+def test_resolve_alias_forms(answer):
+    assert task_aliases.resolve(_encoded(), answer)["google_id"] == "XyZ789googleIdTwo"
+
+
+def test_resolve_copied_google_id():
+    encoded = _encoded()
+    assert task_aliases.resolve(encoded, "QqQ456googleIdThree") is TASKS[2]
+    assert task_aliases.resolve(encoded, {"google_id": "AbC123googleIdOne"}) is TASKS[0]
+
+
+@pytest.mark.parametrize("answer", ["t0", "t4", "t99", "4", "tt2", "t-1", "", None, "NotAnId", {"task": None}])
+def test_unknown_answers_resolve_to_nothing(answer):
+    assert task_aliases.resolve(_encoded(), answer) is None
+
+
+# -----------------------
+# decode_task_param
+# -----------------------
+def test_decode_replaces_the_alias_with_the_google_id():
+    result = {"action": "update", "parameters": {"task": "t1", "due": "tomorrow"}}
+    assert task_aliases.decode_task_param(result, _encoded()) is result
+    assert result["parameters"] == {"google_id": "AbC123googleIdOne", "due": "tomorrow"}
+
+
+def test_decode_accepts_a_copied_google_id_param():
+    result = {"parameters": {"google_id": "XyZ789googleIdTwo"}}
+    task_aliases.decode_task_param(result, _encoded())
+    assert result["parameters"]["google_id"] == "XyZ789googleIdTwo"
+
+
+@pytest.mark.parametrize("params", [{"task": "t7"}, {"google_id": "made-up"}, {}, {"task": ""}])
+def test_decode_never_picks_another_task(params):
+    result = {"parameters": dict(params)}
+    task_aliases.decode_task_param(result, _encoded())
+    assert result["parameters"]["google_id"] is None
+    assert "task" not in result["parameters"]
+
+
+@pytest.mark.parametrize("result", [{}, {"parameters": None}, {"parameters": "t1"}, {"parameters": ["t1"]}])
+def test_decode_leaves_non_dict_params_alone(result):
+    before = dict(result)
+    assert task_aliases.decode_task_param(result, _encoded()) == before
@@ -0,0 +1,124 @@
+# tests/test_task_fragments.py
+
+import pytest
+import task_fragments
+
+
+@pytest.fixture(autouse=True)
+def _fresh():
+    task_fragments.clear()
+    yield
+    task_fragments.clear()
+
+
+def _task(n, **fields):
+    return {"user_id": "user_1", "google_id": f"g{n}", "title": f"Task {n}",
+            "due": "2026-10-20T09:00:00Z", "status": "pending", **fields}
+
+
+def _fragment_keys(user_id="user_1"):
+    return {k[2] for k in task_fragments._users[user_id]["fragments"]}
+
+
+# -----------------------
+# Versions
+# -----------------------
+def test_version_tuple_parts():
+    g, u, stamp = task_fragments.version("user_1")
+    assert (g, u, stamp) == (0, 0, None)  # no tasks.csv yet
+
+    task_fragments.invalidate("user_1")
+    assert task_fragments.version("user_1")[:2] == (0, 1)
+    assert task_fragments.version("user_2")[:2] == (0, 0)  # per user
+
+    task_fragments.invalidate_all()
+    assert task_fragments.version("user_1")[:2] == (1, 1)
+    assert task_fragments.version("user_2")[:2] == (1, 0)
+
+
+def test_tasks_csv_changes_change_the_version():
+    with open(task_fragments.TASKS_CSV, "w", encoding="utf-8") as f:
+        f.write("user_id,title\n")
+    first = task_fragments.version("user_1")
+    assert first[2] is not None
+
+    with open(task_fragments.TASKS_CSV, "a", encoding="utf-8") as f:
+        f.write("user_1,Gym\n")
+    assert task_fragments.version("user_1")[2] != first[2]
+
+
+def test_user_ids_are_normalized():
+    task_fragments.invalidate("1")
+    assert task_fragments.version("user_1")[1] == 1
+
+
+# -----------------------
+# Listings
+# -----------------------
+def test_unchanged_listing_is_reused():
+    tasks = [_task(1), _task(2)]
+    text = task_fragments.listing(tasks, "compact")
+    assert task_fragments.listing(tasks, "compact") == text
+    stats = task_fragments.get_stats()
+    assert (stats["listing_hits"], stats["listing_misses"], stats["fragments_rendered"]) == (1, 1, 2)
+
+
+def test_invalidate_rebuilds_but_keeps_unchanged_fragments():
+    tasks = [_task(1), _task(2)]
+    task_fragments.listing(tasks, "compact")
+    task_fragments.invalidate("user_1")
+
+    tasks[1] = _task(2, title="Renamed")
+    text = task_fragments.listing(tasks, "compact")
+    assert "Renamed" in text
+    stats = task_fragments.get_stats()
+    assert stats["listing_misses"] == 2
+    assert stats["fragments_rendered"] == 3  # only the renamed task again
+
+
+def test_in_memory_edits_are_never_served_stale():
+    tasks = [_task(1), _task(2)]
+    task_fragments.listing(tasks, "compact")
+
+    tasks[0] = _task(1, status="done")  # no invalidate()
+    assert '"status":"done"' in task_fragments.listing(tasks, "compact")
+
+
+def test_invalidate_with_ids_drops_those_fragments():
+    task_fragments.listing([_task(1), _task(2)], "compact")
+    task_fragments.invalidate("user_1", ["g2"])
+    assert _fragment_keys() == {"g1"}
+
+
+def test_rows_without_owner_are_not_cached():
+    rows = [{"title": "Loose", "status": "pending"}]
+    assert task_fragments.listing(rows, "compact") == '{"title":"Loose","status":"pending"}'
+    assert task_fragments.get_stats()["users"] == 0
+
+
+# -----------------------
+# Pruning
+# -----------------------
+def test_rebuild_prunes_deleted_tasks():
+    task_fragments.listing([_task(1), _task(2), _task(3)], "compact")
+    task_fragments.invalidate("user_1")
+    task_fragments.listing([_task(1), _task(2)], "compact")
+
+    assert _fragment_keys() == {"g1", "g2"}
+    assert task_fragments.get_stats()["fragments_pruned"] == 1
+
+
+def test_fragments_stay_bounded_as_tasks_come_and_go():
+    for n in range(50):
+        task_fragments.listing([_task(n), _task(n + 1)], "compact")
+        task_fragments.invalidate("user_1")
+    assert len(task_fragments._users["user_1"]["fragments"]) <= 2
+
+
+def test_prune_runs_once_per_version():
+    task_fragments.listing([_task(1), _task(2)], "compact")
+    task_fragments.invalidate("user_1")
+    task_fragments.listing([_task(1), _task(2)], "compact")
+    # a partial listing in the same version doesn't evict the others
+    task_fragments.listing([_task(1)], "compact")
+    assert _fragment_keys() == {"g1", "g2"}
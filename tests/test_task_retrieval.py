@@ -0,0 +1,47 @@
+# tests/test_task_retrieval.py
+
+import task_retrieval
+
+NOW = "2026-10-14T18:00:00+00:00"  # Wednesday
+
+TASKS = [
+    {"google_id": "g1", "title": "Gym session", "due": "2026-10-16T17:00:00+00:00", "google_status": "pending"},
+    {"google_id": "g2", "title": "Quarterly report", "due": "2026-10-18T09:00:00+00:00", "google_status": "pending"},
+    {"google_id": "g3", "title": "Dentist appointment", "due": "2026-10-15T10:00:00+00:00", "google_status": "pending"},
+]
+
+
+def rank(message, tasks=TASKS):
+    return task_retrieval.rank_tasks(message, tasks, "UTC", NOW)
+
+
+def test_best_title_ranks_first():
+    assert rank("move the quarterly report to monday")[0]["task"]["google_id"] == "g2"
+
+
+def test_tasks_marked_for_delete_are_not_candidates():
+    tasks = TASKS + [{"google_id": "g4", "title": "Gym session", "due": "", "google_status": "delete"}]
+    ids = [r["task"]["google_id"] for r in rank("delete the gym session", tasks)]
+    assert "g4" not in ids
+    assert ids[0] == "g1"
+
+
+def test_title_only_winner_is_not_clear_for_delete():
+    ranked = rank("delete the gym session")
+    assert task_retrieval.clear_winner(ranked)["google_id"] == "g1"
+    assert task_retrieval.clear_winner(ranked, require_time=True) is None
+
+
+def test_title_and_due_winner_is_clear_for_delete():
+    ranked = rank("delete the gym session on friday at 5pm")
+    assert task_retrieval.clear_winner(ranked, require_time=True)["google_id"] == "g1"
+
+
+def test_wrong_time_is_not_clear_for_delete():
+    ranked = rank("delete the gym session on saturday")
+    assert task_retrieval.clear_winner(ranked, require_time=True) is None
+
+
+def test_ambiguous_titles_have_no_winner():
+    tasks = TASKS + [{"google_id": "g5", "title": "Gym session", "due": "2026-10-20T17:00:00+00:00"}]
+    assert task_retrieval.clear_winner(rank("remove gym session", tasks)) is None
@@ -0,0 +1,64 @@
+# tests/test_time_fixer.py
+
+from datetime import datetime
+import pytest
+import pytz
+import time_fixer
+
+TZ = "Africa/Lagos"
+# Wednesday 14 Oct 2026, 18:00 local
+BASE = pytz.timezone(TZ).localize(datetime(2026, 10, 14, 18, 0))
+
+
+def fix(text):
+    return time_fixer.fix_time_from_text(text, user_timezone=TZ, reference_time=BASE)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tomorrow at 9am", "2026-10-15T09:00:00+01:00"),
+    ("today at 8pm", "2026-10-14T20:00:00+01:00"),
+    ("tonight", "2026-10-14T21:00:00+01:00"),
+    ("tonight at 8", "2026-10-14T20:00:00+01:00"),
+    ("in 2 hours", "2026-10-14T20:00:00+01:00"),
+    ("in a week", "2026-10-21T18:00:00+01:00"),
+])
+def test_fast_path_forms(text, expected):
+    assert fix(text) == expected
+
+
+def test_tonight_at_12_is_midnight():
+    assert fix("tonight at 12") == "2026-10-15T00:00:00+01:00"
+    assert fix("tonight at 1am") == "2026-10-15T01:00:00+01:00"
+
+
+def test_next_weekday_is_the_coming_one():
+    assert fix("next friday at 5pm") == "2026-10-16T17:00:00+01:00"
+    assert fix("next friday at 5pm") == fix("friday at 5pm")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3pm", "2026-10-15T15:00:00+01:00"),    # already past today -> tomorrow
+    ("at 3pm", "2026-10-15T15:00:00+01:00"),
+    ("7pm", "2026-10-14T19:00:00+01:00"),    # still ahead today
+])
+def test_bare_time_is_next_occurrence(text, expected):
+    assert fix(text) == expected
+
+
+@pytest.mark.parametrize("text", ["3pm", "7pm", "at 11am"])
+def test_bare_time_matches_dateparser(text):
+    user_tz = pytz.timezone(TZ)
+    norm = time_fixer._normalize_time_text(text)
+    fast = time_fixer._fast_parse(text, norm, user_tz, BASE)
+    slow = time_fixer._dateparser_parse(norm, user_tz, BASE)
+    assert fast == slow
+
+
+def test_ambiguous_bare_hour_goes_to_slow_path():
+    user_tz = pytz.timezone(TZ)
+    assert time_fixer._fast_parse("today 5", "today 5", user_tz, BASE) is None
+
+
+def test_empty_text():
+    assert fix("") is None
+    assert fix("   ") is None
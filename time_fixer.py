@@ -1,6 +1,7 @@
 # time_fixer.py
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
 import dateparser
 import re
@@ -49,29 +50,120 @@ def _normalize_time_text(text: str) -> str:
         t
     )
 
+    # "next friday" is the coming friday (what users mean in practice);
+    # dateparser does not understand the "next <weekday>" form at all
+    t = re.sub(
+        r"\bnext\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+        r"\1",
+        t
+    )
+
     return t
 
 
 # ---------------------------------------------------
-# Main function
+# Fast path for the common, unambiguous forms
 # ---------------------------------------------------
-def fix_time_from_text(time_text, user_timezone="UTC"):
+_ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[t ]\d{1,2}:\d{2}")
+
+_IN_RE = re.compile(
+    r"^in\s+(\d+|a|an)\s*(minute|min|hour|hr|day|week)s?$"
+)
+
+_DAY_AT_RE = re.compile(
+    r"^(today|tomorrow|tonight)?\s*"
+    r"(?:(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?)?$"
+)
+
+
+def _localize(naive_dt, user_tz):
+    return user_tz.normalize(user_tz.localize(naive_dt))
+
+
+def _fast_parse(raw_text, norm_text, user_tz, base_dt):
     """
-    Convert natural language time to ISO 8601 in user's timezone.
+    Resolve ISO strings, "in N minutes/hours/days/weeks" and
+    "[today|tomorrow|tonight] [at] H[:MM] [am|pm]" without dateparser.
 
-    Returns:
-        ISO string like '2026-02-06T10:00:00+01:00'
-        or None
+    Returns an aware datetime, or None when the text needs the slow path.
     """
+    # ISO datetimes (what the LLM processors hand back)
+    if _ISO_RE.match(raw_text.lower()):
+        try:
+            dt = datetime.fromisoformat(raw_text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if dt.tzinfo is None:
+            return _localize(dt, user_tz)
+        return dt.astimezone(user_tz)
 
-    if not time_text or not time_text.strip():
-        return None
+    match = _IN_RE.match(norm_text)
+    if match:
+        qty_raw, unit = match.groups()
+        qty = 1 if qty_raw in ("a", "an") else int(qty_raw)
 
-    user_tz = pytz.timezone(user_timezone)
-    base_dt = datetime.now(user_tz)
+        if unit in ("minute", "min"):
+            return (base_dt + timedelta(minutes=qty)).astimezone(user_tz)
+        if unit in ("hour", "hr"):
+            return (base_dt + timedelta(hours=qty)).astimezone(user_tz)
 
-    raw_text = time_text.strip()
-    norm_text = _normalize_time_text(raw_text)
+        # days/weeks keep the wall-clock time across DST changes
+        days = qty if unit == "day" else qty * 7
+        naive = base_dt.replace(tzinfo=None) + timedelta(days=days)
+        return _localize(naive, user_tz)
+
+    match = _DAY_AT_RE.match(norm_text)
+    if match and any(match.groups()):
+        day_word, hour_raw, minute_raw, meridiem = match.groups()
+
+        if hour_raw is None:
+            if day_word != "tonight":
+                return None
+            hour, minute = 21, 0
+        else:
+            hour = int(hour_raw)
+            minute = int(minute_raw or 0)
+            if meridiem is None and minute_raw is None and day_word != "tonight":
+                return None  # "today 5" or a bare "5" is ambiguous
+            if meridiem is None and day_word == "tonight" and hour == 12:
+                hour = 0  # "tonight at 12" is midnight
+            elif meridiem == "pm" or (meridiem is None and day_word == "tonight"):
+                if hour < 12:
+                    hour += 12
+            elif meridiem == "am" and hour == 12:
+                hour = 0
+            if hour > 23 or minute > 59:
+                return None
+
+        day = base_dt.date()
+        if day_word == "tomorrow" or (day_word == "tonight" and hour < 6):
+            # "tonight at 12" / "tonight at 1am" fall after midnight
+            day = day + timedelta(days=1)
+
+        naive = datetime(day.year, day.month, day.day, hour, minute)
+        dt = _localize(naive, user_tz)
+
+        # bare "3pm" means the next 3pm, as dateparser resolves it with
+        # PREFER_DATES_FROM="future" (so both paths agree)
+        if day_word is None and dt <= base_dt:
+            dt = _localize(naive + timedelta(days=1), user_tz)
+        return dt
+
+    return None
+
+
+# ---------------------------------------------------
+# Slow path (dateparser)
+# ---------------------------------------------------
+def _dateparser_parse(norm_text, user_tz, base_dt):
+    # RELATIVE_BASE is read as wall-clock time in TIMEZONE; an aware base
+    # makes dateparser drop time-only text ("3pm") outside UTC
+    settings = {
+        "TIMEZONE": str(user_tz),
+        "RETURN_AS_TIMEZONE_AWARE": True,
+        "PREFER_DATES_FROM": "future",
+        "RELATIVE_BASE": base_dt.replace(tzinfo=None)
+    }
 
     # ------------------------------------------------
     # Relative expressions:
@@ -88,15 +180,7 @@ def fix_time_from_text(time_text, user_timezone="UTC"):
 
         qty = 1 if qty_raw.lower() == "a" else int(qty_raw)
 
-        ref_dt = dateparser.parse(
-            reference_text,
-            settings={
-                "TIMEZONE": str(user_tz),
-                "RETURN_AS_TIMEZONE_AWARE": True,
-                "PREFER_DATES_FROM": "future",
-                "RELATIVE_BASE": base_dt
-            }
-        )
+        ref_dt = dateparser.parse(reference_text, settings=settings)
 
         if not ref_dt:
             return None
@@ -111,26 +195,92 @@ def fix_time_from_text(time_text, user_timezone="UTC"):
             delta = timedelta(days=qty * 365)
 
         if direction.lower() == "before":
-            fixed_dt = ref_dt - delta
-        else:
-            fixed_dt = ref_dt + delta
-
-        return fixed_dt.isoformat()
+            return ref_dt - delta
+        return ref_dt + delta
 
     # ------------------------------------------------
     # Normal dateparser pass (with normalized text)
     # ------------------------------------------------
-    dt = dateparser.parse(
-        norm_text,
-        settings={
-            "TIMEZONE": str(user_tz),
-            "RETURN_AS_TIMEZONE_AWARE": True,
-            "PREFER_DATES_FROM": "future",
-            "RELATIVE_BASE": base_dt
-        }
-    )
+    return dateparser.parse(norm_text, settings=settings)
+
+
+# ---------------------------------------------------
+# Cached resolver
+# ---------------------------------------------------
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(raw_text, user_timezone, base_iso):
+    user_tz = pytz.timezone(user_timezone)
+    base_dt = datetime.fromisoformat(base_iso)
+    norm_text = _normalize_time_text(raw_text)
+
+    dt = _fast_parse(raw_text, norm_text, user_tz, base_dt)
+    if dt is None:
+        dt = _dateparser_parse(norm_text, user_tz, base_dt)
 
     if not dt:
         return None
 
     return dt.isoformat()
+
+
+def _resolve_base(reference_time, user_tz):
+    """
+    Reference time for relative expressions, in the user's timezone.
+    Accepts an ISO string or datetime; falls back to "now".
+    """
+    if reference_time:
+        try:
+            if isinstance(reference_time, datetime):
+                ref = reference_time
+            else:
+                ref = datetime.fromisoformat(str(reference_time).replace("Z", "+00:00"))
+            if ref.tzinfo is None:
+                return _localize(ref, user_tz)
+            return ref.astimezone(user_tz)
+        except ValueError:
+            pass
+
+    # second precision so repeated calls within a second share a cache entry
+    return datetime.now(user_tz).replace(microsecond=0)
+
+
+def get_cache_stats():
+    info = _parse_cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "hit_rate": (info.hits / lookups) if lookups else 0.0
+    }
+
+
+def clear_cache():
+    _parse_cached.cache_clear()
+
+
+# ---------------------------------------------------
+# Main function
+# ---------------------------------------------------
+def fix_time_from_text(time_text, user_timezone="UTC", reference_time=None):
+    """
+    Convert natural language time to ISO 8601 in user's timezone.
+
+    reference_time (ISO string or datetime) anchors relative expressions
+    like "tomorrow"; defaults to now.
+
+    Returns:
+        ISO string like '2026-02-06T10:00:00+01:00'
+        or None
+    """
+
+    if not time_text or not str(time_text).strip():
+        return None
+
+    user_tz = pytz.timezone(user_timezone)
+    base_dt = _resolve_base(reference_time, user_tz)
+
+    return _parse_cached(str(time_text).strip(), str(user_tz), base_dt.isoformat())
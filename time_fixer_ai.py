@@ -1,45 +1,26 @@
 # time_fixer_ai.py
 
-import os
 import json
-import openai
 from datetime import datetime
 import pytz
-from dotenv import load_dotenv
+import llm_client
+import llm_telemetry
+import model_router
 
 # -------------------------------
-# Load API key from environment
+# Prompt / response helpers
 # -------------------------------
-load_dotenv()  # ensure .env is loaded
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not set in environment or .env")
-
-openai.api_key = OPENAI_API_KEY
-
-# -------------------------------
-# AI-based time fixer
-# -------------------------------
-def fix_time_with_model(time_text: str, user_timezone: str = "UTC") -> str | None:
-    """
-    Uses OpenAI LLM to convert human time expressions into ISO 8601 datetime.
-
-    Args:
-        time_text: e.g., "tomorrow morning by 10 am", "a week before 3rd April"
-        user_timezone: IANA timezone string, e.g., "Africa/Lagos"
-
-    Returns:
-        ISO 8601 string with timezone, e.g., "2026-02-06T17:00:00+01:00"
-        or None if parsing fails
-    """
-
-    # Reference time for relative expressions
+def _reference_now(user_timezone, reference_time=None):
+    if reference_time:
+        return str(reference_time)
     try:
-        now = datetime.now(pytz.timezone(user_timezone)).isoformat()
+        return datetime.now(pytz.timezone(user_timezone)).isoformat()
     except Exception:
-        now = datetime.utcnow().isoformat()
+        return datetime.utcnow().isoformat()
+
 
-    prompt = f"""
+def _build_prompt(time_text, user_timezone, now):
+    return f"""
 You are a datetime normalization engine.
 
 Convert this human-readable time expression into ISO 8601 datetime string.
@@ -59,9 +40,45 @@ Format example:
 {{"iso": "2026-02-06T17:00:00+01:00"}}
 """
 
+
+def _parse_iso_response(content):
+    content = (content or "").strip()
+    start = content.find("{")
+    end = content.rfind("}") + 1
+    if start == -1 or end == -1 or start >= end:
+        return None
+
+    data = json.loads(content[start:end])
+    return data.get("iso")
+
+
+# -------------------------------
+# AI-based time fixer
+# -------------------------------
+def fix_time_with_model(time_text: str, user_timezone: str = "UTC", reference_time=None) -> str | None:
+    """
+    Uses OpenAI LLM to convert human time expressions into ISO 8601 datetime.
+
+    Args:
+        time_text: e.g., "tomorrow morning by 10 am", "a week before 3rd April"
+        user_timezone: IANA timezone string, e.g., "Africa/Lagos"
+        reference_time: optional ISO string used instead of "now"
+
+    Returns:
+        ISO 8601 string with timezone, e.g., "2026-02-06T17:00:00+01:00"
+        or None if parsing fails
+    """
+
+    # Reference time for relative expressions
+    now = _reference_now(user_timezone, reference_time)
+    prompt = _build_prompt(time_text, user_timezone, now)
+
+    route = model_router.route("time_fix")
     try:
-        resp = openai.chat.completions.create(
-            model="gpt-4o-mini",
+        resp = llm_client.complete_sync(
+            route["provider"],
+            model=route["model"],
+            stage="time_fix",
             messages=[
                 {"role": "system", "content": "You are a datetime normalization engine."},
                 {"role": "user", "content": prompt}
@@ -69,17 +86,16 @@ Format example:
             temperature=0
         )
 
-        content = resp.choices[0].message.content.strip()
-        start = content.find("{")
-        end = content.rfind("}") + 1
-        if start == -1 or end == -1 or start >= end:
-            return None
-
-        data = json.loads(content[start:end])
-        iso = data.get("iso")
+        try:
+            iso = _parse_iso_response(resp.choices[0].message.content)
+        except ValueError:
+            llm_telemetry.record_parse_failure(route["model"], "time_fix")
+            raise
+        model_router.record_outcome("time_fix", route["model"], True)
         return iso
 
     except Exception as e:
+        model_router.record_outcome("time_fix", route["model"], False)
         print(f"⚠️ AI time fixer failed for '{time_text}': {e}")
         return None
 
@@ -4,6 +4,7 @@ import os
 import json
 from datetime import datetime
 import pytz
+import task_fragments
 
 from ayth_script import create_task, update_task, delete_task, complete_task
 from time_fixer import fix_time_from_text
@@ -195,6 +196,8 @@ def upload_pending_tasks(silent=False):
         writer.writeheader()
         writer.writerows(new_rows)
 
+    task_fragments.invalidate_all()
+
     if updated_any:
         log("\n✔ tasks.csv synced and cleaned.", silent)
     else: